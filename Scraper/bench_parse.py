@@ -0,0 +1,66 @@
+"""
+Compare single-process and process-pool parsing of recipe-tracker pages.
+
+    python Scraper/bench_parse.py                      # pages rendered from data/recipes.json
+    python Scraper/bench_parse.py --pages saved_pages/ # saved *.html fixture pages
+    python Scraper/bench_parse.py --save saved_pages/  # write the rendered pages out first
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fixture_server import render_page
+from scrape_recipes import DEFAULT_WORKERS, ROOT, parse_page
+
+
+def load_pages(pages_dir, source):
+    if pages_dir:
+        paths = sorted(glob.glob(os.path.join(pages_dir, "*.html")))
+        return [open(p, "rb").read() for p in paths]
+    with open(source, "r", encoding="utf-8") as f:
+        recipes = json.load(f)
+    per_page = 50
+    return [render_page(recipes, n, per_page) for n in range(1, len(recipes) // per_page + 2)]
+
+
+def bench(pages, workers, repeat):
+    best = float("inf")
+    rows = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rows = sum(len(r) for r in pool.map(parse_page, pages, chunksize=2))
+        else:
+            rows = sum(len(parse_page(p)) for p in pages)
+        best = min(best, time.perf_counter() - t0)
+    return best, rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark the scraper's parse stage.")
+    ap.add_argument("--pages", help="Directory of saved *.html pages")
+    ap.add_argument("--source", default=os.path.join(ROOT, "data", "recipes.json"))
+    ap.add_argument("--save", help="Write the rendered pages to this directory and exit")
+    ap.add_argument("--workers", type=int, default=max(2, DEFAULT_WORKERS))
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    pages = load_pages(args.pages, args.source)
+    if args.save:
+        os.makedirs(args.save, exist_ok=True)
+        for i, body in enumerate(pages, 1):
+            with open(os.path.join(args.save, f"page_{i:03d}.html"), "wb") as f:
+                f.write(body)
+        print(f"Saved {len(pages)} pages to {args.save}")
+        raise SystemExit(0)
+
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / 1024:.0f} KiB, {os.cpu_count()} CPU(s)")
+    single, n1 = bench(pages, 1, args.repeat)
+    pooled, n2 = bench(pages, args.workers, args.repeat)
+    assert n1 == n2, "pool and inline parse disagree"
+    print(f"single-process        {single * 1000:8.1f} ms  ({n1} rows)")
+    print(f"pool ({args.workers} workers)      {pooled * 1000:8.1f} ms  x{single / pooled:.2f}")
@@ -0,0 +1,85 @@
+"""
+Local stand-in for the recipe tracker, used to exercise the scraper offline.
+
+Serves /artisan/recipe-tracker?page=N as an HTML table built from a recipes
+JSON file, with ETag/Last-Modified validators and 304 handling, so repeated
+scraper runs can be checked for the incremental path:
+
+    python Scraper/fixture_server.py --port 8765
+    python Scraper/scrape_recipes.py --base http://127.0.0.1:8765/artisan/recipe-tracker
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+PER_PAGE = 50
+
+
+def render_page(recipes, page: int, per_page: int = PER_PAGE) -> bytes:
+    """Render one tracker page in the same table shape the live site uses."""
+    chunk = recipes[(page - 1) * per_page: page * per_page]
+    rows = []
+    for r in chunk:
+        href = r.get("url", "").replace("https://ashescodex.com", "")
+        rows.append(
+            "<tr><td></td>"
+            f"<td><a href=\"{html.escape(href)}\">{html.escape(r.get('name', ''))}</a></td>"
+            f"<td>{html.escape(r.get('profession', ''))}</td>"
+            f"<td>{html.escape(str(r.get('level', '')))}</td></tr>"
+        )
+    body = "<html><body><table><tbody>" + "".join(rows) + "</tbody></table></body></html>"
+    return body.encode("utf-8")
+
+
+def make_handler(source: str):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/artisan/recipe-tracker":
+                self.send_error(404)
+                return
+            try:
+                page = max(1, int(parse_qs(url.query).get("page", ["1"])[0]))
+            except ValueError:
+                page = 1
+
+            # Re-read on each request so edits to the source show up as changed pages
+            with open(source, "r", encoding="utf-8") as f:
+                recipes = json.load(f)
+            body = render_page(recipes, page)
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            last_modified = formatdate(os.path.getmtime(source), usegmt=True)
+
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Serve recipe-tracker fixture pages.")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--source", default=os.path.join("data", "recipes.json"))
+    args = ap.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.source))
+    print(f"Serving {args.source} on http://127.0.0.1:{args.port}/artisan/recipe-tracker")
+    server.serve_forever()
@@ -1,46 +1,302 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import requests
 from bs4 import BeautifulSoup
-import json
 
-def scrape_all_recipes(max_pages=100):
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from utils.catalog import build_catalog, iter_rows  # noqa: E402
+
+BASE_URL = "https://ashescodex.com/artisan/recipe-tracker"
+SITE_ROOT = "https://ashescodex.com"
+DATA_DIR = os.path.join(ROOT, "data")
+OUT_FILE = os.path.join(DATA_DIR, "recipes.ndjson")
+STATE_FILE = os.path.join(DATA_DIR, "scrape_state.json")
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+QUEUE_SIZE = 8
+
+
+# ---------- Parsing ----------
+def parse_page(body: bytes):
+    """
+    Parse one recipe-tracker page into compact (name, profession, level, href)
+    tuples. Runs in pool workers, so it only takes and returns plain data.
+    """
+    soup = BeautifulSoup(body.decode("utf-8", "replace"), 'html.parser')
+    rows = soup.select('tbody tr')
     recipes = []
-    base = "https://ashescodex.com/artisan/recipe-tracker"
-    for page in range(1, max_pages + 1):
-        params = {'page': page}
-        print(f"Fetching page {page}...")
-        r = requests.get(base, params=params)
-        if r.status_code != 200:
-            print("No more pages or error:", r.status_code)
-            break
-
-        soup = BeautifulSoup(r.text, 'html.parser')
-        rows = soup.select('tbody tr')
-        if not rows:
+    for tr in rows:
+        cols = tr.find_all('td')
+        if len(cols) < 3:
+            continue
+        name_link = cols[1].find('a')
+        profession = cols[2].get_text(strip=True)
+        level = cols[3].get_text(strip=True) if len(cols) > 3 else ""
+        if name_link:
+            recipes.append((name_link.get_text(strip=True), profession, level, name_link.get('href')))
+    return recipes
+
+
+def _row_dict(row):
+    name, profession, level, href = row
+    return {"name": name, "profession": profession, "level": level, "url": f"{SITE_ROOT}{href}"}
+
+
+class _Done:
+    """Stand-in future for pages that need no parsing (or when running inline)."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def done(self):
+        return True
+
+    def result(self):
+        return self._value
+
+
+# ---------- State (validators + checkpoint) ----------
+def _load_state(path: str):
+    """
+    State layout:
+      { "pages": { "<n>": {etag, last_modified, sha256, count} },
+        "checkpoint": { "next_page": n, "old_line": n, "out_bytes": n } | null }
+    Rows themselves live only in the NDJSON output; `count` says how many
+    lines of it belong to each page.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except Exception:
+        state = {}
+    state.setdefault("pages", {})
+    state.setdefault("checkpoint", None)
+    return state
+
+
+def _save_state(path: str, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _conditional_headers(cached):
+    headers = {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+# ---------- Scrape ----------
+def _fetch_stage(session, base, pages, use_cache, start, max_pages, out_q, stop):
+    """Fetch pages in order and hand them to the parse stage through a bounded queue."""
+    try:
+        for page in range(start, max_pages + 1):
+            if stop.is_set():
+                break
+            cached = pages.get(str(page), {}) if use_cache else {}
+            r = session.get(base, params={'page': page}, headers=_conditional_headers(cached), timeout=30)
+            out_q.put((page, r.status_code, r.headers.get("ETag"), r.headers.get("Last-Modified"), r.content))
+            if r.status_code not in (200, 304):
+                break
+    except Exception as ex:
+        out_q.put(ex)
+    finally:
+        out_q.put(None)
+
+
+def scrape_all_recipes(max_pages=100, base=BASE_URL, out_path=OUT_FILE, state_path=STATE_FILE,
+                       catalog_dir=DATA_DIR, workers=DEFAULT_WORKERS):
+    """
+    Incremental, streaming scrape. Each page is requested with its stored
+    ETag/Last-Modified; a 304 or an identical content hash copies that page's
+    rows straight from the previous NDJSON output instead of parsing again.
+
+    Fetching runs in a thread feeding a bounded queue; changed pages are parsed
+    in a process pool (`workers` > 1) while later pages are still downloading.
+    Results are written in page order to `<out>.part`, and the state is
+    checkpointed after every page, so an interrupted run resumes where it
+    stopped. A page's new validators are checkpointed together with its rows,
+    never ahead of them. When anything changed, the catalog is rebuilt from the new stream.
+    """
+    started = time.perf_counter()
+    state = _load_state(state_path)
+    pages = state["pages"]
+    checkpoint = state.get("checkpoint") or {}
+    resume_from = int(checkpoint.get("next_page", 1))
+    part_path = f"{out_path}.part"
+
+    old = open(out_path, "r", encoding="utf-8") if os.path.exists(out_path) else None
+    if resume_from > 1 and os.path.exists(part_path):
+        print(f"Resuming from checkpoint at page {resume_from}...")
+        out = open(part_path, "r+", encoding="utf-8")
+        out.truncate(int(checkpoint.get("out_bytes", 0)))
+        out.seek(0, os.SEEK_END)
+        old_line = int(checkpoint.get("old_line", 0))
+        if old:
+            for _ in itertools.islice(old, old_line):
+                pass
+    else:
+        resume_from = 1
+        out = open(part_path, "w", encoding="utf-8")
+        old_line = 0
+
+    stats = {"fetched": 0, "not_modified": 0, "unchanged": 0, "parsed": 0}
+    # An interrupted run may already have picked up changes before it stopped
+    changed = resume_from > 1
+    end_page = max_pages + 1
+
+    fetched: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    fetcher = threading.Thread(
+        target=_fetch_stage,
+        # The fetcher gets its own copy of the validators; `pages` is rewritten as results land
+        args=(requests.Session(), base, {k: dict(v) for k, v in pages.items()}, old is not None,
+              resume_from, max_pages, fetched, stop),
+        daemon=True,
+    )
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pending = deque()  # (page, reuse, future) in page order
+    # Validators of pages fetched but not yet written. They go into `pages` only
+    # once the page's rows are in the output: a checkpoint must never carry the
+    # new validators of a page whose old rows are still what the output holds.
+    fresh = {}
+
+    def finish_head():
+        """Write out the oldest pending page. Returns False once the end is reached."""
+        nonlocal old_line, changed, end_page
+        page, reuse, fut = pending.popleft()
+        key = str(page)
+        # prev_count: left by runs from before validators were held back
+        old_count = int(pages.get(key, {}).get("prev_count", pages.get(key, {}).get("count", 0)))
+        if reuse:
+            n = 0
+            for line in itertools.islice(old, old_count):
+                out.write(line)
+                n += 1
+            old_line += n
+        else:
+            rows = fut.result()
+            for row in rows:
+                out.write(json.dumps(_row_dict(row), ensure_ascii=False) + "\n")
+            if old:
+                old_line += sum(1 for _ in itertools.islice(old, old_count))
+            n = len(rows)
+            changed = changed or n > 0 or old_count > 0
+        pages[key] = dict(fresh.pop(key, None) or pages.get(key, {}), count=n)
+        pages[key].pop("prev_count", None)
+
+        if not n:
             print("No recipes found on this page; stopping.")
-            break
-
-        for tr in rows:
-            cols = tr.find_all('td')
-            if len(cols) < 3:
-                continue
-            name_link = cols[1].find('a')
-            profession = cols[2].get_text(strip=True)
-            level = cols[3].get_text(strip=True) if len(cols) > 3 else ""
-            if name_link:
-                name = name_link.get_text(strip=True)
-                href = name_link.get('href')
-                url = f"https://ashescodex.com{href}"
-                recipes.append({
-                    "name": name,
-                    "profession": profession,
-                    "level": level,
-                    "url": url
-                })
-        print(f"Page {page}: collected {len(rows)} rows")
-
-    with open('recipes.json', 'w', encoding='utf-8') as f:
-        json.dump(recipes, f, indent=4, ensure_ascii=False)
-    print(f"Wrote {len(recipes)} recipes to recipes.json")
+            end_page = page
+            return False
+        out.flush()
+        state["checkpoint"] = {"next_page": page + 1, "old_line": old_line, "out_bytes": out.tell()}
+        _save_state(state_path, state)
+        print(f"Page {page}: {n} rows ({'cached' if reuse else 'parsed'})")
+        return True
+
+    fetcher.start()
+    try:
+        running = True
+        while running:
+            item = fetched.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            page, status, etag, last_modified, body = item
+            stats["fetched"] += 1
+            key = str(page)
+            cached = pages.get(key, {}) if old else {}
+
+            if status == 304 and cached:
+                stats["not_modified"] += 1
+                reuse = True
+            elif status == 200:
+                digest = hashlib.sha256(body).hexdigest()
+                reuse = bool(cached) and cached.get("sha256") == digest
+                if reuse:
+                    stats["unchanged"] += 1
+                fresh[key] = {"etag": etag, "last_modified": last_modified, "sha256": digest}
+            else:
+                print("No more pages or error:", status)
+                end_page = page
+                break
+
+            if reuse:
+                fut = _Done(None)
+            else:
+                stats["parsed"] += 1
+                fut = pool.submit(parse_page, body) if pool else _Done(parse_page(body))
+            pending.append((page, reuse, fut))
+
+            # Keep up to 2 pages per worker in flight; write finished pages in order
+            while pending and (len(pending) > 2 * max(workers, 1) or pending[0][2].done()):
+                if not finish_head():
+                    running = False
+                    break
+        while running and pending:
+            if not finish_head():
+                break
+
+        # Pages past the end disappeared upstream; forget them
+        for key in [k for k in pages if int(k) >= end_page]:
+            if pages.pop(key).get("count"):
+                changed = True
+    finally:
+        stop.set()
+        # Unblock the fetcher if it is waiting on a full queue
+        while fetcher.is_alive():
+            try:
+                fetched.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        out.close()
+        if old:
+            old.close()
+
+    if changed or not os.path.exists(out_path):
+        os.replace(part_path, out_path)
+        print(f"Wrote recipes stream to {out_path}")
+        built = build_catalog(iter_rows(out_path), catalog_dir)
+        print(f"Catalog rebuilt: {built['recipes']} recipes in {built['professions']} professions")
+    else:
+        os.remove(part_path)
+        print(f"No changes; {out_path} and the catalog left as is.")
+
+    state["checkpoint"] = None
+    _save_state(state_path, state)
+    print(
+        f"Done in {time.perf_counter() - started:.2f}s — fetched {stats['fetched']}, "
+        f"304 {stats['not_modified']}, same-hash {stats['unchanged']}, parsed {stats['parsed']}"
+    )
+    return changed
+
 
 if __name__ == '__main__':
-    scrape_all_recipes()
+    ap = argparse.ArgumentParser(description="Scrape the Ashes Codex recipe tracker into data/recipes.ndjson.")
+    ap.add_argument("--base", default=BASE_URL, help="Recipe tracker URL (point at fixture_server.py for local runs)")
+    ap.add_argument("--max-pages", type=int, default=100)
+    ap.add_argument("--out", default=OUT_FILE)
+    ap.add_argument("--state", default=STATE_FILE)
+    ap.add_argument("--catalog-dir", default=DATA_DIR)
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parse processes (1 = parse inline)")
+    args = ap.parse_args()
+    scrape_all_recipes(max_pages=args.max_pages, base=args.base, out_path=args.out,
+                       state_path=args.state, catalog_dir=args.catalog_dir, workers=args.workers)
@@ -56,12 +56,15 @@ class AshesBot(commands.Bot):
 async def load_cogs(bot: commands.Bot):
     """Load all cogs safely, skipping missing ones."""
     cogs = [
+    "cogs.members",
     "cogs.profile",
     "cogs.professions",
     "cogs.recipes",
+    "cogs.registry",
     "cogs.market",
     "cogs.mailbox",
     "cogs.trades",
+    "cogs.expiry",
     "cogs.hub",
     "utils.debug",   # <-- add this
 ]
@@ -0,0 +1,122 @@
+# cogs/expiry.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from discord.ext import commands
+
+from utils.expiry import ExpiryHeap
+
+logger = logging.getLogger("AshesBot")
+
+# heap kind -> cog that owns those postings
+KINDS = {"market": "Market", "trades": "Trades"}
+LABELS = {"market": "Market listing", "trades": "Trade post"}
+
+
+class Expiry(commands.Cog):
+    """
+    One background task expires Market listings and Trades posts.
+    It sleeps until the earliest expiry in a min-heap (or until something
+    sooner is scheduled), then hands each cog its due batch: the cog removes
+    them with a single save, and owners get one renewal notice per sweep.
+
+    Cog contract (Market, Trades):
+      expiring() -> [(expires_at, owner_id, item_id)]        # seed on load
+      expire([(owner_id, item_id, expires_at)]) -> [(owner_id, posting)]
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.heap = ExpiryHeap()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        for kind, name in KINDS.items():
+            cog = bot.get_cog(name)
+            if cog and hasattr(cog, "expiring"):
+                for expires_at, owner_id, item_id in cog.expiring():
+                    self.heap.push(expires_at, kind, owner_id, item_id)
+
+    async def cog_load(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def cog_unload(self):
+        if self._task:
+            self._task.cancel()
+
+    # ---------------- Public API ----------------
+    def schedule(self, kind: str, owner_id: int, item_id: int, expires_at: float):
+        due = self.heap.next_due()
+        self.heap.push(expires_at, kind, owner_id, item_id)
+        if due is None or expires_at < due:
+            self._wake.set()
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Expire everything due; returns how many postings were removed."""
+        batch = self.heap.pop_due(now)
+        by_kind: Dict[str, List[Tuple[int, int, float]]] = {}
+        for expires_at, kind, owner_id, item_id in batch:
+            by_kind.setdefault(kind, []).append((owner_id, item_id, expires_at))
+
+        removed = 0
+        notices: Dict[int, List[str]] = {}
+        for kind, entries in by_kind.items():
+            cog = self.bot.get_cog(KINDS[kind])
+            if not cog or not hasattr(cog, "expire"):
+                continue
+            for owner_id, posting in cog.expire(entries):
+                notices.setdefault(owner_id, []).append(f"• {LABELS[kind]}: **{posting.get('item', '?')}**")
+                removed += 1
+        self._notify(notices)
+        return removed
+
+    # ---------------- Internals ----------------
+    def _notify(self, notices: Dict[int, List[str]]):
+        mail_cog = self.bot.get_cog("Mailbox")
+        if not mail_cog or not notices:
+            return
+        from_id = self.bot.user.id if self.bot.user else 0
+        messages = [
+            {
+                "from_id": from_id,
+                "to_id": owner_id,
+                "subject": "⏰ Postings expired",
+                "body": (
+                    "These postings reached their expiry and were taken down:\n"
+                    + "\n".join(lines)
+                    + "\n\nStill available? Post them again from `/home` to renew."
+                ),
+            }
+            for owner_id, lines in notices.items()
+        ]
+        try:
+            mail_cog.send_many(messages)
+        except Exception:
+            logger.exception("Could not send %d expiry notices", len(messages))
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            self._wake.clear()
+            due = self.heap.next_due()
+            timeout = None if due is None else max(0.0, due - time.time())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Expiry sweep failed")
+
+
+def schedule_expiry(bot: commands.Bot, kind: str, owner_id: int, item_id: int, expires_at: Any):
+    """No-op when the Expiry cog isn't loaded (its seed pass picks postings up on load)."""
+    cog = bot.get_cog("Expiry")
+    if cog and expires_at:
+        cog.schedule(kind, owner_id, item_id, float(expires_at))
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Expiry(bot))
@@ -42,7 +42,6 @@ LEARNED_FILE   = _path("learned_recipes.json")
 MARKET_FILE    = _path("market.json")
 TRADES_FILE    = _path("trades.json")
 MAILBOX_FILE   = _path("mailbox.json")
-REGISTRY_FILE  = _path("artisan_registry.json")
 GROUPED_FILE   = _path("recipes_grouped.json")
 ACTIVITY_FILE  = _path("activity.json")  # new, optional
 PROFESSIONS_FILE = _path("professions.json")
@@ -228,17 +227,51 @@ class Hub(commands.Cog):
         # Mailbox unread
         mail_unread = 0
         mail_cog = self.bot.get_cog("Mailbox")
-        if mail_cog and hasattr(mail_cog, "get_inbox"):
-            try:
-                inbox = mail_cog.get_inbox(user_id)  # type: ignore
-                mail_unread = len([m for m in inbox if not m.get("read")])
-            except Exception:
-                pass
+        if mail_cog and hasattr(mail_cog, "unread_count"):
+            mail_unread = mail_cog.unread_count(user_id)  # type: ignore
         else:
             inbox = _load_json(MAILBOX_FILE, {}).get(str(user_id), [])
             mail_unread = len([m for m in inbox if not m.get("read")])
 
-        # Wishlist
+        # Wishlist matches: O(1) from the Market/Trades match counters when loaded
+        mkt_cog = self.bot.get_cog("Market")
+        trd_cog = self.bot.get_cog("Trades")
+        if mkt_cog and hasattr(mkt_cog, "get_wishlist_match_count") and trd_cog and hasattr(trd_cog, "get_wishlist_match_count"):
+            market_matches = mkt_cog.get_wishlist_match_count(user_id)  # type: ignore
+            trade_matches = trd_cog.get_wishlist_match_count(user_id)  # type: ignore
+        else:
+            market_matches, trade_matches = self._scan_wishlist_matches(user_id)
+
+        # Learned recipes total
+        learned_total = 0
+        learned = _load_json(LEARNED_FILE, {})
+        try:
+            mine = learned.get(str(user_id), {})
+            if isinstance(mine, dict):
+                learned_total = sum(len(v) for v in mine.values())
+        except Exception:
+            pass
+
+        # Professions count
+        prof_count = 0
+        prof_cog = self.bot.get_cog("Professions")
+        if prof_cog and hasattr(prof_cog, "get_user_professions"):
+            try:
+                profs = prof_cog.get_user_professions(user_id)  # type: ignore
+                prof_count = len(profs) if profs else 0
+            except Exception:
+                pass
+
+        return {
+            "mail_unread": mail_unread,
+            "market_wishlist_matches": market_matches,
+            "trade_wishlist_matches": trade_matches,
+            "learned_total": learned_total,
+            "professions_count": prof_count,
+        }
+
+    def _scan_wishlist_matches(self, user_id: int):
+        """File fallback when the Market/Trades cogs aren't loaded: scan both stores."""
         profiles = _load_json(PROFILES_FILE, {})
         wishlist = [w.lower() for w in profiles.get(str(user_id), {}).get("wishlist", [])]
 
@@ -272,34 +305,7 @@ class Hub(commands.Cog):
                         trade_matches += 1
         except Exception:
             trade_matches = 0
-
-        # Learned recipes total
-        learned_total = 0
-        learned = _load_json(LEARNED_FILE, {})
-        try:
-            mine = learned.get(str(user_id), {})
-            if isinstance(mine, dict):
-                learned_total = sum(len(v) for v in mine.values())
-        except Exception:
-            pass
-
-        # Professions count
-        prof_count = 0
-        prof_cog = self.bot.get_cog("Professions")
-        if prof_cog and hasattr(prof_cog, "get_user_professions"):
-            try:
-                profs = prof_cog.get_user_professions(user_id)  # type: ignore
-                prof_count = len(profs) if profs else 0
-            except Exception:
-                pass
-
-        return {
-            "mail_unread": mail_unread,
-            "market_wishlist_matches": market_matches,
-            "trade_wishlist_matches": trade_matches,
-            "learned_total": learned_total,
-            "professions_count": prof_count,
-        }
+        return market_matches, trade_matches
 
     # -------- Quick actions on Home --------
     def build_home_quick_actions(self, user_id: int) -> Optional[discord.ui.View]:
@@ -451,6 +457,9 @@ class Hub(commands.Cog):
                 learned = store.get(str(user_id), {})
             total = sum(len(v) for v in learned.values()) if isinstance(learned, dict) else 0
             e.add_field(name="📘 Learned", value=f"{total} total", inline=False)
+            missing = [r.get("name", "?") for v in learned.values() for r in v if r.get("missing")] if isinstance(learned, dict) else []
+            if missing:
+                e.add_field(name="⚠️ No longer in the catalog", value="\n".join(f"• {n}" for n in missing[:10]), inline=False)
         except Exception as ex:
             e.add_field(name="Notice", value=f"Recipes data unavailable.\n{type(ex).__name__}: {ex}", inline=False)
         return e
@@ -483,12 +492,13 @@ class Hub(commands.Cog):
         mail_cog = self.bot.get_cog("Mailbox")
         e = discord.Embed(title="📬 Mailbox", color=discord.Color.blurple())
         try:
-            if mail_cog and hasattr(mail_cog, "get_inbox"):
-                inbox = mail_cog.get_inbox(user_id)  # type: ignore
+            if mail_cog and hasattr(mail_cog, "unread_count"):
+                total = mail_cog.message_count(user_id)  # type: ignore
+                unread = mail_cog.unread_count(user_id)  # type: ignore
             else:
                 inbox = _load_json(MAILBOX_FILE, {}).get(str(user_id), [])
-            unread = len([m for m in inbox if not m.get("read")])
-            e.description = f"📨 You have **{len(inbox)}** messages (**{unread} unread**)."
+                total, unread = len(inbox), len([m for m in inbox if not m.get("read")])
+            e.description = f"📨 You have **{total}** messages (**{unread} unread**)."
             e.set_footer(text="Use the buttons below to manage your mailbox.")
         except Exception as ex:
             e.add_field(name="Notice", value=f"Mailbox unavailable.\n{type(ex).__name__}: {ex}", inline=False)
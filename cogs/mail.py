@@ -1,12 +1,12 @@
-import time
 import discord
 from discord.ext import commands
 from discord.ui import View, Button, Modal, TextInput, Select
-from typing import List, Dict, Any, Optional
-from utils.data import load_json, save_json
+from typing import List, Dict, Any, Optional, Tuple
+from utils.messages import MAILBOX_FILE, MessageStore
 from cogs.hub import refresh_hub
+from cogs.members import lookup_names, resolve_names
 
-MAILBOX_FILE = "mailbox.json"
+MAIL_PAGE = 10
 
 
 async def render_mailbox(self, user_id: int):
@@ -17,10 +17,7 @@ async def render_mailbox(self, user_id: int):
         embed.description = "⚠️ Mailbox system unavailable."
         return embed
 
-    inbox = mail_cog.get_inbox(user_id)
-    unread_count = len([m for m in inbox if not m["read"]])
-
-    embed.description = f"📨 You have **{len(inbox)}** messages ({unread_count} unread)."
+    embed.description = f"📨 You have **{mail_cog.message_count(user_id)}** messages ({mail_cog.unread_count(user_id)} unread)."
     embed.set_footer(text="Use the buttons below to send or view messages.")
     return embed
 
@@ -44,43 +41,41 @@ async def render_trades(self, user_id: int):
 
 
 
-def now_ts() -> int:
-    return int(time.time())
-
 class Mail(commands.Cog):
     """In-bot mailbox for craft/trade requests and messages."""
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.store: Dict[str, List[Dict[str, Any]]] = load_json(MAILBOX_FILE, {})  # { user_id: [msg, ...] }
-
-    def _save(self):
-        save_json(MAILBOX_FILE, self.store)
+        self._own_store: Optional[MessageStore] = None
+
+    @property
+    def store(self) -> MessageStore:
+        """The Mailbox cog's message store when it's loaded, so both UIs see the same mail."""
+        mailbox = self.bot.get_cog("Mailbox")
+        if mailbox is not None:
+            return mailbox.store
+        if self._own_store is None:
+            self._own_store = MessageStore(MAILBOX_FILE)
+        return self._own_store
 
     # ------------- Public API -------------
     def send_mail(self, to_user_id: int, from_user_id: int, subject: str, body: str) -> Dict[str, Any]:
-        msg = {
-            "id": f"m{now_ts()}_{from_user_id}",
-            "from": str(from_user_id),
-            "to": str(to_user_id),
-            "subject": subject[:120],
-            "body": body[:1800],
-            "ts": now_ts(),
-            "read": False,
-        }
-        self.store.setdefault(str(to_user_id), []).append(msg)
-        self._save()
-        return msg
+        return self.store.send(from_user_id, to_user_id, subject[:120], body[:1800])
 
     def get_inbox(self, user_id: int) -> List[Dict[str, Any]]:
-        return sorted(self.store.get(str(user_id), []), key=lambda m: m["ts"], reverse=True)
+        """Newest first; the store keeps inboxes in time order, so this is just a reversal."""
+        return self.store.inbox(user_id)[::-1]
+
+    def unread_count(self, user_id: int) -> int:
+        return self.store.unread_count(user_id)
+
+    def message_count(self, user_id: int) -> int:
+        return self.store.count(user_id)
 
-    def mark_read(self, user_id: int, msg_id: str):
-        inbox = self.store.get(str(user_id), [])
-        for m in inbox:
-            if m["id"] == msg_id:
-                m["read"] = True
-                self._save()
-                break
+    def mark_read(self, user_id: int, msg_id: int):
+        self.store.mark_read(user_id, msg_id)
+
+    def mark_all_read(self, user_id: int, sender: Optional[int] = None) -> int:
+        return self.store.mark_all_read(user_id, sender)
 
     # ------------- UI: Buttons -------------
     def build_mail_buttons(self, user_id: int):
@@ -122,36 +117,94 @@ class Mail(commands.Cog):
 
     # ------------- UI: Views -------------
     class InboxView(View):
-        def __init__(self, cog: "Mail", user_id: int):
+        def __init__(self, cog: "Mail", user_id: int, unread: bool = False, sender: Optional[int] = None,
+                     cursor: Optional[int] = None, trail: Tuple[Optional[int], ...] = (),
+                     guild: Optional[discord.Guild] = None):
+            """Newest first, MAIL_PAGE at a time; cursor/trail/guild work like Mailbox.InboxView's."""
             super().__init__(timeout=240)
             self.cog = cog
             self.user_id = user_id
+            state = {"unread": unread, "sender": sender, "cursor": cursor, "trail": trail}
+
+            shown, next_cursor = self.cog.store.page(user_id, cursor, MAIL_PAGE, unread, sender)
+            if not shown:
+                label = "No unread mail" if unread else "Inbox is empty"
+                self.add_item(Button(label=label, style=discord.ButtonStyle.secondary, disabled=True))
+            else:
+                names = lookup_names(self.cog.bot, [int(m["from"]) for m in shown], guild)
+                for m in shown:
+                    label = f"{'✅' if m['read'] else '🆕'} {m['subject']} — from {names[int(m['from'])]}"
+                    self.add_item(self._OpenBtn(self.cog, self.user_id, m["id"], label[:80]))
+
+            if trail:
+                self.add_item(self._PageBtn(self.cog, self.user_id, "⬅ Prev", dict(state, cursor=trail[-1], trail=trail[:-1])))
+            if next_cursor is not None:
+                self.add_item(self._PageBtn(self.cog, self.user_id, "Next ➡", dict(state, cursor=next_cursor, trail=trail + (cursor,))))
+            first = dict(state, cursor=None, trail=())
+            self.add_item(self._PageBtn(self.cog, self.user_id, "📬 All mail" if unread else "🆕 Unread only", dict(first, unread=not unread)))
+            if self.cog.unread_count(user_id):
+                self.add_item(self._ReadAllBtn(self.cog, self.user_id, first))
+            senders = self.cog.store.senders_of(user_id)
+            if len(senders) > 1 or sender is not None:
+                self.add_item(self._SenderSelect(self.cog, self.user_id, senders, first, guild))
+
+        class _PageBtn(Button):
+            def __init__(self, cog: "Mail", user_id: int, label: str, state: Dict[str, Any]):
+                super().__init__(label=label, style=discord.ButtonStyle.secondary)
+                self.cog = cog
+                self.user_id = user_id
+                self.state = state
 
-            inbox = self.cog.get_inbox(user_id)
-            if not inbox:
-                self.add_item(Button(label="Inbox is empty", style=discord.ButtonStyle.secondary, disabled=True))
-                return
+            async def callback(self, interaction: discord.Interaction):
+                await interaction.response.edit_message(view=Mail.InboxView(self.cog, self.user_id, guild=interaction.guild, **self.state))
 
-            for m in inbox[:25]:
-                label = f"{'✅' if m['read'] else '🆕'} {m['subject']} — from {m['from']}"
-                self.add_item(self._OpenBtn(self.cog, self.user_id, m["id"], label[:80]))
+        class _ReadAllBtn(Button):
+            def __init__(self, cog: "Mail", user_id: int, state: Dict[str, Any]):
+                super().__init__(label="✅ Mark all read", style=discord.ButtonStyle.success)
+                self.cog = cog
+                self.user_id = user_id
+                self.state = state
+
+            async def callback(self, interaction: discord.Interaction):
+                self.cog.mark_all_read(self.user_id, self.state.get("sender"))
+                await interaction.response.edit_message(view=Mail.InboxView(self.cog, self.user_id, guild=interaction.guild, **self.state))
+
+        class _SenderSelect(Select):
+            def __init__(self, cog: "Mail", user_id: int, senders: List[int], state: Dict[str, Any],
+                         guild: Optional[discord.Guild] = None):
+                current = state.get("sender")
+                if current is not None and current not in senders:
+                    senders = [current] + senders[:-1]
+                names = lookup_names(cog.bot, senders, guild)
+                options = [discord.SelectOption(label="Everyone", value="all", default=current is None)]
+                options += [
+                    discord.SelectOption(label=f"From {names[f]}"[:100], value=str(f), default=f == current)
+                    for f in senders
+                ]
+                super().__init__(placeholder="Filter by sender", options=options, min_values=1, max_values=1)
+                self.cog = cog
+                self.user_id = user_id
+                self.state = state
+
+            async def callback(self, interaction: discord.Interaction):
+                sender = None if self.values[0] == "all" else int(self.values[0])
+                view = Mail.InboxView(self.cog, self.user_id, guild=interaction.guild, **dict(self.state, sender=sender))
+                await interaction.response.edit_message(view=view)
 
         class _OpenBtn(Button):
-            def __init__(self, cog: "Mail", user_id: int, msg_id: str, label: str):
+            def __init__(self, cog: "Mail", user_id: int, msg_id: int, label: str):
                 super().__init__(label=label, style=discord.ButtonStyle.secondary)
                 self.cog = cog
                 self.user_id = user_id
                 self.msg_id = msg_id
 
             async def callback(self, interaction: discord.Interaction):
-                inbox = self.cog.get_inbox(self.user_id)
-                msg = next((m for m in inbox if m["id"] == self.msg_id), None)
+                msg = self.cog.store.get(self.user_id, self.msg_id)
                 if not msg:
                     return await interaction.response.send_message("⚠️ Message not found.", ephemeral=True)
 
                 self.cog.mark_read(self.user_id, self.msg_id)
-                from_member = interaction.guild.get_member(int(msg["from"])) if interaction.guild else None
-                from_name = from_member.display_name if from_member else msg["from"]
+                from_name = (await resolve_names(self.cog.bot, [int(msg["from"])], interaction.guild))[int(msg["from"])]
 
                 e = discord.Embed(
                     title=f"✉️ {msg['subject']}",
@@ -190,7 +243,7 @@ class Mail(commands.Cog):
         uid = interaction.user.id
         if cid == f"mail_inbox_{uid}":
             embed = discord.Embed(title="📥 Inbox", description="Your in-bot messages.", color=discord.Color.blurple())
-            view = Mail.InboxView(self, uid)
+            view = Mail.InboxView(self, uid, guild=interaction.guild)
             return await interaction.response.edit_message(embed=embed, view=view)
 
         if cid == f"mail_compose_{uid}":
@@ -1,11 +1,14 @@
 # cogs/mailbox.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
 import discord
 from discord.ext import commands
-from discord.ui import View, Button, Modal, TextInput
-from utils.data import load_json, save_json
+from discord.ui import View, Button, Modal, TextInput, Select
+from utils.messages import MAILBOX_FILE, MessageStore
 from cogs.hub import refresh_hub
+from cogs.members import lookup_names, resolve_names
 
-MAILBOX_FILE = "data/mailbox.json"
+INBOX_PAGE = 5
 
 
 class Mailbox(commands.Cog):
@@ -13,37 +16,48 @@ class Mailbox(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.mail = load_json(MAILBOX_FILE, {})  # { user_id: [ {from, subject, body, read} ] }
+        # shared with the Mail cog; see utils/messages.py
+        self.store = MessageStore(MAILBOX_FILE)
 
     def save(self):
-        save_json(MAILBOX_FILE, self.mail)
+        self.store.save()
 
     # ---------------- Public API ----------------
-    def get_inbox(self, user_id: int):
-        return self.mail.get(str(user_id), [])
+    def get_inbox(self, user_id: int) -> List[Dict[str, Any]]:
+        return self.store.inbox(user_id)
+
+    def get_message(self, user_id: int, msg_id: int) -> Optional[Dict[str, Any]]:
+        return self.store.get(user_id, msg_id)
+
+    def unread_count(self, user_id: int) -> int:
+        return self.store.unread_count(user_id)
+
+    def message_count(self, user_id: int) -> int:
+        return self.store.count(user_id)
 
     def send_message(self, from_id: int, to_id: int, subject: str, body: str):
-        entry = {
-            "from": from_id,
-            "subject": subject or "(No Subject)",
-            "body": body,
-            "read": False,
-        }
-        self.mail.setdefault(str(to_id), []).append(entry)
-        self.save()
-        return entry
-
-    def delete_message(self, user_id: int, index: int):
-        inbox = self.mail.get(str(user_id), [])
-        if 0 <= index < len(inbox):
-            inbox.pop(index)
-            self.save()
-
-    def mark_read(self, user_id: int, index: int, read: bool = True):
-        inbox = self.mail.get(str(user_id), [])
-        if 0 <= index < len(inbox):
-            inbox[index]["read"] = read
-            self.save()
+        return self.store.send(from_id, to_id, subject, body)
+
+    def send_many(self, messages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Deliver a batch of messages ({from_id, to_id, subject, body} each) and
+        write mailbox.json once for the whole batch.
+        """
+        return self.store.send_many(messages)
+
+    async def send_many_async(self, messages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """send_many with the mailbox.json write in a worker thread, for large fan-outs."""
+        return await self.store.send_many_async(messages)
+
+    def delete_message(self, user_id: int, msg_id: int) -> bool:
+        return self.store.delete(user_id, msg_id)
+
+    def mark_read(self, user_id: int, msg_id: int, read: bool = True):
+        self.store.mark_read(user_id, msg_id, read)
+
+    def mark_all_read(self, user_id: int, sender: Optional[int] = None) -> int:
+        """One write for the whole batch; `sender` limits it to that sender's mail."""
+        return self.store.mark_all_read(user_id, sender)
 
     # ---------------- UI ----------------
     class ComposeModal(Modal, title="📨 Compose Message"):
@@ -60,26 +74,98 @@ class Mailbox(commands.Cog):
             await refresh_hub(interaction, "mailbox")
 
     class InboxView(View):
-        def __init__(self, cog, user_id: int):
+        def __init__(self, cog, user_id: int, unread: bool = False, sender: Optional[int] = None,
+                     cursor: Optional[int] = None, trail: Tuple[Optional[int], ...] = (), seen: Optional[int] = None,
+                     guild: Optional[discord.Guild] = None):
+            """
+            Newest first, INBOX_PAGE at a time, optionally unread only and/or from one sender.
+            cursor: last message id of the previous page; trail: earlier page cursors for ⬅ Prev
+            seen: inbox version when the view was opened, to offer a refresh when mail arrives
+            guild: where the view is shown, so senders appear with their nickname there
+            """
             super().__init__(timeout=300)
-            inbox = cog.get_inbox(user_id)
-            if not inbox:
-                self.add_item(Button(label="Inbox Empty", style=discord.ButtonStyle.secondary, disabled=True))
+            self.cog, self.user_id, self.unread, self.sender = cog, user_id, unread, sender
+            self.cursor, self.trail = cursor, trail
+            self.seen = cog.store.version(user_id) if seen is None else seen
+            shown, next_cursor = cog.store.page(user_id, cursor, INBOX_PAGE, unread, sender)
+            if not shown:
+                label = "No unread mail" if unread else "Inbox Empty"
+                self.add_item(Button(label=label, style=discord.ButtonStyle.secondary, disabled=True))
             else:
-                for idx, msg in enumerate(inbox[:5]):  # show up to 5
-                    label = f"{'📩' if not msg['read'] else '📨'} {msg['subject']}"
-                    self.add_item(Mailbox._MsgBtn(cog, user_id, idx, label))
+                names = lookup_names(cog.bot, [msg["from"] for msg in shown], guild)
+                for msg in shown:
+                    label = f"{'📩' if not msg['read'] else '📨'} {msg['subject']} — {names[int(msg['from'])]}"[:80]
+                    self.add_item(Mailbox.InboxView._MsgBtn(cog, user_id, msg["id"], label, self.state()))
+            if trail:
+                self.add_item(Mailbox.InboxView._PageBtn(cog, user_id, "⬅ Prev", self.state(cursor=trail[-1], trail=trail[:-1])))
+            if next_cursor is not None:
+                self.add_item(Mailbox.InboxView._PageBtn(cog, user_id, "Next ➡", self.state(cursor=next_cursor, trail=trail + (cursor,))))
+            toggle = "📬 All mail" if unread else "📩 Unread only"
+            self.add_item(Mailbox.InboxView._PageBtn(cog, user_id, toggle, self.state(unread=not unread, cursor=None, trail=())))
+            if cog.unread_count(user_id):
+                self.add_item(Mailbox.InboxView._ReadAllBtn(cog, user_id, self.state(cursor=None, trail=())))
+            if cog.store.version(user_id) != self.seen:
+                self.add_item(Mailbox.InboxView._PageBtn(cog, user_id, "🔄 New mail — refresh", self.state(cursor=None, trail=(), seen=None)))
+            senders = cog.store.senders_of(user_id)
+            if len(senders) > 1 or sender is not None:
+                self.add_item(Mailbox.InboxView._SenderSelect(cog, user_id, senders, self.state(), guild))
+
+        def state(self, **changes) -> Dict[str, Any]:
+            s = {"unread": self.unread, "sender": self.sender, "cursor": self.cursor, "trail": self.trail, "seen": self.seen}
+            s.update(changes)
+            return s
+
+        class _PageBtn(Button):
+            def __init__(self, cog, user_id: int, label: str, state: Dict[str, Any]):
+                super().__init__(label=label, style=discord.ButtonStyle.secondary)
+                self.cog, self.user_id, self.state = cog, user_id, state
+
+            async def callback(self, interaction: discord.Interaction):
+                await interaction.response.edit_message(view=Mailbox.InboxView(self.cog, self.user_id, guild=interaction.guild, **self.state))
+
+        class _ReadAllBtn(Button):
+            def __init__(self, cog, user_id: int, state: Dict[str, Any]):
+                label = "✅ Mark these read" if state.get("sender") is not None else "✅ Mark all read"
+                super().__init__(label=label, style=discord.ButtonStyle.success)
+                self.cog, self.user_id, self.state = cog, user_id, state
+
+            async def callback(self, interaction: discord.Interaction):
+                self.cog.mark_all_read(self.user_id, self.state.get("sender"))
+                await interaction.response.edit_message(view=Mailbox.InboxView(self.cog, self.user_id, guild=interaction.guild, **self.state))
+
+        class _SenderSelect(Select):
+            def __init__(self, cog, user_id: int, senders: List[int], state: Dict[str, Any],
+                         guild: Optional[discord.Guild] = None):
+                current = state.get("sender")
+                if current is not None and current not in senders:
+                    senders = [current] + senders[:-1]
+                names = lookup_names(cog.bot, senders, guild)
+                options = [discord.SelectOption(label="Everyone", value="all", default=current is None)]
+                options += [
+                    discord.SelectOption(label=f"From {names[f]}"[:100], value=str(f), default=f == current)
+                    for f in senders
+                ]
+                super().__init__(placeholder="Filter by sender", options=options, min_values=1, max_values=1)
+                self.cog, self.user_id, self.state = cog, user_id, state
+
+            async def callback(self, interaction: discord.Interaction):
+                sender = None if self.values[0] == "all" else int(self.values[0])
+                state = dict(self.state, sender=sender, cursor=None, trail=())
+                await interaction.response.edit_message(view=Mailbox.InboxView(self.cog, self.user_id, guild=interaction.guild, **state))
 
         class _MsgBtn(Button):
-            def __init__(self, cog, user_id: int, index: int, label: str):
+            def __init__(self, cog, user_id: int, msg_id: int, label: str, state: Dict[str, Any]):
                 super().__init__(label=label, style=discord.ButtonStyle.primary)
-                self.cog, self.user_id, self.index = cog, user_id, index
+                self.cog, self.user_id, self.msg_id, self.state = cog, user_id, msg_id, state
 
             async def callback(self, interaction: discord.Interaction):
-                msg = self.cog.get_inbox(self.user_id)[self.index]
-                self.cog.mark_read(self.user_id, self.index, True)
-                sender = interaction.guild.get_member(msg["from"]) if interaction.guild else None
-                sender_name = sender.display_name if sender else str(msg["from"])
+                msg = self.cog.get_message(self.user_id, self.msg_id)
+                if msg is None:
+                    return await interaction.response.edit_message(
+                        view=Mailbox.InboxView(self.cog, self.user_id, guild=interaction.guild, **self.state)
+                    )
+                self.cog.mark_read(self.user_id, self.msg_id, True)
+                sender_name = (await resolve_names(self.cog.bot, [msg["from"]], interaction.guild))[int(msg["from"])]
 
                 e = discord.Embed(
                     title=f"📨 {msg['subject']}",
@@ -87,43 +173,46 @@ class Mailbox(commands.Cog):
                     color=discord.Color.blurple()
                 )
                 e.set_footer(text=f"From: {sender_name}")
-                v = Mailbox.MessageActions(self.cog, self.user_id, self.index)
+                v = Mailbox.MessageActions(self.cog, self.user_id, self.msg_id, self.state)
                 await interaction.response.edit_message(embed=e, view=v)
 
     class MessageActions(View):
-        def __init__(self, cog, user_id: int, index: int):
+        def __init__(self, cog, user_id: int, msg_id: int, state: Optional[Dict[str, Any]] = None):
+            """state: the InboxView page to go back to"""
             super().__init__(timeout=180)
-            self.add_item(Mailbox._ReplyBtn(cog, user_id, index))
-            self.add_item(Mailbox._DeleteBtn(cog, user_id, index))
-            self.add_item(Mailbox._BackBtn(cog, user_id))
+            self.add_item(Mailbox.MessageActions._ReplyBtn(cog, user_id, msg_id))
+            self.add_item(Mailbox.MessageActions._DeleteBtn(cog, user_id, msg_id))
+            self.add_item(Mailbox.MessageActions._BackBtn(cog, user_id, state or {}))
 
         class _ReplyBtn(Button):
-            def __init__(self, cog, user_id: int, index: int):
+            def __init__(self, cog, user_id: int, msg_id: int):
                 super().__init__(label="↩️ Reply", style=discord.ButtonStyle.success)
-                self.cog, self.user_id, self.index = cog, user_id, index
+                self.cog, self.user_id, self.msg_id = cog, user_id, msg_id
 
             async def callback(self, interaction: discord.Interaction):
-                msg = self.cog.get_inbox(self.user_id)[self.index]
+                msg = self.cog.get_message(self.user_id, self.msg_id)
+                if msg is None:
+                    return await interaction.response.send_message("⚠️ That message was deleted.", ephemeral=True)
                 modal = Mailbox.ComposeModal(self.cog, self.user_id, msg["from"], subject_prefill=f"Re: {msg['subject']}")
                 await interaction.response.send_modal(modal)
 
         class _DeleteBtn(Button):
-            def __init__(self, cog, user_id: int, index: int):
+            def __init__(self, cog, user_id: int, msg_id: int):
                 super().__init__(label="🗑 Delete", style=discord.ButtonStyle.danger)
-                self.cog, self.user_id, self.index = cog, user_id, index
+                self.cog, self.user_id, self.msg_id = cog, user_id, msg_id
 
             async def callback(self, interaction: discord.Interaction):
-                self.cog.delete_message(self.user_id, self.index)
+                self.cog.delete_message(self.user_id, self.msg_id)
                 await refresh_hub(interaction, "mailbox")
 
         class _BackBtn(Button):
-            def __init__(self, cog, user_id: int):
+            def __init__(self, cog, user_id: int, state: Dict[str, Any]):
                 super().__init__(label="⬅ Back", style=discord.ButtonStyle.secondary)
-                self.cog, self.user_id = cog, user_id
+                self.cog, self.user_id, self.state = cog, user_id, state
 
             async def callback(self, interaction: discord.Interaction):
                 e = discord.Embed(title="📬 Inbox", description="Select a message to view.", color=discord.Color.blurple())
-                v = Mailbox.InboxView(self.cog, self.user_id)
+                v = Mailbox.InboxView(self.cog, self.user_id, guild=interaction.guild, **self.state)
                 await interaction.response.edit_message(embed=e, view=v)
 
     # ---------------- Hub ----------------
@@ -146,7 +235,7 @@ class Mailbox(commands.Cog):
 
         if cid == f"mb_inbox_{uid}":
             e = discord.Embed(title="📬 Inbox", description="Select a message to view.", color=discord.Color.blurple())
-            v = Mailbox.InboxView(self, uid)
+            v = Mailbox.InboxView(self, uid, guild=interaction.guild)
             return await interaction.response.edit_message(embed=e, view=v)
 
 
@@ -1,12 +1,30 @@
+import asyncio
+import logging
+import time
+
 import discord
 from discord.ext import commands
 from discord.ui import View, Button, Modal, TextInput, Select
 from typing import Dict, List, Any, Optional, Tuple
 from utils.data import load_json, save_json
+from utils.listings import Cursor, ListingIndex, PriceCursor, normalize_market
+from utils.prices import APPROX, PRICE_HELP, format_gold, parse_price
+from utils.price_history import DELISTED, LISTED, PriceHistory
+from utils.price_sketch import HIGH, LOW, PriceBands
+from utils.fingerprints import FingerprintIndex, fingerprint
+from utils.wishlists import MatchCounter, WishlistIndex
+from utils.expiry import TTL_HELP, parse_ttl
+from utils.digests import IMMEDIATE, DigestBuffer, render_digest
+from utils.orderbook import ASK, MARKET as MARKET_ORDERS
 from cogs.hub import refresh_hub
+from cogs.expiry import schedule_expiry
+from cogs.members import resolve_names
+
+logger = logging.getLogger("AshesBot")
 
 MARKET_FILE = "data/market.json"
 PROFILE_FILE = "data/profiles.json"
+DIGEST_RETRY = 60  # seconds between flush attempts while the Mailbox cog is missing or failing
 
 def _ci(s: str) -> str:
     return (s or "").strip().casefold()
@@ -17,24 +35,72 @@ class Market(commands.Cog):
     Integrates with Mailbox (if loaded) to auto-notify wishlist owners when
     new listings matching their wishlist are posted.
     Storage layout:
-      market.json = { "user_id": [ { "item","price_str","village","note" }, ... ], ... }
+      market.json = { "user_id": [ { "id","item","price_str","price","price_confidence","village","note" }, ... ], ... }
+      ("price" is gold parsed from price_str at write time, None if unreadable;
+       optional "expires_at" epoch seconds, swept by the Expiry cog)
       profiles.json = { "user_id": { "wishlist": [...] , ... }, ... }
     """
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # { user_id: [ listing, ... ] }
-        self.market: Dict[str, List[Dict[str, Any]]] = load_json(MARKET_FILE, {})
-        # user profiles (for wishlist)
-        self.profiles: Dict[str, Dict[str, Any]] = load_json(PROFILE_FILE, {})
+        # listings by id (+ seller/item/village indexes and sorted browse keys)
+        raw = load_json(MARKET_FILE, {})
+        self.index = ListingIndex()
+        if self.index.rebuild(normalize_market(raw)) or not isinstance(raw, dict):
+            self._save()
+        # item -> wishing users, shared with the Profile cog (which keeps it current)
+        prof_cog = bot.get_cog("Profile")
+        if prof_cog and hasattr(prof_cog, "wishlists"):
+            self.wishlists: WishlistIndex = prof_cog.wishlists
+        else:
+            self.wishlists = WishlistIndex()
+            self.wishlists.rebuild(load_json(PROFILE_FILE, {}))
+        # per-user count of listings on their wishlist (Hub badges)
+        self.matches = MatchCounter(self.wishlists)
+        self.matches.rebuild(l.get("item", "") for _, l in self.index.rows())
+        # content fingerprints of live listings + last post time per (seller, item)
+        self.prints = FingerprintIndex()
+        for seller_id, l in self.index.rows():
+            self.prints.add(self._fingerprint(seller_id, l), l["id"], seller_id, l.get("item", ""), l.get("posted_at"))
+        # price observations + hourly/daily rollups (Trades posts feed it too)
+        self.history = PriceHistory()
+        # per-item p25/median/p75 sketches over every priced listing and trade post
+        self.bands = PriceBands()
+        if self.bands.fresh:
+            for _, l in self.index.rows():
+                self.bands.record(l.get("item", ""), l.get("price"), save=False)
+            self.bands.save()
+        # wishlist fan-out and order-match mail: held until the posting interaction
+        # is answered, then queued for a worker task that writes the mailbox off the event loop
+        self._held_mail: List[Dict[str, Any]] = []
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._mail_task: Optional[asyncio.Task] = None
+        # per-user match buffers for hourly/daily digest subscribers
+        self.digests = DigestBuffer()
+        self._digest_wake = asyncio.Event()
+        self._digest_task: Optional[asyncio.Task] = None
+
+    async def cog_load(self):
+        self._digest_task = asyncio.create_task(self._digest_loop())
+        self._mail_task = asyncio.create_task(self._mail_loop())
+
+    async def cog_unload(self):
+        if self._digest_task:
+            self._digest_task.cancel()
+        if self._mail_task:
+            self._mail_task.cancel()
+        while not self._outbox.empty():
+            self._held_mail.extend(self._outbox.get_nowait())
+        self.release_mail(block=True)
+        self.history.flush()
 
     # ------------------------------- Persist ---------------------------------
     def _save(self):
-        save_json(MARKET_FILE, self.market)
+        save_json(MARKET_FILE, self.index.grouped())
 
     # ------------------------------- Public API ------------------------------
     def get_user_listings(self, user_id: int) -> List[Dict[str, Any]]:
-        return self.market.get(str(user_id), [])
+        return self.index.of_seller(user_id)
 
     def add_listing(
         self,
@@ -43,99 +109,331 @@ class Market(commands.Cog):
         price_str: str,
         village: str = "",
         note: str = "",
-    ) -> Dict[str, Any]:
+        ttl: Optional[float] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        `ttl` (seconds) makes the listing expire; None keeps it until removed.
+        Returns (listing, merged). Reposting a live listing (same item, price
+        and village) merges into it: (that listing, True). Posting the same
+        item again within the cooldown is refused: (None, False), see
+        posting_cooldown.
+        """
+        dup = self.prints.find(fingerprint(user_id, item.strip(), price_str.strip() or "—", village.strip() or "—"))
+        if dup is not None and self.index.get(dup):
+            return self._merge(user_id, self.index.get(dup)[1], note, ttl), True
+        if self.prints.cooldown_left(user_id, item) > 0:
+            return None, False
         listing = {
             "item": item.strip(),
             "price_str": price_str.strip() or "—",
             "village": village.strip() or "—",
             "note": note.strip(),
+            "posted_at": round(time.time(), 3),
         }
-        self.market.setdefault(str(user_id), []).append(listing)
+        if ttl:
+            listing["expires_at"] = round(time.time() + ttl, 3)
+        self.index.add(user_id, listing)
+        self.prints.add(self._fingerprint(user_id, listing), listing["id"], user_id, listing["item"], listing["posted_at"])
+        self.matches.posted_item(listing["item"], +1)
         self._save()
+        self.history.record(listing["item"], listing.get("price"), LISTED)
+        self.bands.record(listing["item"], listing.get("price"))
+        schedule_expiry(self.bot, "market", user_id, listing["id"], listing.get("expires_at"))
         # Try to notify wishlist owners (excluding lister)
         self._notify_wishlist_matches(user_id, listing)
+        # Offer it to the Wanted posts on the trade board
+        trades_cog = self.bot.get_cog("Trades")
+        if trades_cog and hasattr(trades_cog, "match_order"):
+            trades_cog.match_order(MARKET_ORDERS, user_id, ASK, listing)
+        return listing, False
+
+    def _fingerprint(self, seller_id: int, listing: Dict[str, Any]) -> str:
+        return fingerprint(seller_id, listing.get("item", ""), listing.get("price_str", "—"), listing.get("village", "—"))
+
+    def _merge(self, user_id: int, listing: Dict[str, Any], note: str, ttl: Optional[float]) -> Dict[str, Any]:
+        """A repost of a live listing: take its newer note/expiry, no new listing or notifications."""
+        changed = False
+        if note.strip() and note.strip() != listing.get("note"):
+            listing["note"] = note.strip()
+            self.index.reindex_text(listing["id"])
+            changed = True
+        if ttl:
+            listing["expires_at"] = round(time.time() + ttl, 3)
+            schedule_expiry(self.bot, "market", user_id, listing["id"], listing["expires_at"])
+            changed = True
+        if changed:
+            self._save()
         return listing
 
-    def remove_listing(self, user_id: int, item: str) -> bool:
-        cur = self.market.get(str(user_id), [])
-        lowered = _ci(item)
-        new_list = [l for l in cur if _ci(l.get("item","")) != lowered]
-        changed = len(new_list) != len(cur)
-        self.market[str(user_id)] = new_list
-        if changed:
+    def posting_cooldown(self, user_id: int, item: str) -> float:
+        """Seconds before this user can list `item` again."""
+        return self.prints.cooldown_left(user_id, item)
+
+    def remove_listing(self, user_id: int, item: str = "", listing_id: Optional[int] = None) -> bool:
+        """Remove one listing by id, or (older callers) every listing of `item` by this user."""
+        if listing_id is not None:
+            row = self.index.get(listing_id)
+            gone = [row[1]] if row and row[0] == int(user_id) else []
+        else:
+            gone = [self.index.by_id[i][1] for i in self.index.find(seller_id=user_id, item=item)]
+        if not gone:
+            return False
+        self._drop(user_id, gone)
+        for l in gone:
+            self.prints.clear_cooldown(user_id, l.get("item", ""))
+        self._save()
+        return True
+
+    def _drop(self, user_id: int, gone: List[Dict[str, Any]]):
+        """Take listings out of the store and every index; the caller saves."""
+        for l in gone:
+            self.index.remove(l["id"])
+            self.prints.remove(self._fingerprint(user_id, l), l["id"])
+        trades_cog = self.bot.get_cog("Trades")
+        for l in gone:
+            if trades_cog and hasattr(trades_cog, "orders"):
+                trades_cog.orders.remove(MARKET_ORDERS, l["id"])
+            self.matches.posted_item(l.get("item", ""), -1)
+            self.history.record(l.get("item", ""), l.get("price"), DELISTED)
+
+    # ------------------------------- Expiry ----------------------------------
+    def expiring(self) -> List[Tuple[float, int, int]]:
+        """(expires_at, seller_id, listing_id) for every listing with an expiry."""
+        return [
+            (float(l["expires_at"]), uid, lid)
+            for lid, (uid, l) in self.index.by_id.items() if l.get("expires_at")
+        ]
+
+    def expire(self, entries: List[Tuple[int, int, float]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """Remove the due listings that are still live and unchanged, with one save for the batch."""
+        removed: List[Tuple[int, Dict[str, Any]]] = []
+        by_seller: Dict[int, List[Dict[str, Any]]] = {}
+        for seller_id, listing_id, expires_at in entries:
+            row = self.index.get(listing_id)
+            # stale heap entry: removed or renewed since it was scheduled
+            if not row or row[0] != seller_id or float(row[1].get("expires_at") or 0) != expires_at:
+                continue
+            by_seller.setdefault(seller_id, []).append(row[1])
+            removed.append(row)
+        for seller_id, gone in by_seller.items():
+            self._drop(seller_id, gone)
+        if removed:
             self._save()
-        return changed
+        return removed
 
     def _flatten_listings(self) -> List[Tuple[int, Dict[str, Any]]]:
-        out: List[Tuple[int, Dict[str, Any]]] = []
-        for uid, lst in self.market.items():
-            for l in lst:
-                out.append((int(uid), l))
-        return out
+        return self.index.rows()
+
+    def _wishlist_cf(self, user_id: int) -> List[str]:
+        return sorted(self.wishlists.items_of(user_id))
 
     def search_listings(
         self,
         query: str = "",
         wishlist_only_for: Optional[int] = None
     ) -> List[Tuple[int, Dict[str, Any]]]:
-        query_cf = _ci(query)
-        items = self._flatten_listings()
-        if query_cf:
-            items = [(uid, l) for uid, l in items if query_cf in _ci(l.get("item",""))]
-        if wishlist_only_for is not None:
-            wl = [ _ci(w) for w in self.profiles.get(str(wishlist_only_for), {}).get("wishlist", []) ]
-            if wl:
-                items = [(uid, l) for uid, l in items if _ci(l.get("item","")) in wl]
-            else:
-                items = []
-        # Sort by item name asc
-        items.sort(key=lambda t: _ci(t[1].get("item","")))
-        return items
+        """Every matching listing, sorted by item name (read off the index, no re-sort)."""
+        items = self._wishlist_cf(wishlist_only_for) if wishlist_only_for is not None else None
+        rows, _ = self.index.page(None, limit=len(self.index), query=query, items=items)
+        return rows
+
+    def browse_page(
+        self,
+        cursor: Optional[Any] = None,
+        per_page: int = 6,
+        query: str = "",
+        wishlist_only_for: Optional[int] = None,
+        sort: str = "name",
+        max_price: Optional[float] = None,
+        village: str = "",
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], Optional[Any]]:
+        """
+        One page after `cursor`; returns (rows, next_cursor or None).
+        sort="relevance" ranks item/note matches for `query` best first;
+        sort="price" (or any max_price) lists priced listings cheapest first;
+        `village` keeps only listings picked up there.
+        """
+        items = self._wishlist_cf(wishlist_only_for) if wishlist_only_for is not None else None
+        if sort == "relevance" and query.strip():
+            return self.index.page_by_relevance(cursor, limit=per_page, query=query, items=items,
+                                                max_price=max_price, village=village)
+        if sort == "price" or max_price is not None:
+            return self.index.page_by_price(cursor, limit=per_page, query=query, items=items,
+                                            max_price=max_price, village=village)
+        return self.index.page(cursor, limit=per_page, query=query, items=items, village=village)
+
+    def villages(self) -> List[Tuple[str, str, int]]:
+        """[(village_key, display name, listings)] busiest first."""
+        return self.index.villages()
+
+    def price_summary(self, item: str) -> Optional[Dict[str, float]]:
+        """{count, min, median, max} in gold over the item's priced listings."""
+        return self.index.price_summary(item)
+
+    def price_trend_text(self, item: str) -> str:
+        """One line for embeds, e.g. '24h median 1,200g · ▲ 20% vs prior week · range 900g–1,500g (14 seen)'."""
+        t = self.history.trend(item)
+        if not t:
+            return ""
+        parts = []
+        if t["recent"] is not None:
+            parts.append(f"24h median {format_gold(t['recent'])}")
+        elif t["previous"] is not None:
+            parts.append(f"week median {format_gold(t['previous'])}")
+        if t["change"] is not None:
+            arrow = "▲" if t["change"] > 0 else ("▼" if t["change"] < 0 else "■")
+            parts.append(f"{arrow} {abs(t['change']) * 100:.0f}% vs prior week")
+        parts.append(f"range {format_gold(t['low'])}–{format_gold(t['high'])} ({t['count']} seen)")
+        return " · ".join(parts)
+
+    def price_band_text(self, item: str) -> str:
+        """e.g. 'usually 900g–1,500g (median 1,200g, 37 seen)', or '' before there's enough data."""
+        b = self.bands.band(item)
+        if not b:
+            return ""
+        # sketch values are ~2% accurate; three significant figures is all they carry
+        g = {k: format_gold(float(f"{b[k]:.3g}")) for k in ("p25", "median", "p75")}
+        return f"usually {g['p25']}–{g['p75']} (median {g['median']}, {b['count']} seen)"
+
+    def price_flag(self, item: str, price: Optional[float]) -> str:
+        """'🔻' / '🔺' for prices well below / above the item's usual band."""
+        return {LOW: "🔻", HIGH: "🔺"}.get(self.bands.assess(item, price), "")
 
     def get_wishlist_match_count(self, user_id: int) -> int:
-        wl = [ _ci(w) for w in self.profiles.get(str(user_id), {}).get("wishlist", []) ]
-        if not wl:
-            return 0
-        cnt = 0
-        for _, l in self._flatten_listings():
-            if _ci(l.get("item","")) in wl:
-                cnt += 1
-        return cnt
+        return self.matches.count(user_id)
 
     # -------------------------- Mailbox Integration --------------------------
     def _notify_wishlist_matches(self, lister_id: int, listing: Dict[str, Any]):
         """
-        Sends a mailbox message to users whose wishlist contains the posted item.
-        Safe no-op if Mailbox cog is absent.
+        Mails users whose wishlist contains the posted item, as one batched
+        delivery. The messages are held until release_mail(), which the
+        posting modal calls once it has answered the interaction. Safe no-op
+        if Mailbox cog is absent.
         """
-        # Skip if no mailbox
         mail_cog = self.bot.get_cog("Mailbox")
-        if not mail_cog or not hasattr(mail_cog, "send_message"):
+        if not mail_cog or not hasattr(mail_cog, "send_many"):
             return
 
         item_cf = _ci(listing.get("item",""))
         if not item_cf:
             return
 
-        for uid_str, prof in self.profiles.items():
-            uid = int(uid_str)
-            if uid == lister_id:
+        # Only the users who want this item (reverse wishlist index)
+        recipients = sorted(uid for uid in self.wishlists.wishers_of(item_cf) if uid != int(lister_id))
+        if not recipients:
+            return
+        # Digest subscribers get it folded into their next summary instead
+        prof_cog = self.bot.get_cog("Profile")
+        if prof_cog and hasattr(prof_cog, "get_digest_mode"):
+            buffered, opened = [], False
+            for uid in recipients:
+                mode = prof_cog.get_digest_mode(uid)
+                if mode != IMMEDIATE:
+                    buffered.append(uid)
+                    opened = self.digests.add(uid, mode, listing) or opened
+            if buffered:
+                self.digests.save()
+                held = set(buffered)
+                recipients = [uid for uid in recipients if uid not in held]
+                if opened:
+                    self._digest_wake.set()
+            if not recipients:
+                return
+        subject = "Wishlist match in the Market"
+        body = (
+            f"Good news! **{listing.get('item','')}** was just listed on the Market.\n\n"
+            f"**Price:** {listing.get('price_str','—')}\n"
+            f"**Village:** {listing.get('village','—')}\n"
+            f"**Note:** {listing.get('note','') or '—'}\n\n"
+            f"(Open `/home` → Market to view.)"
+        )
+        self._held_mail.extend({"from_id": lister_id, "to_id": uid, "subject": subject, "body": body} for uid in recipients)
+
+    def hold_mail(self, messages: List[Dict[str, Any]]):
+        """Hold mail raised while posting (Trades order matches) for the next release_mail()."""
+        self._held_mail.extend(messages)
+
+    def release_mail(self, block: bool = False):
+        """
+        Hand held mail to the mail worker. Without a running worker
+        (or with block=True, e.g. on unload) it is delivered right here.
+        """
+        messages, self._held_mail = self._held_mail, []
+        if not messages:
+            return
+        if not block and self._mail_task and not self._mail_task.done():
+            self._outbox.put_nowait(messages)
+            return
+        mail_cog = self.bot.get_cog("Mailbox")
+        if mail_cog and hasattr(mail_cog, "send_many"):
+            self._deliver(mail_cog, messages)
+
+    async def _mail_loop(self):
+        """Drain the outbox: everything queued since the last pass goes out as one batch."""
+        while True:
+            messages = await self._outbox.get()
+            while not self._outbox.empty():
+                messages.extend(self._outbox.get_nowait())
+            mail_cog = self.bot.get_cog("Mailbox")
+            if not mail_cog or not hasattr(mail_cog, "send_many_async"):
+                logger.warning("Mailbox unavailable; dropped %d notifications", len(messages))
                 continue
-            wl = prof.get("wishlist", []) or []
-            if any(_ci(x) == item_cf for x in wl):
-                subject = "Wishlist match in the Market"
-                body = (
-                    f"Good news! **{listing.get('item','')}** was just listed on the Market.\n\n"
-                    f"**Price:** {listing.get('price_str','—')}\n"
-                    f"**Village:** {listing.get('village','—')}\n"
-                    f"**Note:** {listing.get('note','') or '—'}\n\n"
-                    f"(Open `/home` → Market to view.)"
-                )
-                try:
-                    mail_cog.send_message(from_id=lister_id, to_id=uid, subject=subject, body=body)  # type: ignore
-                except Exception:
-                    # If DM fails for any reason, ignore silently.
-                    pass
+            try:
+                await mail_cog.send_many_async(messages)
+            except Exception:
+                logger.exception("Notification fan-out failed for %d recipients", len(messages))
+
+    def flush_digests(self, now: Optional[float] = None) -> int:
+        """
+        Mail every digest whose period has closed, in one mailbox write; returns
+        how many went out. Buffers leave the digest file only once the mailbox
+        has taken them: with no Mailbox cog, or a failed send, they stay due.
+        """
+        mail_cog = self.bot.get_cog("Mailbox")
+        if not mail_cog or not hasattr(mail_cog, "send_many"):
+            return 0
+        due = self.digests.pop_due(now)
+        if not due:
+            return 0
+        from_id = self.bot.user.id if self.bot.user else 0
+        messages = []
+        for uid, buf in due:
+            subject, body = render_digest(buf)
+            messages.append({"from_id": from_id, "to_id": uid, "subject": subject, "body": body})
+        try:
+            mail_cog.send_many(messages)
+        except Exception:
+            self.digests.restore(due)
+            raise
+        self.digests.save()
+        return len(messages)
+
+    async def _digest_loop(self):
+        await self.bot.wait_until_ready()
+        stalled = False
+        while True:
+            self._digest_wake.clear()
+            due = self.digests.next_due()
+            timeout = None if due is None else max(0.0, due - time.time())
+            if stalled:
+                timeout = DIGEST_RETRY  # digests are due but can't be mailed yet
+            try:
+                await asyncio.wait_for(self._digest_wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.flush_digests()
+            except Exception:
+                logger.exception("Wishlist digest flush failed")
+            due = self.digests.next_due()
+            stalled = due is not None and due <= time.time()
+
+    @staticmethod
+    def _deliver(mail_cog, messages: List[Dict[str, Any]]):
+        try:
+            mail_cog.send_many(messages)
+        except Exception:
+            logger.exception("Wishlist fan-out failed for %d recipients", len(messages))
 
     # ----------------------------- UI: Modals --------------------------------
     class AddListingModal(Modal, title="💰 Post Market Listing"):
@@ -148,20 +446,42 @@ class Market(commands.Cog):
             self.price_str = TextInput(label="Price", placeholder="e.g. 1500g or 'Offer'", required=False)
             self.village = TextInput(label="Village / Region", placeholder="Optional", required=False)
             self.note = TextInput(label="Note", style=discord.TextStyle.long, placeholder="Optional extra info", required=False)
+            self.expires = TextInput(label="Expires in", placeholder="Optional, e.g. 30m, 12h, 7d, 1mo", required=False)
             self.add_item(self.item)
             self.add_item(self.price_str)
             self.add_item(self.village)
             self.add_item(self.note)
+            self.add_item(self.expires)
 
         async def on_submit(self, interaction: discord.Interaction):
-            self.cog.add_listing(
+            ttl = parse_ttl(self.expires.value)
+            if self.expires.value.strip() and ttl is None:
+                return await interaction.response.send_message(f"⚠️ Can't read “{self.expires.value}” as an expiry. {TTL_HELP}", ephemeral=True)
+            listing, merged = self.cog.add_listing(
                 self.user_id,
                 self.item.value,
                 self.price_str.value or "—",
                 self.village.value or "—",
-                self.note.value or ""
+                self.note.value or "",
+                ttl=ttl,
             )
-            await refresh_hub(interaction, section="market")
+            if listing is None:
+                wait = self.cog.posting_cooldown(self.user_id, self.item.value)
+                return await interaction.response.send_message(
+                    f"⏳ You listed **{self.item.value}** a moment ago. "
+                    f"You can list it again in {max(1, round(wait / 60))} min.",
+                    ephemeral=True,
+                )
+            try:
+                await refresh_hub(interaction, section="market")
+            finally:
+                self.cog.release_mail()  # wishlist and order-match mail goes out after the response
+            if merged:
+                await interaction.followup.send(
+                    f"🔁 You already list **{listing['item']}** at {listing.get('price_str', '—')} "
+                    f"in {listing.get('village', '—')}, so that listing was updated instead of posting it twice.",
+                    ephemeral=True,
+                )
 
     class RemoveListingView(View):
         def __init__(self, cog: "Market", user_id: int):
@@ -173,48 +493,67 @@ class Market(commands.Cog):
                 self.add_item(Button(label="No listings to remove", style=discord.ButtonStyle.secondary, disabled=True))
             else:
                 for l in items[:25]:
-                    name = l.get("item","?")
-                    self.add_item(self._RemoveBtn(self.cog, self.user_id, name))
+                    self.add_item(self._RemoveBtn(self.cog, self.user_id, l))
 
         class _RemoveBtn(Button):
-            def __init__(self, cog: "Market", user_id: int, item_name: str):
-                super().__init__(label=item_name[:80], style=discord.ButtonStyle.danger)
+            def __init__(self, cog: "Market", user_id: int, listing: Dict[str, Any]):
+                label = f"{listing.get('item','?')} — {listing.get('price_str','—')}"
+                super().__init__(label=label[:80], style=discord.ButtonStyle.danger)
                 self.cog = cog
                 self.user_id = user_id
-                self.item_name = item_name
+                self.listing_id = listing["id"]
 
             async def callback(self, interaction: discord.Interaction):
-                self.cog.remove_listing(self.user_id, self.item_name)
+                self.cog.remove_listing(self.user_id, listing_id=self.listing_id)
                 await refresh_hub(interaction, section="market")
 
     # ----------------------------- UI: Browse --------------------------------
     class BrowseView(View):
-        def __init__(self, cog: "Market", user_id: int, mode: str = "all", page: int = 0, query: str = ""):
+        def __init__(self, cog: "Market", user_id: int, mode: str = "all", query: str = "",
+                     cursor: Optional[Any] = None, trail: Tuple[Optional[Any], ...] = (),
+                     sort: str = "name", max_price: Optional[float] = None, village: str = "",
+                     seen: Optional[int] = None):
             """
             mode: "all" or "matches"
+            cursor: last key of the previous page (None = first page)
+            trail: start cursors of the pages before this one, for ⬅ Prev
+            sort: "name", "price" (cheapest first) or "relevance" (best text match, needs a query);
+                  max_price implies "price" unless ranking by relevance
+            village: only listings in this village ("" = anywhere)
+            seen: listings version when the view was opened, to offer a refresh when the board changes
             """
             super().__init__(timeout=300)
             self.cog = cog
             self.user_id = user_id
             self.mode = mode
-            self.page = page
             self.per_page = 6
             self.query = query
+            self.cursor = cursor
+            self.trail = trail
+            self.sort = "price" if max_price is not None and sort != "relevance" else sort
+            self.max_price = max_price
+            self.village = village
+            self.seen = cog.index.version() if seen is None else seen
             self._build()
 
+        def _settings(self, **changes) -> Dict[str, Any]:
+            s = {"mode": self.mode, "query": self.query, "sort": self.sort, "max_price": self.max_price,
+                 "village": self.village, "seen": self.seen}
+            s.update(changes)
+            return s
+
         def _build(self):
             self.clear_items()
             wishlist_only = self.user_id if self.mode == "matches" else None
-            rows = self.cog.search_listings(query=self.query, wishlist_only_for=wishlist_only)
-
-            start = self.page * self.per_page
-            end = start + self.per_page
-            page_rows = rows[start:end]
+            page_rows, next_cursor = self.cog.browse_page(
+                self.cursor, self.per_page, self.query, wishlist_only, self.sort, self.max_price, self.village
+            )
 
             # Listing buttons
-            wl = [ _ci(w) for w in self.cog.profiles.get(str(self.user_id), {}).get("wishlist", []) ]
+            wl = set(self.cog._wishlist_cf(self.user_id))
             for uid, listing in page_rows:
-                label = f"{listing.get('item','?')} — {listing.get('price_str','—')} | {listing.get('village','—')}"
+                flag = self.cog.price_flag(listing.get("item", ""), listing.get("price"))
+                label = f"{listing.get('item','?')} — {flag}{listing.get('price_str','—')} | {listing.get('village','—')}"
                 b = self._ListingBtn(self.cog, self.user_id, uid, listing)
                 # highlight wishlist hits
                 b.style = discord.ButtonStyle.success if _ci(listing.get('item','')) in wl else discord.ButtonStyle.primary
@@ -222,14 +561,31 @@ class Market(commands.Cog):
                 self.add_item(b)
 
             # Pagination
-            if start > 0:
-                self.add_item(self._Prev(self.cog, self.user_id, self.mode, self.page, self.query))
-            if end < len(rows):
-                self.add_item(self._Next(self.cog, self.user_id, self.mode, self.page, self.query))
+            if self.trail:
+                self.add_item(self._Page(self.cog, self.user_id, "⬅ Prev", self._settings(),
+                                         self.trail[-1], self.trail[:-1]))
+            if next_cursor is not None:
+                self.add_item(self._Page(self.cog, self.user_id, "Next ➡", self._settings(),
+                                         next_cursor, self.trail + (self.cursor,)))
+
+            # Sort toggle (back to page one)
+            if self.sort == "price":
+                self.add_item(self._Page(self.cog, self.user_id, "🔤 By name", self._settings(sort="name", max_price=None, seen=None)))
+            else:
+                self.add_item(self._Page(self.cog, self.user_id, "💲 Cheapest first", self._settings(sort="price", seen=None)))
+            if self.query.strip() and self.sort != "relevance":
+                self.add_item(self._Page(self.cog, self.user_id, "🎯 Best match", self._settings(sort="relevance", seen=None)))
+            if self.cog.index.version() != self.seen:
+                self.add_item(self._Page(self.cog, self.user_id, "🔄 Listings changed — refresh", self._settings(seen=None)))
 
             # Optional: small search box
             self.add_item(self._SearchBtn(self.cog, self.user_id, self.mode))
 
+            # Village filter (back to page one)
+            villages = self.cog.villages()
+            if villages or self.village:
+                self.add_item(self._VillageSelect(self.cog, self.user_id, self._settings(), villages))
+
         class _ListingBtn(Button):
             def __init__(self, cog: "Market", user_id: int, seller_id: int, listing: Dict[str, Any]):
                 super().__init__(style=discord.ButtonStyle.primary)
@@ -239,18 +595,37 @@ class Market(commands.Cog):
                 self.listing = listing
 
             async def callback(self, interaction: discord.Interaction):
-                seller = interaction.guild.get_member(self.seller_id) if interaction.guild else None
-                seller_name = seller.display_name if seller else str(self.seller_id)
+                seller_name = (await resolve_names(self.cog.bot, [self.seller_id], interaction.guild))[int(self.seller_id)]
+                price = self.listing.get("price_str", "—")
+                if self.listing.get("price_confidence") == APPROX:
+                    price += f" (≈ {format_gold(self.listing.get('price'))})"
                 e = discord.Embed(
                     title=f"{self.listing.get('item','?')}",
                     description=(
-                        f"**Price:** {self.listing.get('price_str','—')}\n"
+                        f"**Price:** {price}\n"
                         f"**Village:** {self.listing.get('village','—')}\n"
                         f"**Note:** {self.listing.get('note','') or '—'}\n"
                         f"**Seller:** {seller_name}"
                     ),
                     color=discord.Color.teal()
                 )
+                summary = self.cog.price_summary(self.listing.get("item", ""))
+                if summary:
+                    e.add_field(
+                        name="Market price",
+                        value=f"{summary['count']} listed · from {format_gold(summary['min'])} · median {format_gold(summary['median'])}",
+                        inline=False,
+                    )
+                if self.listing.get("expires_at"):
+                    e.add_field(name="Expires", value=f"<t:{int(self.listing['expires_at'])}:R>", inline=True)
+                band = self.cog.price_band_text(self.listing.get("item", ""))
+                if band:
+                    flag = self.cog.bands.assess(self.listing.get("item", ""), self.listing.get("price"))
+                    note = {LOW: "\n🔻 Well below the usual price", HIGH: "\n🔺 Well above the usual price"}.get(flag, "")
+                    e.add_field(name="Fair price", value=band + note, inline=False)
+                trend = self.cog.price_trend_text(self.listing.get("item", ""))
+                if trend:
+                    e.add_field(name="Price trend", value=trend, inline=False)
                 v = View(timeout=180)
                 v.add_item(self._MessageBtn(self.cog, self.user_id, self.seller_id, self.listing))
                 await interaction.response.edit_message(embed=e, view=v)
@@ -277,20 +652,30 @@ class Market(commands.Cog):
                     )
                     await interaction.response.send_modal(mail.ComposeModal(mail, self.from_user_id, self.to_user_id, subject, body))  # type: ignore
 
-        class _Prev(Button):
-            def __init__(self, cog: "Market", user_id: int, mode: str, page: int, query: str):
-                super().__init__(label="⬅ Prev", style=discord.ButtonStyle.secondary)
-                self.cog = cog; self.user_id = user_id; self.mode = mode; self.page = page - 1; self.query = query
+        class _Page(Button):
+            def __init__(self, cog: "Market", user_id: int, label: str, settings: Dict[str, Any],
+                         cursor: Optional[Any] = None, trail: Tuple[Optional[Any], ...] = ()):
+                super().__init__(label=label, style=discord.ButtonStyle.secondary)
+                self.cog = cog; self.user_id = user_id; self.settings = settings
+                self.cursor = cursor; self.trail = trail
             async def callback(self, interaction: discord.Interaction):
-                v = Market.BrowseView(self.cog, self.user_id, self.mode, self.page, self.query)
+                v = Market.BrowseView(self.cog, self.user_id, cursor=self.cursor, trail=self.trail, **self.settings)
                 await interaction.response.edit_message(view=v)
 
-        class _Next(Button):
-            def __init__(self, cog: "Market", user_id: int, mode: str, page: int, query: str):
-                super().__init__(label="Next ➡", style=discord.ButtonStyle.secondary)
-                self.cog = cog; self.user_id = user_id; self.mode = mode; self.page = page + 1; self.query = query
+        class _VillageSelect(Select):
+            def __init__(self, cog: "Market", user_id: int, settings: Dict[str, Any],
+                         villages: List[Tuple[str, str, int]]):
+                current = settings.get("village", "")
+                # Discord needs a non-empty value; "*" can't be mistaken for a village key here
+                options = [discord.SelectOption(label="🌍 Any village", value="*", default=not current)]
+                for key, name, count in villages[:24]:
+                    options.append(discord.SelectOption(label=f"{name} ({count})"[:100], value=key, default=key == current))
+                super().__init__(placeholder="🏘 Filter by village", options=options, min_values=1, max_values=1)
+                self.cog = cog; self.user_id = user_id; self.settings = settings
             async def callback(self, interaction: discord.Interaction):
-                v = Market.BrowseView(self.cog, self.user_id, self.mode, self.page, self.query)
+                village = "" if self.values[0] == "*" else self.values[0]
+                settings = dict(self.settings, village=village, seen=None)
+                v = Market.BrowseView(self.cog, self.user_id, **settings)
                 await interaction.response.edit_message(view=v)
 
         class _SearchBtn(Button):
@@ -304,11 +689,27 @@ class Market(commands.Cog):
         def __init__(self, cog: "Market", user_id: int, mode: str):
             super().__init__(timeout=180)
             self.cog = cog; self.user_id = user_id; self.mode = mode
-            self.query = TextInput(label="Query", placeholder="Item contains...", required=False)
+            self.query = TextInput(label="Query", placeholder="Item or note, e.g. enchanted bulk", required=False)
+            self.max_price = TextInput(label="Max price", placeholder="Optional, e.g. 500g or 1.2k", required=False)
             self.add_item(self.query)
+            self.add_item(self.max_price)
         async def on_submit(self, interaction: discord.Interaction):
-            v = Market.BrowseView(self.cog, self.user_id, self.mode, page=0, query=self.query.value or "")
+            cap, _ = parse_price(self.max_price.value)
+            if self.max_price.value.strip() and cap is None:
+                return await interaction.response.send_message(f"⚠️ Can't read “{self.max_price.value}” as a max price. {PRICE_HELP}", ephemeral=True)
+            query = self.query.value or ""
+            sort = "relevance" if query.strip() else "name"
+            v = Market.BrowseView(self.cog, self.user_id, self.mode, query=query, sort=sort, max_price=cap)
             e = discord.Embed(title="💰 Market — Search Results", color=discord.Color.teal())
+            if cap is not None:
+                e.description = f"Under **{format_gold(cap)}**, " + ("best match first." if query.strip() else "cheapest first.")
+            summary = self.cog.price_summary(self.query.value or "")
+            if summary:
+                e.add_field(
+                    name="Price summary",
+                    value=f"{summary['count']} priced · min {format_gold(summary['min'])} · median {format_gold(summary['median'])}",
+                    inline=False,
+                )
             await interaction.response.edit_message(embed=e, view=v)
 
     # --------------------------- Hub Buttons (section) -----------------------
@@ -343,12 +744,12 @@ class Market(commands.Cog):
 
         if cid == f"mk_match_{uid}":
             e = discord.Embed(title="⭐ Wishlist Matches", description="Listings that match your wishlist.", color=discord.Color.green())
-            v = Market.BrowseView(self, uid, mode="matches", page=0)
+            v = Market.BrowseView(self, uid, mode="matches")
             return await interaction.response.edit_message(embed=e, view=v)
 
         if cid == f"mk_all_{uid}":
             e = discord.Embed(title="💰 Market — All Listings", color=discord.Color.teal())
-            v = Market.BrowseView(self, uid, mode="all", page=0)
+            v = Market.BrowseView(self, uid, mode="all")
             return await interaction.response.edit_message(embed=e, view=v)
 
 
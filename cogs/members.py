@@ -0,0 +1,149 @@
+# cogs/members.py
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import discord
+from discord.ext import commands
+
+NAME_TTL = 15 * 60      # seconds a resolved display name is trusted
+MISS_TTL = 60           # don't re-query ids the guild couldn't resolve for a minute
+QUERY_CHUNK = 100       # Guild.query_members accepts at most 100 user_ids
+
+Key = Tuple[int, int]   # (guild_id or 0, user_id)
+
+
+class Members(commands.Cog):
+    """
+    Display-name cache shared by every list that shows other members
+    (crafters, sellers, trade posters, mail senders).
+      names: { (guild_id, user_id): (display_name, expires_at) }
+    Names are per guild, since a member's nickname differs between servers;
+    guild_id 0 holds global names resolved without a guild, which are never
+    served to a guild lookup. Entries are refreshed by on_member_update /
+    on_user_update, so a rename shows up without waiting for the TTL.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.names: Dict[Key, Tuple[str, float]] = {}
+        self._misses: Dict[Key, float] = {}
+        self._guilds_of: Dict[int, Set[int]] = {}  # user_id -> guild ids cached for them
+
+    def _put(self, key: Key, name: str):
+        self.names[key] = (name, time.monotonic() + NAME_TTL)
+        self._misses.pop(key, None)
+        self._guilds_of.setdefault(key[1], set()).add(key[0])
+
+    def _cached(self, key: Key) -> Optional[str]:
+        hit = self.names.get(key)
+        if hit and hit[1] > time.monotonic():
+            return hit[0]
+        return None
+
+    def _lookup(self, user_ids: Iterable[int], guild: Optional[discord.Guild]) -> Tuple[Dict[int, str], List[int]]:
+        """Names from local state, plus the ids the guild itself didn't resolve."""
+        gid = guild.id if guild else 0
+        out: Dict[int, str] = {}
+        missing: List[int] = []
+        for uid in {int(u) for u in user_ids}:
+            name = self._cached((gid, uid))
+            if name is None and guild is not None:
+                member = guild.get_member(uid)
+                if member is not None:
+                    name = member.display_name
+                    self._put((gid, uid), name)
+            if name is None:
+                if guild is not None:
+                    missing.append(uid)
+                # global name as a stand-in; never cached under the guild
+                name = self._cached((0, uid))
+                if name is None:
+                    user = self.bot.get_user(uid)
+                    if user is not None:
+                        name = user.display_name
+                        self._put((0, uid), name)
+            out[uid] = name if name is not None else str(uid)
+        return out, missing
+
+    # ---------------- Public API ----------------
+    def lookup(self, user_ids: Iterable[int], guild: Optional[discord.Guild] = None) -> Dict[int, str]:
+        """
+        One pass over the ids using only local state (cache, then the gateway
+        member/user cache). Never hits the API; unknown ids map to their id.
+        Pass the interaction's guild so members show with their server nickname.
+        Safe to call while building a View.
+        """
+        return self._lookup(user_ids, guild)[0]
+
+    async def resolve(self, user_ids: Iterable[int], guild: Optional[discord.Guild] = None) -> Dict[int, str]:
+        """lookup(), then one chunked query_members request per 100 ids the guild didn't have."""
+        out, missing = self._lookup(user_ids, guild)
+        if guild is None:
+            return out
+        now = time.monotonic()
+        missing = [uid for uid in missing if self._misses.get((guild.id, uid), 0) <= now]
+        for i in range(0, len(missing), QUERY_CHUNK):
+            chunk = missing[i:i + QUERY_CHUNK]
+            try:
+                found = await guild.query_members(user_ids=chunk, limit=len(chunk), cache=True)
+            except (discord.HTTPException, discord.ClientException, TimeoutError):
+                found = []
+            hit = set()
+            for m in found:
+                self._put((guild.id, m.id), m.display_name)
+                out[m.id] = m.display_name
+                hit.add(m.id)
+            for uid in chunk:
+                if uid not in hit:
+                    self._misses[(guild.id, uid)] = now + MISS_TTL
+        return out
+
+    def forget(self, user_id: int, guild_id: Optional[int] = None):
+        """Drop a user's cached names: one guild's, or everywhere when guild_id is None."""
+        uid = int(user_id)
+        gids = self._guilds_of.get(uid, set())
+        for gid in ([guild_id] if guild_id is not None else list(gids)):
+            self.names.pop((gid, uid), None)
+            gids.discard(gid)
+        if not gids:
+            self._guilds_of.pop(uid, None)
+
+    # ---------------- Listeners ----------------
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        key = (after.guild.id, after.id)
+        if before.display_name != after.display_name or key in self.names:
+            self._put(key, after.display_name)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        # Global name changes show through wherever there's no nickname; nicknames arrive via on_member_update
+        if after.id in self._guilds_of:
+            self.forget(after.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        self.forget(member.id, member.guild.id)
+
+
+def lookup_names(bot: commands.Bot, user_ids: Iterable[int], guild: Optional[discord.Guild] = None) -> Dict[int, str]:
+    """Members.lookup, or a plain get_member/get_user pass if the cog isn't loaded."""
+    cog = bot.get_cog("Members")
+    if cog:
+        return cog.lookup(user_ids, guild)
+    out = {}
+    for uid in {int(u) for u in user_ids}:
+        who = (guild.get_member(uid) if guild else None) or bot.get_user(uid)
+        out[uid] = who.display_name if who else str(uid)
+    return out
+
+
+async def resolve_names(bot: commands.Bot, user_ids: Iterable[int], guild: Optional[discord.Guild] = None) -> Dict[int, str]:
+    cog = bot.get_cog("Members")
+    if cog:
+        return await cog.resolve(user_ids, guild)
+    return lookup_names(bot, user_ids, guild)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Members(bot))
@@ -1,10 +1,13 @@
 # cogs/professions.py
+import time
+
 import discord
 from discord.ext import commands
 from discord.ui import View, Button, Select
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 from utils.data import load_json, save_json
+from utils.crafters import TIERS, TierIndex
 from cogs.hub import refresh_hub
 
 PROFESSIONS_FILE = "data/professions.json"
@@ -15,16 +18,17 @@ ALL_PROFESSIONS = [
     "Mining", "Weaving", "Scribing", "Jewelry"
 ]
 
-TIERS = ["Novice", "Apprentice", "Journeyman", "Master", "Grandmaster"]
-
 
 class Professions(commands.Cog):
     """Handles profession selection and tier progression."""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # { user_id: { "professions": { name: tier } } }
+        # { user_id: { "professions": { name: tier }, "last_active": ts } }
         self.data: Dict[str, Dict[str, Dict[str, str]]] = load_json(PROFESSIONS_FILE, {})
+        # profession -> members, Grandmaster first, then most recently active
+        self.tier_index = TierIndex()
+        self.tier_index.rebuild(self.data)
 
     def save(self):
         save_json(PROFESSIONS_FILE, self.data)
@@ -37,19 +41,62 @@ class Professions(commands.Cog):
         user = self.data.setdefault(str(user_id), {"professions": {}})
         if profession not in user["professions"]:
             user["professions"][profession] = TIERS[0]  # start at Novice
+            self._stamp(user_id)
             self.save()
+            self._sync_crafters(user_id, profession, TIERS[0])
 
     def remove_profession(self, user_id: int, profession: str):
         user = self.data.get(str(user_id), {}).get("professions", {})
         if profession in user:
             del user[profession]
             self.save()
+            self._sync_crafters(user_id, profession, None)
 
     def set_tier(self, user_id: int, profession: str, tier: str):
         user = self.data.setdefault(str(user_id), {"professions": {}})
         if profession in user["professions"]:
             user["professions"][profession] = tier
+            self._stamp(user_id)
             self.save()
+            self._sync_crafters(user_id, profession, tier)
+
+    def touch(self, user_id: int):
+        """
+        Note crafting activity (tier changes, learned recipes) for tie-breaks
+        between members of the same tier. Persisted with the next save.
+        """
+        if str(user_id) not in self.data:
+            return
+        ts = self._stamp(user_id)
+        for prof, tier in self.get_user_professions(user_id).items():
+            self.tier_index.upsert(user_id, prof, tier, ts)
+        rec = self.bot.get_cog("Recipes")
+        if rec and hasattr(rec, "crafters"):
+            rec.crafters.touch(user_id, ts)
+
+    def top_members(self, profession: str, min_tier: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[Tuple[int, str]]:
+        """[(user_id, tier)] best first, optionally only `min_tier` and above."""
+        if min_tier:
+            return self.tier_index.at_least(profession, min_tier, limit)
+        return self.tier_index.ranked(profession, limit)
+
+    def _stamp(self, user_id: int) -> float:
+        ts = time.time()
+        self.data[str(user_id)]["last_active"] = ts
+        return ts
+
+    def _sync_crafters(self, user_id: int, profession: str, tier):
+        """Keep the tier index and the Recipes cog's crafter index in step with tier changes."""
+        active = self.data.get(str(user_id), {}).get("last_active", 0)
+        if tier:
+            self.tier_index.upsert(user_id, profession, tier, active)
+        else:
+            self.tier_index.remove(user_id, profession)
+        rec = self.bot.get_cog("Recipes")
+        if rec and hasattr(rec, "crafters"):
+            rec.crafters.touch(user_id, active)
+            rec.crafters.set_tier(user_id, profession, tier)
 
     # ---------------- Views ----------------
     class AddProfessionView(View):
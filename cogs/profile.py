@@ -5,6 +5,8 @@ from discord.ui import View, Button, Modal, TextInput, Select
 from typing import Dict, Any
 
 from utils.data import load_json, save_json
+from utils.wishlists import WishlistIndex
+from utils.digests import IMMEDIATE, MODES
 from cogs.hub import refresh_hub
 
 PROFILE_FILE = "data/profiles.json"
@@ -21,8 +23,12 @@ class Profile(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # { user_id: { "character_name": str, "primary_class": str, "secondary_class": str, "wishlist": [] } }
+        # { user_id: { "character_name": str, "primary_class": str, "secondary_class": str, "wishlist": [],
+        #              "match_alerts": "immediate" | "hourly" | "daily" } }
         self.profiles: Dict[str, Dict[str, Any]] = load_json(PROFILE_FILE, {})
+        # item -> users wishing for it; Market/Trades count matches on top of it
+        self.wishlists = WishlistIndex()
+        self.wishlists.rebuild(self.profiles)
 
     def save(self):
         save_json(PROFILE_FILE, self.profiles)
@@ -44,6 +50,8 @@ class Profile(commands.Cog):
         if item not in wishlist:
             wishlist.append(item)
             self.save()
+            if self.wishlists.add(user_id, item):
+                self._sync_matches(user_id, item, True)
             return True
         return False
 
@@ -53,9 +61,32 @@ class Profile(commands.Cog):
         if item in wishlist:
             wishlist.remove(item)
             self.save()
+            # Another casing of the same item may still be listed
+            cf = item.strip().casefold()
+            if not any(w.strip().casefold() == cf for w in wishlist) and self.wishlists.remove(user_id, item):
+                self._sync_matches(user_id, item, False)
             return True
         return False
 
+    def _sync_matches(self, user_id: int, item: str, added: bool):
+        """Keep the Market/Trades per-user match counters in step with wishlist edits."""
+        for name in ("Market", "Trades"):
+            cog = self.bot.get_cog(name)
+            if cog and hasattr(cog, "matches"):
+                cog.matches.wish_changed(user_id, item, added)
+
+    def get_digest_mode(self, user_id: int) -> str:
+        """How wishlist-match mail reaches this user; immediate unless they opted into a digest."""
+        mode = self.profiles.get(str(user_id), {}).get("match_alerts", IMMEDIATE)
+        return mode if mode in MODES else IMMEDIATE
+
+    def set_digest_mode(self, user_id: int, mode: str):
+        if mode not in MODES:
+            return
+        profile = self.get_profile(user_id)
+        profile["match_alerts"] = mode
+        self.save()
+
     def set_character_name(self, user_id: int, name: str):
         profile = self.get_profile(user_id)
         profile["character_name"] = name
@@ -105,6 +136,23 @@ class Profile(commands.Cog):
                 self.cog.save()
                 await refresh_hub(interaction, section="profile")
 
+    class MatchAlertsView(View):
+        def __init__(self, cog: "Profile", user_id: int):
+            super().__init__(timeout=240)
+            self.add_item(self._ModeSelect(cog, user_id))
+
+        class _ModeSelect(Select):
+            def __init__(self, cog: "Profile", user_id: int):
+                current = cog.get_digest_mode(user_id)
+                options = [discord.SelectOption(label=label, value=mode, default=mode == current) for mode, label in MODES.items()]
+                super().__init__(placeholder="Wishlist match alerts", options=options, min_values=1, max_values=1)
+                self.cog = cog
+                self.user_id = user_id
+
+            async def callback(self, interaction: discord.Interaction):
+                self.cog.set_digest_mode(self.user_id, self.values[0])
+                await refresh_hub(interaction, section="profile")
+
     class AddWishlistModal(Modal, title="➕ Add Wishlist Item"):
         def __init__(self, cog: "Profile", user_id: int):
             super().__init__(timeout=180)
@@ -149,6 +197,7 @@ class Profile(commands.Cog):
         v.add_item(Button(label="🎭 Set Classes", style=discord.ButtonStyle.primary, custom_id=f"pf_classes_{user_id}"))
         v.add_item(Button(label="➕ Add Wishlist", style=discord.ButtonStyle.success, custom_id=f"pf_addwl_{user_id}"))
         v.add_item(Button(label="🗑 Remove Wishlist", style=discord.ButtonStyle.danger, custom_id=f"pf_remwl_{user_id}"))
+        v.add_item(Button(label="🔔 Match Alerts", style=discord.ButtonStyle.secondary, custom_id=f"pf_alerts_{user_id}"))
         return v
 
     # ==================================================
@@ -185,6 +234,16 @@ class Profile(commands.Cog):
             v = Profile.RemoveWishlistView(self, uid)
             return await interaction.response.edit_message(embed=e, view=v)
 
+        # Wishlist match alert frequency
+        if cid == f"pf_alerts_{uid}":
+            e = discord.Embed(
+                title="🔔 Match Alerts",
+                description="Get a mail for every listing that matches your wishlist, or one summary per hour or day.",
+                color=discord.Color.blurple(),
+            )
+            v = Profile.MatchAlertsView(self, uid)
+            return await interaction.response.edit_message(embed=e, view=v)
+
     # ==================================================
     # Profile Embed
     # ==================================================
@@ -207,6 +266,7 @@ class Profile(commands.Cog):
         # Wishlist
         wishlist = profile.get("wishlist", [])
         e.add_field(name="📌 Wishlist", value="\n".join(wishlist) if wishlist else "*Empty*", inline=False)
+        e.add_field(name="🔔 Match Alerts", value=MODES[self.get_digest_mode(user.id)], inline=False)
 
         # Learned recipes (from Recipes cog)
         rec_cog = self.bot.get_cog("Recipes")
@@ -2,54 +2,39 @@
 import discord
 from discord.ext import commands
 from discord.ui import View, Button, Modal, TextInput, Select
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Set, Tuple
 
 from utils.data import load_json, save_json
+from utils.catalog import (
+    Catalog, CatalogDiff, load_catalog, catalog_from_rows, diff_catalogs, iter_rows, default_source, item_key
+)
+from utils.crafters import CrafterIndex, prof_key, tier_level
 from cogs.hub import refresh_hub
 
-RECIPES_FILE = "data/recipes.json"
-RECIPES_GROUPED_FILE = "data/recipes_grouped.json"
 LEARNED_FILE = "data/learned_recipes.json"
-ARTISAN_FILE = "data/artisan_registry.json"
-
-
-def _normalize_grouped(raw: Any) -> Dict[str, List[Dict[str, str]]]:
-    grouped: Dict[str, List[Dict[str, str]]] = {}
-    if isinstance(raw, dict):
-        for prof, items in raw.items():
-            for r in items or []:
-                grouped.setdefault(prof, []).append({
-                    "name": r.get("name", "Unknown"),
-                    "profession": prof,
-                    "link": r.get("link") or r.get("url") or ""
-                })
-    elif isinstance(raw, list):
-        for r in raw:
-            if isinstance(r, dict):
-                grouped.setdefault(r.get("profession", "Unknown"), []).append({
-                    "name": r.get("name", "Unknown"),
-                    "profession": r.get("profession", "Unknown"),
-                    "link": r.get("link") or r.get("url") or ""
-                })
-    return grouped
+PROFESSIONS_FILE = "data/professions.json"
+PROFILES_FILE = "data/profiles.json"
 
 
 class Recipes(commands.Cog):
-    """Handles recipes, learning/unlearning, searching, and registry sync."""
+    """Handles recipes, learning/unlearning, searching, and the derived crafter index."""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.recipes: List[Dict[str, Any]] = load_json(RECIPES_FILE, [])
-        grouped_raw = load_json(RECIPES_GROUPED_FILE, {})
-        self.grouped = _normalize_grouped(grouped_raw or self.recipes)
+        # Compact snapshot from utils/catalog.py; built in memory if it hasn't been generated yet
+        self.catalog: Catalog = load_catalog() or catalog_from_rows(iter_rows(default_source()))
         self.learned: Dict[str, Dict[str, List[Dict[str, str]]]] = load_json(LEARNED_FILE, {})
-        self.registry: Dict[str, List[int]] = load_json(ARTISAN_FILE, {})
+        # recipe -> crafters; derived from learned + professions, never saved
+        self.crafters = CrafterIndex()
+        self.rebuild_crafters()
 
     def _save_learned(self):
         save_json(LEARNED_FILE, self.learned)
 
-    def _save_registry(self):
-        save_json(ARTISAN_FILE, self.registry)
+    def rebuild_crafters(self):
+        prof_cog = self.bot.get_cog("Professions")
+        professions = prof_cog.data if prof_cog else load_json(PROFESSIONS_FILE, {})
+        self.crafters.rebuild(self.learned, professions)
 
     def get_user_recipes(self, user_id: int):
         return self.learned.get(str(user_id), {})
@@ -62,10 +47,8 @@ class Recipes(commands.Cog):
         bucket.append({"name": name, "link": link})
         bucket.sort(key=lambda x: x["name"])
         self._save_learned()
-        users = self.registry.setdefault(name, [])
-        if user_id not in users:
-            users.append(user_id)
-            self._save_registry()
+        self.crafters.learn(user_id, profession, name)
+        self._touch(user_id)
         return True
 
     def remove_learned_recipe(self, user_id: int, profession: str, name: str) -> bool:
@@ -75,26 +58,180 @@ class Recipes(commands.Cog):
         removed = len(bucket) < before
         if removed:
             self._save_learned()
-            users = self.registry.get(name, [])
-            if user_id in users:
-                users.remove(user_id)
-                if users:
-                    self.registry[name] = users
-                else:
-                    self.registry.pop(name, None)
-                self._save_registry()
+            self.crafters.unlearn(user_id, name)
+            self._touch(user_id)
         return removed
 
+    def _touch(self, user_id: int):
+        prof_cog = self.bot.get_cog("Professions")
+        if prof_cog:
+            prof_cog.touch(user_id)
+
     def search_recipes(self, query: str, professions: Optional[List[str]] = None):
-        q = (query or "").lower().strip()
-        results: List[Dict[str, str]] = []
-        for prof, items in self.grouped.items():
-            if professions and prof not in professions:
+        return self.catalog.search(query, professions=professions, limit=100)
+
+    # ---------------- Planner ----------------
+    def _catalog_profession(self, profession: str) -> Optional[str]:
+        key = prof_key(profession)
+        return next((p for p in self.catalog.by_profession if prof_key(p) == key), None)
+
+    def _guild_wants(self, user_id: int) -> Dict[str, int]:
+        """{ item_key: number of other members with it on their wishlist } (see utils.catalog.item_key)"""
+        prof_cog = self.bot.get_cog("Profile")
+        wishers: Dict[str, Set[int]] = {}
+        if prof_cog and hasattr(prof_cog, "wishlists"):
+            for cf, users in prof_cog.wishlists.wishers.items():
+                wishers.setdefault(item_key(cf), set()).update(users)
+        else:
+            for uid, p in load_json(PROFILES_FILE, {}).items():
+                for w in (p or {}).get("wishlist", []):
+                    if isinstance(w, str):
+                        wishers.setdefault(item_key(w), set()).add(int(uid))
+        me = int(user_id)
+        return {key: len(users) - (me in users) for key, users in wishers.items() if key}
+
+    def plan_craftable(self, user_id: int) -> List[Dict[str, Any]]:
+        """
+        Per profession the user has: catalog recipes at or below the level
+        their tier reaches, each flagged `learned` and `wanted` (number of
+        guildmates wishing for it).
+        """
+        prof_cog = self.bot.get_cog("Professions")
+        profs = prof_cog.get_user_professions(user_id) if prof_cog else load_json(PROFESSIONS_FILE, {}).get(str(user_id), {}).get("professions", {})
+        learned = {r["name"].casefold() for items in self.get_user_recipes(user_id).values() for r in items}
+        wants = self._guild_wants(user_id)
+        levels = self.catalog.levels()
+        plan = []
+        for prof, tier in profs.items():
+            cat_prof = self._catalog_profession(prof)
+            max_level = tier_level(tier, levels)
+            recipes = []
+            for rid in (self.catalog.in_level_range(cat_prof, max_level) if cat_prof else []):
+                r = self.catalog.get(rid)
+                cf = r["name"].casefold()
+                r["learned"] = cf in learned
+                r["wanted"] = wants.get(item_key(r["name"]), 0)
+                recipes.append(r)
+            plan.append({"profession": prof, "catalog_profession": cat_prof, "tier": tier,
+                         "max_level": max_level, "recipes": recipes})
+        return plan
+
+    def build_planner_embed(self, user_id: int) -> discord.Embed:
+        e = discord.Embed(title="🧭 What Can I Craft?", color=discord.Color.teal())
+        plan = self.plan_craftable(user_id)
+        if not plan:
+            e.description = "Add a profession first — the planner works from your professions and tiers."
+            return e
+        for section in plan[:25]:
+            recipes = section["recipes"]
+            head = f"{section['tier']} — up to level {section['max_level']}"
+            if not section["catalog_profession"]:
+                e.add_field(name=f"{section['profession']} ({head})", value="*No recipes in the catalog for this profession.*", inline=False)
                 continue
-            for r in items:
-                if q in r.get("name", "").lower():
-                    results.append(r)
-        return results[:100]
+            n_learned = sum(1 for r in recipes if r["learned"])
+            lines = [f"**{len(recipes)}** craftable · **{n_learned}** learned"]
+            # Guildmates' wants first, then the highest-level recipes still to learn
+            todo = sorted((r for r in recipes if not r["learned"]), key=lambda r: (-r["wanted"], -r["level"], r["name"]))
+            for r in todo[:8]:
+                star = f"⭐ ×{r['wanted']} " if r["wanted"] else ""
+                lines.append(f"• {star}{r['name']} (Lv {r['level']})")
+            wanted_learned = [r for r in recipes if r["learned"] and r["wanted"]]
+            if wanted_learned:
+                lines.append("✅ You already make: " + ", ".join(r["name"] for r in wanted_learned[:5]))
+            value = "\n".join(lines)
+            e.add_field(name=f"{section['profession']} ({head})", value=value[:1024], inline=False)
+        e.set_footer(text="⭐ = on guildmates' wishlists · ✅ = learned and wanted")
+        return e
+
+    # ---------------- Catalog refresh ----------------
+    def reload_catalog(self) -> Optional[Tuple[CatalogDiff, Dict[str, Any]]]:
+        """
+        Diff the freshly built catalog.json against the live catalog and apply
+        only the delta: search index, crafter index and learned references.
+        Returns (delta, report) or None if no snapshot is available.
+        """
+        new = load_catalog()
+        if new is None:
+            return None
+        delta = diff_catalogs(self.catalog, new)
+        report: Dict[str, Any] = {"learned_renamed": 0, "moved": 0, "restored": 0, "flagged": []}
+        if not delta:
+            return delta, report
+        self.catalog.apply_delta(delta)
+        report = self._apply_delta_to_learned(delta)
+        return delta, report
+
+    def _learned_entries(self, user_id: str, name: str):
+        """Yield a user's learned entries for `name` (case-insensitive), across professions."""
+        cf = name.casefold()
+        for bucket in self.learned.get(user_id, {}).values():
+            for r in bucket:
+                if r.get("name", "").casefold() == cf:
+                    yield r
+
+    def _rebucket(self, user_id: str, name: str, profession: str) -> int:
+        """Move a user's learned `name` from whatever bucket it is in to `profession`'s."""
+        buckets = self.learned.get(user_id, {})
+        cf = name.casefold()
+        moved = 0
+        for prof in list(buckets):
+            if prof == profession:
+                continue
+            bucket = buckets[prof]
+            hits = [r for r in bucket if r.get("name", "").casefold() == cf]
+            if not hits:
+                continue
+            target = buckets.setdefault(profession, [])
+            if not any(r.get("name", "").casefold() == cf for r in target):
+                target.append(hits[0])
+                target.sort(key=lambda x: x["name"])
+            bucket[:] = [r for r in bucket if r.get("name", "").casefold() != cf]
+            if not bucket:
+                del buckets[prof]
+            moved += 1
+        return moved
+
+    def _apply_delta_to_learned(self, delta: CatalogDiff) -> Dict[str, Any]:
+        """
+        Only recipes touched by the delta are visited, found through the
+        crafter index. Learned recipes that vanished from the
+        catalog are flagged with "missing" rather than dropped.
+        """
+        report: Dict[str, Any] = {"learned_renamed": 0, "moved": 0, "restored": 0, "flagged": []}
+
+        for old, new in delta.renamed:
+            for uid in self.crafters.users_of(old["name"]):
+                for r in self._learned_entries(str(uid), old["name"]):
+                    r["name"], r["link"] = new["name"], new["link"]
+                    r.pop("missing", None)
+                    report["learned_renamed"] += 1
+            self.crafters.rename(old["name"], new["name"], new["profession"])
+
+        # recipes that changed profession move to the new profession's bucket
+        for old, new in delta.renamed + delta.level_changed:
+            if old["profession"] == new["profession"]:
+                continue
+            for uid in self.crafters.users_of(new["name"]):
+                report["moved"] += self._rebucket(str(uid), new["name"], new["profession"])
+            self.crafters.set_profession(new["name"], new["profession"])
+
+        for old in delta.removed:
+            for uid in self.crafters.users_of(old["name"]):
+                for r in self._learned_entries(str(uid), old["name"]):
+                    if not r.get("missing"):
+                        r["missing"] = True
+                        report["flagged"].append((int(uid), old["name"]))
+
+        for new in delta.added:
+            for uid in self.crafters.users_of(new["name"]):
+                for r in self._learned_entries(str(uid), new["name"]):
+                    if r.pop("missing", None):
+                        r["link"] = new["link"]
+                        report["restored"] += 1
+
+        if report["learned_renamed"] or report["moved"] or report["flagged"] or report["restored"]:
+            self._save_learned()
+        return report
 
     # ---------------- UI ----------------
     class LearnRecipeModal(Modal, title="📗 Learn a Recipe"):
@@ -196,6 +333,7 @@ class Recipes(commands.Cog):
         v.add_item(Button(label="📗 Learn", style=discord.ButtonStyle.success, custom_id=f"rc_learn_{user_id}"))
         v.add_item(Button(label="📘 Learned", style=discord.ButtonStyle.primary, custom_id=f"rc_learned_{user_id}"))
         v.add_item(Button(label="🔍 Search", style=discord.ButtonStyle.secondary, custom_id=f"rc_search_{user_id}"))
+        v.add_item(Button(label="🧭 What Can I Craft?", style=discord.ButtonStyle.secondary, custom_id=f"rc_plan_{user_id}"))
         return v
 
     @commands.Cog.listener()
@@ -212,6 +350,8 @@ class Recipes(commands.Cog):
             return await interaction.response.edit_message(embed=e, view=v)
         if cid == f"rc_search_{uid}":
             return await interaction.response.send_modal(Recipes.SearchRecipeModal(self, uid))
+        if cid == f"rc_plan_{uid}":
+            return await interaction.response.edit_message(embed=self.build_planner_embed(uid), view=None)
 
 
 async def setup(bot: commands.Bot):
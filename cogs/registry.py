@@ -1,15 +1,14 @@
-import json
-import os
 import discord
 from discord.ext import commands
 from discord.ui import View, Button, Modal, TextInput, Select
 from typing import Dict, List, Any, Optional, Tuple
-from utils.data import load_json, save_json
+from utils.data import load_json
+from utils.crafters import CrafterIndex
 from cogs.hub import refresh_hub
+from cogs.members import lookup_names, resolve_names
 
-REGISTRY_FILE = "data/artisan_registry.json"
-RECIPES_FILE = "data/recipes.json"
 PROFILES_FILE = "data/profiles.json"
+CRAFTER_LIMIT = 25  # one select menu's worth
 
 def _norm(s: str) -> str:
     return (s or "").strip().lower()
@@ -20,135 +19,99 @@ def _short(s: str, n: int = 80) -> str:
 class Registry(commands.Cog):
     """
     Guild Recipe Registry
-    Tracks: recipe -> { profession, users: [ {id, name, tier} ] }
+    Read-only view over the Recipes cog's crafter index:
+      recipe -> { profession, users: [ {id, name, tier} ] }
     """
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.registry: Dict[str, Dict[str, Any]] = load_json(REGISTRY_FILE, {})
-        self.recipes: List[Dict[str, Any]] = load_json(RECIPES_FILE, [])
-        self.profiles: Dict[str, Any] = load_json(PROFILES_FILE, {})
-
-    # -----------------------------
-    # Persistence
-    # -----------------------------
-    def _save(self):
-        save_json(REGISTRY_FILE, self.registry)
 
     # -----------------------------
     # Helpers
     # -----------------------------
+    def _recipes(self):
+        return self.bot.get_cog("Recipes")
+
+    def _index(self) -> Optional[CrafterIndex]:
+        rec = self._recipes()
+        return rec.crafters if rec else None
+
+    def _profiles(self) -> Dict[str, Any]:
+        prof = self.bot.get_cog("Profile")
+        return prof.profiles if prof else load_json(PROFILES_FILE, {})
+
     def _resolve_profession_for_recipe(self, recipe_name: str) -> Optional[str]:
-        """Find profession for a recipe via recipes.json (case-insensitive)."""
-        rn = _norm(recipe_name)
-        for r in self.recipes:
-            if _norm(r.get("name", "")) == rn:
-                return r.get("profession") or r.get("prof") or "Unknown"
-        # fallback: substring match
-        for r in self.recipes:
-            if rn in _norm(r.get("name", "")):
-                return r.get("profession") or r.get("prof") or "Unknown"
-        return None
-
-    def _get_user_prof_tier(self, user_id: int, profession: str) -> Optional[str]:
-        """Ask Professions cog for user's tier in a profession (string)."""
-        pro = self.bot.get_cog("Professions")
-        if not pro or not hasattr(pro, "get_user_professions"):
+        """Find profession for a recipe via the catalog (exact name first, then best word match)."""
+        rec = self._recipes()
+        if not rec:
             return None
-        try:
-            profs = pro.get_user_professions(user_id)  # expected: [{name, tier|level}]
-            for p in profs or []:
-                if _norm(p.get("name", "")) == _norm(profession):
-                    # prefer tier, fall back to level
-                    return str(p.get("tier") or p.get("level") or "")
-        except Exception:
-            pass
-        return None
-
-    def _upsert_entry(self, recipe_name: str, profession: str) -> Dict[str, Any]:
-        key = recipe_name
-        entry = self.registry.setdefault(key, {"profession": profession or "Unknown", "users": []})
-        # keep canonical profession once set
-        if profession and entry.get("profession") in (None, "", "Unknown"):
-            entry["profession"] = profession
+        hits = rec.catalog.search(recipe_name, limit=25)
+        for r in hits:
+            if _norm(r["name"]) == _norm(recipe_name):
+                return r["profession"]
+        return hits[0]["profession"] if hits else None
+
+    async def _fill_names(self, entry: Dict[str, Any], guild: Optional[discord.Guild]) -> Dict[str, Any]:
+        """Resolve every crafter name in the entry in one pass, querying the guild for misses."""
+        names = await resolve_names(self.bot, [u["id"] for u in entry.get("users", [])], guild)
+        for u in entry.get("users", []):
+            u["name"] = names[int(u["id"])]
         return entry
 
-    def _remove_user_from_entry(self, entry: Dict[str, Any], user_id: int):
-        entry["users"] = [u for u in entry.get("users", []) if int(u.get("id", 0)) != int(user_id)]
+    def _entry(self, recipe_name: str, limit: int = CRAFTER_LIMIT, guild: Optional[discord.Guild] = None) -> Dict[str, Any]:
+        """
+        Registry entry in display shape, resolved from the index at read time.
+        Only the best `limit` crafters are resolved (already ranked by tier,
+        then activity); `count` is the full number.
+        """
+        index = self._index()
+        entry = index.get(recipe_name) if index else None
+        if not entry:
+            return {"profession": self._resolve_profession_for_recipe(recipe_name) or "Unknown", "users": [], "count": 0}
+        crafters = index.crafters(recipe_name, limit=limit)
+        names = lookup_names(self.bot, [c["id"] for c in crafters], guild)
+        users = [
+            {"id": c["id"], "name": names[c["id"]], **({"tier": c["tier"]} if c["tier"] else {})}
+            for c in crafters
+        ]
+        return {"profession": entry["profession"], "users": users, "count": len(entry["users"])}
 
     def _find_recipe_candidates(self, query: str) -> List[str]:
-        q = _norm(query)
         names = set()
-        for r in self.recipes:
-            name = r.get("name")
-            if name and q in _norm(name):
-                names.add(name)
-        # if already tracked in registry but not in recipes.json, include those too
-        for tracked in self.registry.keys():
-            if q in _norm(tracked):
-                names.add(tracked)
+        rec = self._recipes()
+        if rec:
+            names.update(r["name"] for r in rec.catalog.search(query, limit=100))
+        # learned recipes that are no longer in the catalog still have crafters
+        index = self._index()
+        if index:
+            names.update(index.names_matching(query))
         return sorted(names)
 
     # -----------------------------
     # Public API (call from other cogs)
     # -----------------------------
-    def index_learn(self, user_id: int, recipe_name: str, profession: Optional[str] = None):
-        """
-        Add a user as a crafter for a recipe. Profession auto-resolves if omitted.
-        Tier is pulled from Professions cog if available.
-        """
-        profession = profession or self._resolve_profession_for_recipe(recipe_name) or "Unknown"
-        tier = self._get_user_prof_tier(user_id, profession) or ""
-        user = self.bot.get_user(user_id)
-        display = user.display_name if user else str(user_id)
-
-        entry = self._upsert_entry(recipe_name, profession)
-        # prevent duplicates
-        for u in entry["users"]:
-            if int(u.get("id", 0)) == int(user_id):
-                # update name/tier if changed
-                u["name"] = display
-                if tier:
-                    u["tier"] = tier
-                self._save()
-                return
-
-        entry["users"].append({"id": int(user_id), "name": display, **({"tier": tier} if tier else {})})
-        # sort users by name for stable display
-        entry["users"].sort(key=lambda x: _norm(x.get("name", "")))
-        self._save()
-
-    def unindex_learn(self, user_id: int, recipe_name: str):
-        """Remove a user's ability entry for a recipe."""
-        entry = self.registry.get(recipe_name)
-        if not entry:
-            return
-        self._remove_user_from_entry(entry, user_id)
-        # cleanup empty
-        if not entry.get("users"):
-            self.registry.pop(recipe_name, None)
-        self._save()
-
-    def search_registry(self, recipe_query: str) -> List[Tuple[str, Dict[str, Any]]]:
+    def search_registry(self, recipe_query: str, guild: Optional[discord.Guild] = None) -> List[Tuple[str, Dict[str, Any]]]:
         """Return [(recipe_name, entry)] matching the query, registry-first."""
         names = self._find_recipe_candidates(recipe_query)
-        out: List[Tuple[str, Dict[str, Any]]] = []
-        for name in names:
-            entry = self.registry.get(name) or {"profession": self._resolve_profession_for_recipe(name) or "Unknown", "users": []}
-            out.append((name, entry))
-        return out
+        index = self._index()
+        # exact name first, then recipes somebody can craft
+        q = _norm(recipe_query)
+        names.sort(key=lambda n: (_norm(n) != q, not (index and index.get(n)), _norm(n)))
+        return [(name, self._entry(name, guild=guild)) for name in names]
 
-    def wishlist_matches_for(self, user_id: int) -> List[Tuple[str, Dict[str, Any]]]:
+    def wishlist_matches_for(self, user_id: int, guild: Optional[discord.Guild] = None) -> List[Tuple[str, Dict[str, Any]]]:
         """Return [(wishlist_item, entry)] where someone can craft it."""
-        profile = self.profiles.get(str(user_id), {})
+        index = self._index()
+        if not index:
+            return []
+        profile = self._profiles().get(str(user_id), {})
         wl = [w for w in profile.get("wishlist", []) if isinstance(w, str)]
         matches: List[Tuple[str, Dict[str, Any]]] = []
         for item in wl:
-            entry = self.registry.get(item)
-            if entry and entry.get("users"):
-                matches.append((item, entry))
+            if index.get(item):
+                matches.append((item, self._entry(item, guild=guild)))
         # Sort: items with more crafters first, then by name
-        matches.sort(key=lambda x: (-len(x[1].get("users", [])), _norm(x[0])))
+        matches.sort(key=lambda x: (-x[1].get("count", 0), _norm(x[0])))
         return matches
 
     # -----------------------------
@@ -173,13 +136,14 @@ class Registry(commands.Cog):
             self.add_item(self.query)
 
         async def on_submit(self, interaction: discord.Interaction):
-            results = self.cog.search_registry(self.query.value)
+            results = self.cog.search_registry(self.query.value, interaction.guild)
             if not results:
                 e = discord.Embed(title="🔍 Results", description=f"No matches for **{self.query.value}**.", color=discord.Color.red())
                 return await interaction.response.edit_message(embed=e, view=None)
 
             # Show top result fully, list others briefly
             name, entry = results[0]
+            await self.cog._fill_names(entry, interaction.guild)
             e = discord.Embed(
                 title=f"📜 {name}",
                 description=f"**Profession:** {entry.get('profession','Unknown')}",
@@ -191,8 +155,9 @@ class Registry(commands.Cog):
                 e.add_field(name="Crafters", value="*Nobody registered yet.*", inline=False)
             else:
                 lines = [f"• **{u.get('name','Unknown')}**{(' — Tier ' + str(u.get('tier'))) if u.get('tier') else ''}" for u in users[:10]]
-                if len(users) > 10:
-                    lines.append(f"…and {len(users)-10} more")
+                total = entry.get("count", len(users))
+                if total > 10:
+                    lines.append(f"…and {total-10} more")
                 e.add_field(name="Crafters", value="\n".join(lines), inline=False)
 
             # If there are registered crafters, offer a selector to message one
@@ -227,19 +192,19 @@ class Registry(commands.Cog):
             await interaction.response.send_modal(modal)
 
     class WishlistMatchesView(View):
-        def __init__(self, cog: "Registry", user_id: int):
+        def __init__(self, cog: "Registry", user_id: int, guild: Optional[discord.Guild] = None):
             super().__init__(timeout=240)
             self.cog = cog
             self.user_id = user_id
 
-            matches = self.cog.wishlist_matches_for(user_id)
+            matches = self.cog.wishlist_matches_for(user_id, guild)
             if not matches:
                 self.add_item(Button(label="No wishlist matches", style=discord.ButtonStyle.secondary, disabled=True))
             else:
                 # Build a select: each option is "Item — N crafters"
                 options: List[discord.SelectOption] = []
                 for item, entry in matches[:25]:
-                    cnt = len(entry.get("users", []))
+                    cnt = entry.get("count", 0)
                     options.append(discord.SelectOption(label=_short(f"{item} — {cnt} crafter(s)"), value=item))
                 self.add_item(Registry._MatchSelect(self.cog, self.user_id, options))
 
@@ -251,7 +216,7 @@ class Registry(commands.Cog):
 
         async def callback(self, interaction: discord.Interaction):
             item = self.values[0]
-            entry = self.cog.registry.get(item, {"profession": self.cog._resolve_profession_for_recipe(item) or "Unknown", "users": []})
+            entry = await self.cog._fill_names(self.cog._entry(item, guild=interaction.guild), interaction.guild)
             users = entry.get("users", [])
             e = discord.Embed(
                 title=f"📜 {item}",
@@ -264,8 +229,9 @@ class Registry(commands.Cog):
 
             # Show crafters, add a select to message one
             lines = [f"• **{u.get('name','Unknown')}**{(' — Tier ' + str(u.get('tier'))) if u.get('tier') else ''}" for u in users[:10]]
-            if len(users) > 10:
-                lines.append(f"…and {len(users)-10} more")
+            total = entry.get("count", len(users))
+            if total > 10:
+                lines.append(f"…and {total-10} more")
             e.add_field(name="Crafters", value="\n".join(lines), inline=False)
 
             v = View(timeout=240)
@@ -297,34 +263,42 @@ class Registry(commands.Cog):
 
         # Wishlist matches
         if cid == f"reg_wishlist_{uid}":
-            matches = self.wishlist_matches_for(uid)
+            matches = self.wishlist_matches_for(uid, interaction.guild)
             e = discord.Embed(
                 title="📜 Wishlist Matches",
                 description=("Select one of your wishlist items that has available crafters." if matches else "No matches yet."),
                 color=discord.Color.green() if matches else discord.Color.red(),
             )
-            v = Registry.WishlistMatchesView(self, uid)
+            v = Registry.WishlistMatchesView(self, uid, interaction.guild)
             return await interaction.response.edit_message(embed=e, view=v)
 
         # Overview / Stats
         if cid == f"reg_artisans_{uid}":
-            n_recipes = len(self.registry)
-            unique_users = set()
-            profs = set()
-            for name, entry in self.registry.items():
-                profs.add(entry.get("profession", "Unknown"))
-                for u in entry.get("users", []):
-                    unique_users.add(int(u.get("id", 0)))
+            index = self._index()
+            n_recipes = len(index) if index else 0
+            n_users = index.user_count() if index else 0
+            profs = index.professions() if index else set()
 
             e = discord.Embed(
                 title="🧑‍🎨 Guild Artisans — Overview",
                 color=discord.Color.blurple(),
                 description=(
                     f"• **{n_recipes}** recipes tracked\n"
-                    f"• **{len(unique_users)}** artisans registered\n"
+                    f"• **{n_users}** artisans registered\n"
                     f"• **{len(profs)}** professions represented"
                 ),
             )
+            prof_cog = self.bot.get_cog("Professions")
+            if prof_cog:
+                tops = [(prof, prof_cog.top_members(prof, limit=3)) for prof in sorted(prof_cog.tier_index.members)[:25]]
+                names = await resolve_names(self.bot, [m for _, top in tops for m, _ in top], interaction.guild)
+                for prof, top in tops:
+                    if top:
+                        e.add_field(
+                            name=prof.title(),
+                            value="\n".join(f"• {names[m]} — {t}" for m, t in top),
+                            inline=True,
+                        )
             return await interaction.response.edit_message(embed=e, view=None)
 
     # (Optional) Trigger registry refresh from Hub after external updates
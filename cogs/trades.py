@@ -1,45 +1,237 @@
 # cogs/trades.py
+import time
+
 import discord
 from discord.ext import commands
 from discord.ui import View, Button, Modal, TextInput, Select
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 from utils.data import load_json, save_json
+from utils.listings import BoardIndex
+from utils.wishlists import MatchCounter, WishlistIndex
+from utils.prices import parse_price
+from utils.price_history import TRADE
+from utils.expiry import TTL_HELP, parse_ttl
+from utils.fingerprints import FingerprintIndex, fingerprint
+from utils.orderbook import ASK, BID, MARKET, TRADE as TRADE_ORDERS, Match, OrderBooks
 from cogs.hub import refresh_hub
+from cogs.members import lookup_names, resolve_names
+from cogs.expiry import schedule_expiry
 
 TRADES_FILE = "data/trades.json"
 PROFILE_FILE = "data/profiles.json"
 
 
+def _side(trade: Dict[str, Any]) -> str:
+    return BID if trade.get("type") == "Wanted" else ASK
+
+
 class Trades(commands.Cog):
     """Guild-wide trade board for offers, requests, and wishlist integration."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.trades: Dict[str, List[Dict[str, Any]]] = load_json(TRADES_FILE, {})
+        # posts by id, indexed by poster, item and type
+        # trades.json = { user_id: [ {id, type, item, price, note, posted_at, expires_at?} ] }
+        self.store = BoardIndex()
+        if self.store.load(load_json(TRADES_FILE, {})):
+            self._save()
+        # content fingerprints of live posts + last post time per (poster, item)
+        self.prints = FingerprintIndex()
+        for uid, t in self.store.rows():
+            self.prints.add(self._fingerprint(uid, t), t["id"], uid, t.get("item", ""), t.get("posted_at"), t.get("type", ""))
         self.profiles: Dict[str, Dict[str, Any]] = load_json(PROFILE_FILE, {})
+        prof_cog = bot.get_cog("Profile")
+        if prof_cog and hasattr(prof_cog, "wishlists"):
+            self.wishlists: WishlistIndex = prof_cog.wishlists
+        else:
+            self.wishlists = WishlistIndex()
+            self.wishlists.rebuild(self.profiles)
+        # per-user count of trade posts on their wishlist (Hub badges)
+        self.matches = MatchCounter(self.wishlists)
+        self.matches.rebuild(t.get("item", "") for _, t in self.store.rows())
+        # per-item books of priced Wanted (bids) vs For Sale posts and Market listings (asks)
+        self.orders = OrderBooks()
+        for uid, t in self.store.rows():
+            self.orders.add(OrderBooks.make_order(TRADE_ORDERS, uid, _side(t), t))
+        mkt = bot.get_cog("Market")
+        if mkt and hasattr(mkt, "index"):
+            for lid, (seller_id, listing) in mkt.index.by_id.items():
+                self.orders.add(OrderBooks.make_order(MARKET, seller_id, ASK, listing))
+        # reference-price sketches live on the Market; seed them with posts on their first run
+        if mkt and getattr(mkt, "bands", None) and mkt.bands.fresh:
+            for _, t in self.store.rows():
+                mkt.bands.record(t.get("item", ""), parse_price(t.get("price"))[0], save=False)
+            mkt.bands.save()
 
     def _save(self):
-        save_json(TRADES_FILE, self.trades)
+        save_json(TRADES_FILE, self.store.grouped())
 
     # ---------------- Public API ----------------
     def get_user_trades(self, user_id: int) -> List[Dict[str, Any]]:
-        return self.trades.get(str(user_id), [])
+        return self.store.of_seller(user_id)
 
-    def add_trade(self, user_id: int, ttype: str, item: str, price: str, note: str) -> Dict[str, Any]:
-        entry = {"type": ttype, "item": item, "price": price, "note": note}
-        self.trades.setdefault(str(user_id), []).append(entry)
+    def add_trade(self, user_id: int, ttype: str, item: str, price: str, note: str,
+                  ttl: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Returns (post, merged). Reposting a live post (same type, item and
+        price) merges into it: (that post, True). Posting the same item as the
+        same type again within the cooldown is refused: (None, False).
+        """
+        entry = {"type": ttype, "item": item, "price": price, "note": note, "posted_at": round(time.time(), 3)}
+        dup = self.prints.find(self._fingerprint(user_id, entry))
+        if dup is not None and self.store.get(dup):
+            return self._merge(user_id, self.store.get(dup)[1], note, ttl), True
+        if self.prints.cooldown_left(user_id, item, kind=ttype) > 0:
+            return None, False
+        if ttl:
+            entry["expires_at"] = round(time.time() + ttl, 3)
+        self.store.add(user_id, entry)
+        self.prints.add(self._fingerprint(user_id, entry), entry["id"], user_id, item, entry["posted_at"], ttype)
+        self.matches.posted_item(item, +1)
         self._save()
-        return entry
+        # Trade prices feed the market price history too
+        mkt = self.bot.get_cog("Market")
+        if mkt and hasattr(mkt, "history"):
+            mkt.history.record(item, parse_price(price)[0], TRADE)
+        if mkt and hasattr(mkt, "bands"):
+            mkt.bands.record(item, parse_price(price)[0])
+        schedule_expiry(self.bot, "trades", user_id, entry["id"], entry.get("expires_at"))
+        self.match_order(TRADE_ORDERS, user_id, _side(entry), entry)
+        return entry, False
+
+    @staticmethod
+    def _fingerprint(user_id: int, trade: Dict[str, Any]) -> str:
+        return fingerprint(user_id, trade.get("item", ""), trade.get("price", "—"), trade.get("type", ""))
+
+    def _merge(self, user_id: int, trade: Dict[str, Any], note: str, ttl: Optional[float]) -> Dict[str, Any]:
+        """A repost of a live post: take its newer note/expiry, nothing else."""
+        changed = False
+        if note.strip() and note.strip() != trade.get("note"):
+            trade["note"] = note.strip()
+            self.store.reindex_text(trade["id"])
+            changed = True
+        if ttl:
+            trade["expires_at"] = round(time.time() + ttl, 3)
+            schedule_expiry(self.bot, "trades", user_id, trade["id"], trade["expires_at"])
+            changed = True
+        if changed:
+            self._save()
+        return trade
+
+    def posting_cooldown(self, user_id: int, item: str, ttype: str = "") -> float:
+        """Seconds before this user can post `item` as `ttype` again."""
+        return self.prints.cooldown_left(user_id, item, kind=ttype)
 
-    def remove_trade(self, user_id: int, item: str):
-        self.trades[str(user_id)] = [
-            t for t in self.trades.get(str(user_id), []) if t["item"].lower() != item.lower()
-        ]
+    def remove_trade(self, user_id: int, trade_id: int) -> bool:
+        """Remove one post by id (other posts of the same item stay up)."""
+        row = self.store.get(trade_id)
+        if not row or row[0] != int(user_id):
+            return False
+        self._drop(trade_id)
+        self.prints.clear_cooldown(user_id, row[1].get("item", ""), row[1].get("type", ""))
         self._save()
+        return True
+
+    def _drop(self, trade_id: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Take a post out of the store and every index; the caller saves."""
+        row = self.store.remove(trade_id)
+        if row:
+            self.prints.remove(self._fingerprint(*row), trade_id)
+            self.matches.posted_item(row[1]["item"], -1)
+            self.orders.remove(TRADE_ORDERS, trade_id)
+        return row
+
+    def get_wishlist_match_count(self, user_id: int) -> int:
+        return self.matches.count(user_id)
+
+    # ---------------- Order matching ----------------
+    def match_order(self, source: str, owner_id: int, side: str, entry: Dict[str, Any]) -> List[Match]:
+        """Book a new post/listing and mail both sides of every Wanted/For Sale pair it completes."""
+        found = self.orders.add(OrderBooks.make_order(source, owner_id, side, entry))
+        if found:
+            self._notify_order_matches(found)
+        return found
+
+    def _notify_order_matches(self, found: List[Match]):
+        """
+        Mail both sides of each match. The messages join the Market's held
+        mail, which goes out off the event loop once the posting modal has
+        answered (release_mail); without the Market cog they are sent here.
+        """
+        mail_cog = self.bot.get_cog("Mailbox")
+        if not mail_cog or not hasattr(mail_cog, "send_many"):
+            return
+        messages = []
+        for bid, ask in found:
+            where = "Market listing" if ask.source == MARKET else "trade board"
+            messages.append({
+                "from_id": ask.owner_id,
+                "to_id": bid.owner_id,
+                "subject": f"🤝 Seller found: {ask.item}",
+                "body": (
+                    f"**{ask.item}** is for sale at **{ask.price_str}** ({where}), "
+                    f"within your Wanted price of **{bid.price_str}**.\n\n"
+                    "Reply to this message to reach the seller."
+                ),
+            })
+            messages.append({
+                "from_id": bid.owner_id,
+                "to_id": ask.owner_id,
+                "subject": f"🤝 Buyer found: {ask.item}",
+                "body": (
+                    f"Someone on the trade board wants **{bid.item}** for up to **{bid.price_str}**; "
+                    f"your {where} asks **{ask.price_str}**.\n\n"
+                    "Reply to this message to reach the buyer."
+                ),
+            })
+        mkt = self.bot.get_cog("Market")
+        if mkt and hasattr(mkt, "hold_mail"):
+            mkt.hold_mail(messages)
+        else:
+            mail_cog.send_many(messages)
+
+    def release_mail(self):
+        """Send held order-match mail; call after answering the interaction."""
+        mkt = self.bot.get_cog("Market")
+        if mkt and hasattr(mkt, "release_mail"):
+            mkt.release_mail()
+
+    # ---------------- Expiry ----------------
+    def expiring(self) -> List[Tuple[float, int, int]]:
+        return [(float(t["expires_at"]), uid, tid) for tid, (uid, t) in self.store.by_id.items() if t.get("expires_at")]
+
+    def expire(self, entries: List[Tuple[int, int, float]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """Remove due posts that are still live and unchanged; one save for the batch."""
+        removed: List[Tuple[int, Dict[str, Any]]] = []
+        for owner_id, trade_id, expires_at in entries:
+            row = self.store.get(trade_id)
+            # stale heap entry: removed or renewed since it was scheduled
+            if not row or row[0] != owner_id or float(row[1].get("expires_at") or 0) != expires_at:
+                continue
+            removed.append(self._drop(trade_id))
+        if removed:
+            self._save()
+        return removed
+
+    def search_trades(self, query: str, limit: int = 10) -> List[Tuple[int, Dict[str, Any]]]:
+        """Posts whose item or note match `query`, best match first."""
+        rows, _ = self.store.search(query, limit=limit)
+        return rows
+
+    def _price_flag(self, trade: Dict[str, Any]) -> str:
+        mkt = self.bot.get_cog("Market")
+        if not mkt or not hasattr(mkt, "price_flag"):
+            return ""
+        return mkt.price_flag(trade.get("item", ""), parse_price(trade.get("price"))[0])
+
+    def board_page(self, before: Optional[int] = None, per_page: int = 8, ttype: str = "",
+                   item: str = "") -> Tuple[List[Tuple[int, Dict[str, Any]]], Optional[int]]:
+        """Newest posts first, below the `before` cursor; returns (rows, next cursor or None)."""
+        return self.store.newest(before, per_page, ttype, item)
 
     def get_all_trades(self) -> List[tuple]:
         """Return all trades across the guild: (user_id, trade_dict)."""
-        return [(int(uid), t) for uid, posts in self.trades.items() for t in posts]
+        return self.store.rows()
 
     # ---------------- UI ----------------
     class PostTradeModal(Modal, title="📦 Post Trade"):
@@ -57,21 +249,43 @@ class Trades(commands.Cog):
             self.item = TextInput(label="Item", required=True)
             self.price = TextInput(label="Price", placeholder="e.g. 100g", required=False)
             self.note = TextInput(label="Note", required=False)
+            self.expires = TextInput(label="Expires in", placeholder="Optional, e.g. 30m, 12h, 7d, 1mo", required=False)
 
             self.add_item(self.ttype)
             self.add_item(self.item)
             self.add_item(self.price)
             self.add_item(self.note)
+            self.add_item(self.expires)
 
         async def on_submit(self, interaction):
-            self.cog.add_trade(
+            ttl = parse_ttl(self.expires.value)
+            if self.expires.value.strip() and ttl is None:
+                return await interaction.response.send_message(f"⚠️ Can't read “{self.expires.value}” as an expiry. {TTL_HELP}", ephemeral=True)
+            trade, merged = self.cog.add_trade(
                 self.user_id,
                 self.ttype.values[0],
                 self.item.value,
                 self.price.value or "—",
-                self.note.value or ""
+                self.note.value or "",
+                ttl=ttl,
             )
-            await refresh_hub(interaction, "trades")
+            if trade is None:
+                wait = self.cog.posting_cooldown(self.user_id, self.item.value, self.ttype.values[0])
+                return await interaction.response.send_message(
+                    f"⏳ You posted **{self.item.value}** ({self.ttype.values[0]}) a moment ago. "
+                    f"You can post it again in {max(1, round(wait / 60))} min.",
+                    ephemeral=True,
+                )
+            try:
+                await refresh_hub(interaction, "trades")
+            finally:
+                self.cog.release_mail()  # order-match mail goes out after the response
+            if merged:
+                await interaction.followup.send(
+                    f"🔁 You already have a {trade['type']} post for **{trade['item']}** at {trade['price']}, "
+                    "so that post was updated instead of posting it twice.",
+                    ephemeral=True,
+                )
 
     class RemoveTradeView(View):
         def __init__(self, cog, user_id: int):
@@ -80,28 +294,116 @@ class Trades(commands.Cog):
             if not trades:
                 self.add_item(Button(label="No trades to remove", style=discord.ButtonStyle.secondary, disabled=True))
             else:
-                for t in trades:
-                    self.add_item(Trades._RemoveBtn(cog, user_id, t["item"]))
+                for t in trades[:25]:
+                    self.add_item(Trades.RemoveTradeView._RemoveBtn(cog, user_id, t))
 
         class _RemoveBtn(Button):
-            def __init__(self, cog, user_id: int, item: str):
-                super().__init__(label=f"Remove {item}", style=discord.ButtonStyle.danger)
-                self.cog, self.user_id, self.item = cog, user_id, item
+            def __init__(self, cog, user_id: int, trade: Dict[str, Any]):
+                label = f"Remove {trade['type']}: {trade['item']} ({trade['price']})"
+                super().__init__(label=label[:80], style=discord.ButtonStyle.danger)
+                self.cog, self.user_id, self.trade_id = cog, user_id, trade["id"]
 
             async def callback(self, interaction):
-                self.cog.remove_trade(self.user_id, self.item)
+                self.cog.remove_trade(self.user_id, self.trade_id)
                 await refresh_hub(interaction, "trades")
 
-    class ViewAllTradesView(View):
+    class SearchTradesModal(Modal, title="🔎 Search Trades"):
         def __init__(self, cog):
             super().__init__(timeout=180)
-            trades = cog.get_all_trades()
-            if not trades:
+            self.cog = cog
+            self.query = TextInput(label="Query", placeholder="Item or note, e.g. enchanted bulk", required=True)
+            self.add_item(self.query)
+
+        async def on_submit(self, interaction: discord.Interaction):
+            rows = self.cog.search_trades(self.query.value)
+            e = discord.Embed(title="🔎 Trade Search", description=f"Best matches for **{self.query.value}**.",
+                              color=discord.Color.orange())
+            await interaction.response.edit_message(embed=e, view=Trades.ViewAllTradesView(self.cog, rows, guild=interaction.guild))
+
+    class FilterItemModal(Modal, title="📦 Filter by Item"):
+        def __init__(self, cog, settings: Dict[str, Any]):
+            super().__init__(timeout=180)
+            self.cog, self.settings = cog, settings
+            self.item = TextInput(label="Item", placeholder="Exact item name, blank for all",
+                                  default=settings.get("item", ""), required=False)
+            self.add_item(self.item)
+
+        async def on_submit(self, interaction: discord.Interaction):
+            settings = dict(self.settings, item=self.item.value.strip())
+            await interaction.response.edit_message(view=Trades.ViewAllTradesView(self.cog, guild=interaction.guild, **settings))
+
+    class ViewAllTradesView(View):
+        def __init__(self, cog, trades: Optional[List[Tuple[int, Dict[str, Any]]]] = None, ttype: str = "",
+                     item: str = "", cursor: Optional[int] = None, trail: Tuple[Optional[int], ...] = (),
+                     guild: Optional[discord.Guild] = None):
+            """
+            The trade board, newest first. `trades` shows a fixed list instead
+            (search results); otherwise pages come from the board index.
+            ttype: "For Sale" / "Wanted" / "" for both; item: exact item or ""
+            cursor: last post id of the previous page; trail: earlier page cursors for ⬅ Prev
+            guild: where the board is shown, so posters appear with their nickname there
+            """
+            super().__init__(timeout=180)
+            self.cog, self.ttype, self.item, self.cursor, self.trail = cog, ttype, item, cursor, trail
+            next_cursor = None
+            if trades is None:
+                shown, next_cursor = cog.board_page(cursor, 8, ttype, item)
+            else:
+                shown = trades[:10]
+            if not shown:
                 self.add_item(Button(label="No trades available", style=discord.ButtonStyle.secondary, disabled=True))
             else:
-                for uid, t in trades[:10]:  # show first 10
-                    label = f"{t['type']}: {t['item']} ({t['price']})"
-                    self.add_item(Trades._TradeBtn(cog, uid, t, label))
+                names = lookup_names(cog.bot, [uid for uid, _ in shown], guild)
+                for uid, t in shown:
+                    label = f"{t['type']}: {t['item']} ({cog._price_flag(t)}{t['price']}) — {names[int(uid)]}"
+                    self.add_item(Trades.ViewAllTradesView._TradeBtn(cog, uid, t, label))
+            if trades is not None:
+                return
+            if trail:
+                self.add_item(Trades.ViewAllTradesView._PageBtn(cog, "⬅ Prev", self._settings(), trail[-1], trail[:-1]))
+            if next_cursor is not None:
+                self.add_item(Trades.ViewAllTradesView._PageBtn(cog, "Next ➡", self._settings(), next_cursor, trail + (cursor,)))
+            self.add_item(Trades.ViewAllTradesView._FilterBtn(cog, self._settings()))
+            if item:
+                self.add_item(Trades.ViewAllTradesView._PageBtn(cog, f"✖ {item}"[:80], self._settings(item="")))
+            self.add_item(Trades.ViewAllTradesView._TypeSelect(cog, self._settings()))
+
+        def _settings(self, **changes) -> Dict[str, Any]:
+            s = {"ttype": self.ttype, "item": self.item}
+            s.update(changes)
+            return s
+
+        class _PageBtn(Button):
+            def __init__(self, cog, label: str, settings: Dict[str, Any], cursor: Optional[int] = None,
+                         trail: Tuple[Optional[int], ...] = ()):
+                super().__init__(label=label, style=discord.ButtonStyle.secondary)
+                self.cog, self.settings, self.cursor, self.trail = cog, settings, cursor, trail
+
+            async def callback(self, interaction: discord.Interaction):
+                v = Trades.ViewAllTradesView(self.cog, cursor=self.cursor, trail=self.trail, guild=interaction.guild, **self.settings)
+                await interaction.response.edit_message(view=v)
+
+        class _FilterBtn(Button):
+            def __init__(self, cog, settings: Dict[str, Any]):
+                super().__init__(label="📦 Filter item", style=discord.ButtonStyle.secondary)
+                self.cog, self.settings = cog, settings
+
+            async def callback(self, interaction: discord.Interaction):
+                await interaction.response.send_modal(Trades.FilterItemModal(self.cog, self.settings))
+
+        class _TypeSelect(Select):
+            def __init__(self, cog, settings: Dict[str, Any]):
+                current = settings.get("ttype", "") or "all"
+                options = [
+                    discord.SelectOption(label=label, value=value, default=value == current)
+                    for label, value in (("All posts", "all"), ("For Sale", "For Sale"), ("Wanted", "Wanted"))
+                ]
+                super().__init__(placeholder="Trade type", options=options, min_values=1, max_values=1)
+                self.cog, self.settings = cog, settings
+
+            async def callback(self, interaction: discord.Interaction):
+                settings = dict(self.settings, ttype="" if self.values[0] == "all" else self.values[0])
+                await interaction.response.edit_message(view=Trades.ViewAllTradesView(self.cog, guild=interaction.guild, **settings))
 
         class _TradeBtn(Button):
             def __init__(self, cog, user_id: int, trade: Dict[str, Any], label: str):
@@ -109,13 +411,17 @@ class Trades(commands.Cog):
                 self.cog, self.user_id, self.trade = cog, user_id, trade
 
             async def callback(self, interaction: discord.Interaction):
-                user = interaction.guild.get_member(self.user_id) if interaction.guild else None
-                poster = user.display_name if user else str(self.user_id)
+                poster = (await resolve_names(self.cog.bot, [self.user_id], interaction.guild))[int(self.user_id)]
                 e = discord.Embed(
                     title=f"{self.trade['type']} — {self.trade['item']}",
                     description=f"💰 {self.trade['price']}\n📝 {self.trade['note'] or '—'}",
                     color=discord.Color.orange()
                 )
+                mkt = self.cog.bot.get_cog("Market")
+                band = mkt.price_band_text(self.trade["item"]) if mkt and hasattr(mkt, "price_band_text") else ""
+                if band:
+                    flag = self.cog._price_flag(self.trade)
+                    e.add_field(name="Fair price", value=f"{band} {flag}".strip(), inline=False)
                 e.set_footer(text=f"Posted by {poster}")
                 await interaction.response.edit_message(embed=e, view=None)
 
@@ -125,6 +431,7 @@ class Trades(commands.Cog):
         v.add_item(Button(label="📦 Post Trade", style=discord.ButtonStyle.success, custom_id=f"tr_post_{user_id}"))
         v.add_item(Button(label="❌ Remove Trade", style=discord.ButtonStyle.danger, custom_id=f"tr_remove_{user_id}"))
         v.add_item(Button(label="📋 View All Trades", style=discord.ButtonStyle.primary, custom_id=f"tr_all_{user_id}"))
+        v.add_item(Button(label="🔎 Search Trades", style=discord.ButtonStyle.secondary, custom_id=f"tr_search_{user_id}"))
         return v
 
     # ---------------- Interaction Listener ----------------
@@ -142,9 +449,12 @@ class Trades(commands.Cog):
             e = discord.Embed(title="❌ Remove Trade", description="Pick one to remove.", color=discord.Color.red())
             return await interaction.response.edit_message(embed=e, view=Trades.RemoveTradeView(self, uid))
 
+        if cid == f"tr_search_{uid}":
+            return await interaction.response.send_modal(Trades.SearchTradesModal(self))
+
         if cid == f"tr_all_{uid}":
             e = discord.Embed(title="📋 All Trades", description="Browse the guild's trade board.", color=discord.Color.orange())
-            v = Trades.ViewAllTradesView(self)
+            v = Trades.ViewAllTradesView(self, guild=interaction.guild)
             return await interaction.response.edit_message(embed=e, view=v)
 
 
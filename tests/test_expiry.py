@@ -0,0 +1,83 @@
+import pytest
+
+from cogs.expiry import Expiry
+from utils.expiry import DAY, HOUR, MINUTE, ExpiryHeap, parse_ttl
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("30m", 30 * MINUTE),
+    ("30 min", 30 * MINUTE),
+    ("12h", 12 * HOUR),
+    ("7", 7 * DAY),
+    ("7d", 7 * DAY),
+    ("2w", 14 * DAY),
+    ("1mo", 30 * DAY),
+])
+def test_parse_ttl_units(text, seconds):
+    assert parse_ttl(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["", "soon", "5y", "3 fortnights", "0d", "91d", "-1d"])
+def test_parse_ttl_rejects(text):
+    assert parse_ttl(text) is None
+
+
+def test_heap_pops_due_entries_in_order_and_bounded():
+    heap = ExpiryHeap()
+    for t in (50, 10, 40, 20, 30):
+        heap.push(t, "market", 1, t)
+    assert heap.next_due() == 10
+    assert [e[0] for e in heap.pop_due(now=35, limit=2)] == [10, 20]
+    assert [e[0] for e in heap.pop_due(now=35)] == [30]
+    assert heap.next_due() == 40 and len(heap) == 2
+
+
+class FakeStore:
+    """Stands in for Market/Trades: postings by id with their current expiry."""
+
+    def __init__(self, postings):
+        self.postings = postings  # {id: (owner_id, expires_at)}
+
+    def expiring(self):
+        return [(exp, owner, pid) for pid, (owner, exp) in self.postings.items()]
+
+    def expire(self, entries):
+        gone = []
+        for owner_id, pid, expires_at in entries:
+            row = self.postings.get(pid)
+            if row is None or row != (owner_id, expires_at):
+                continue  # removed or renewed since it was scheduled
+            del self.postings[pid]
+            gone.append((owner_id, {"item": f"item {pid}"}))
+        return gone
+
+
+class FakeMailbox:
+    def __init__(self):
+        self.sent = []
+
+    def send_many(self, messages):
+        self.sent.extend(messages)
+
+
+class FakeBot:
+    user = None
+
+    def __init__(self, cogs):
+        self.cogs = cogs
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+
+def test_sweep_skips_stale_entries_and_batches_notices():
+    market = FakeStore({1: (7, 100.0), 2: (7, 200.0), 3: (8, 150.0)})
+    mailbox = FakeMailbox()
+    expiry = Expiry(FakeBot({"Market": market, "Mailbox": mailbox}))
+    market.postings[2] = (7, 900.0)  # renewed: its old heap entry is stale
+    expiry.schedule("market", 7, 2, 900.0)
+    assert expiry.sweep(now=250) == 2
+    assert set(market.postings) == {2}
+    assert sorted(m["to_id"] for m in mailbox.sent) == [7, 8]  # one notice per owner
+    assert expiry.sweep(now=899) == 0
+    assert expiry.sweep(now=900) == 1 and not market.postings
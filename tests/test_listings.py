@@ -0,0 +1,62 @@
+import random
+
+from utils.listings import BoardIndex, ListingStore
+
+
+def _grouped():
+    return {
+        "1": [{"item": "Iron Ore", "type": "For Sale", "village": "Winstead"},
+              {"id": 7, "item": "Zinc Ore", "type": "Wanted", "village": "—"}],
+        "2": [{"item": "iron ore", "type": "Wanted", "village": "winstead "}],
+    }
+
+
+def test_load_assigns_ids_after_the_highest_and_round_trips():
+    store = ListingStore()
+    assert store.load(_grouped())
+    assert sorted(store.by_id) == [7, 8, 9]
+    again = ListingStore()
+    assert not again.load(store.grouped())
+    assert again.grouped() == store.grouped()
+
+
+def test_find_intersects_secondary_indexes():
+    store = ListingStore()
+    store.load(_grouped())
+    assert store.find(item="IRON ORE") == [8, 9]
+    assert store.find(item="iron ore", type="Wanted") == [9]
+    assert store.find(seller_id=1, village="Winstead") == [8]
+    assert store.find(seller_id=2, type="For Sale") == []
+    assert [l["item"] for l in store.of_seller(1)] == ["Iron Ore", "Zinc Ore"]
+
+
+def test_remove_unlinks_every_index():
+    store = ListingStore()
+    store.load(_grouped())
+    seller, entry = store.remove(8)
+    assert seller == 1 and entry["item"] == "Iron Ore"
+    assert store.remove(8) is None
+    assert store.find(item="iron ore") == [9]
+    assert "For Sale" not in store.by_type
+    assert store.text.matching("iron") == {9}
+
+
+def test_board_pages_newest_first_with_filters():
+    rng = random.Random(5)
+    board = BoardIndex()
+    for _ in range(120):
+        board.add(rng.randrange(1, 4), {"item": rng.choice(["Iron Ore", "Zinc Ore", "Flax"]),
+                                        "type": rng.choice(["For Sale", "Wanted"])})
+    for gone in rng.sample(sorted(board.by_id), 30):
+        board.remove(gone)
+    for ttype, item in [("", ""), ("Wanted", ""), ("", "zinc ore"), ("For Sale", "Flax")]:
+        want = [i for i in sorted(board.by_id, reverse=True)
+                if (not ttype or board.by_id[i][1]["type"] == ttype)
+                and (not item or board.by_id[i][1]["item"].casefold() == item.casefold())]
+        got, cursor = [], None
+        while True:
+            rows, cursor = board.newest(cursor, 7, ttype, item)
+            got += [e["id"] for _, e in rows]
+            if cursor is None:
+                break
+        assert got == want
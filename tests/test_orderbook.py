@@ -0,0 +1,65 @@
+import random
+
+from utils.orderbook import ASK, BID, MARKET, TRADE, OrderBooks
+
+
+def _post(pid, item, price, posted_at=0.0):
+    return {"id": pid, "item": item, "price": price, "posted_at": posted_at}
+
+
+def test_bid_crosses_cheapest_asks_first_and_skips_own():
+    books = OrderBooks()
+    books.add(OrderBooks.make_order(MARKET, 1, ASK, {"id": 1, "item": "Iron Ore", "price": 90.0,
+                                                     "price_str": "90g", "posted_at": 1}))
+    books.add(OrderBooks.make_order(TRADE, 2, ASK, _post(2, "iron ore", "80g", 2)))
+    books.add(OrderBooks.make_order(TRADE, 3, ASK, _post(3, "Iron Ore", "120g", 3)))
+    books.add(OrderBooks.make_order(TRADE, 4, ASK, _post(4, "Iron Ore", "85g", 4)))
+    found = books.add(OrderBooks.make_order(TRADE, 4, BID, _post(5, "IRON ORE", "100g", 5)))
+    assert [(m.ask.source, m.ask.id) for m in found] == [(TRADE, 2), (MARKET, 1)]  # 85g is their own
+    assert all(m.bid.id == 5 for m in found)
+
+
+def test_ask_crosses_highest_bids_then_oldest():
+    books = OrderBooks()
+    books.add(OrderBooks.make_order(TRADE, 1, BID, _post(1, "Zinc", "50g", 10)))
+    books.add(OrderBooks.make_order(TRADE, 2, BID, _post(2, "Zinc", "60g", 20)))
+    books.add(OrderBooks.make_order(TRADE, 3, BID, _post(3, "Zinc", "50g", 5)))
+    found = books.add(OrderBooks.make_order(TRADE, 9, ASK, _post(4, "Zinc", "50g", 30)))
+    assert [m.bid.id for m in found] == [2, 3, 1]
+
+
+def test_unpriced_orders_are_left_out_and_removal_clears_books():
+    books = OrderBooks()
+    assert OrderBooks.make_order(TRADE, 1, ASK, _post(1, "Zinc", "Offer")) is None
+    books.add(OrderBooks.make_order(TRADE, 1, ASK, _post(1, "Zinc", "10g")))
+    bid, ask = books.best("zinc")
+    assert bid is None and ask.id == 1
+    books.remove(TRADE, 1)
+    assert books.best("zinc") == (None, None) and not books.books and len(books) == 0
+
+
+def test_each_crossing_pair_is_found_once():
+    rng = random.Random(11)
+    books = OrderBooks()
+    live = {}
+    pairs = set()
+    for pid in range(1, 400):
+        side = rng.choice((ASK, BID))
+        price = rng.randint(1, 20)
+        owner = rng.randrange(1, 8)
+        order = OrderBooks.make_order(TRADE, owner, side, _post(pid, "Ore", f"{price}g", pid))
+        found = books.add(order, limit=1000)
+        got = {(m.bid.id, m.ask.id) for m in found}
+        want = {
+            (o.id, pid) if side == ASK else (pid, o.id)
+            for o in live.values()
+            if o.side != side and o.owner_id != owner
+            and (o.price >= price if side == ASK else o.price <= price)
+        }
+        assert got == want and not got & pairs
+        pairs |= got
+        live[pid] = order
+        if rng.random() < 0.3:
+            gone = rng.choice(list(live))
+            books.remove(TRADE, gone)
+            del live[gone]
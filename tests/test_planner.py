@@ -0,0 +1,76 @@
+from cogs.recipes import Recipes
+from utils.catalog import catalog_from_rows, item_key
+from utils.crafters import tier_level
+from utils.wishlists import WishlistIndex
+
+# Shaped like data/catalog.json: recipe rows are named "Recipe: <item>"
+ROWS = [
+    {"name": "Recipe: Arcane Surge Potion", "profession": "Alchemy", "level": "10",
+     "url": "https://ashescodex.com/db/item/Consumable_Recipe_Alchemy_T2_Potion_ArcaneSurge"},
+    {"name": "Recipe: Minor Healing Potion", "profession": "Alchemy", "level": "0",
+     "url": "https://ashescodex.com/db/item/Consumable_Recipe_Alchemy_T1_Potion_MinorHealing"},
+    {"name": "Recipe: Elixir of the Bear", "profession": "Alchemy", "level": "20",
+     "url": "https://ashescodex.com/db/item/Consumable_Recipe_Alchemy_T3_Elixir_Bear"},
+    {"name": "Recipe: Obsidian Dagger", "profession": "Weaponsmithing", "level": "10",
+     "url": "https://ashescodex.com/db/item/Weapon_Recipe_Weaponsmithing_T2_Dagger_Obsidian"},
+]
+
+
+class FakeProfessions:
+    data = {}
+
+    def __init__(self, profs):
+        self.profs = profs
+
+    def get_user_professions(self, user_id):
+        return self.profs
+
+
+class FakeProfile:
+    def __init__(self, wishlists):
+        self.wishlists = WishlistIndex()
+        self.wishlists.rebuild({str(uid): {"wishlist": items} for uid, items in wishlists.items()})
+
+
+class FakeBot:
+    def __init__(self, cogs):
+        self.cogs = cogs
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+
+def _planner(profs, wishlists):
+    cog = Recipes.__new__(Recipes)
+    cog.bot = FakeBot({"Professions": FakeProfessions(profs), "Profile": FakeProfile(wishlists)})
+    cog.catalog = catalog_from_rows(ROWS)
+    cog.learned = {}
+    return cog
+
+
+def test_item_key_matches_recipe_names_to_item_names():
+    assert item_key("Recipe: Arcane Surge Potion") == item_key("arcane surge potion")
+    assert item_key("Recipe: Elixir of the Bear") == item_key("Elixir of the Bear")
+    assert item_key("Recipe: Obsidian Dagger") != item_key("Obsidian Dagger Hilt")
+
+
+def test_wishlist_items_flag_their_recipes():
+    cog = _planner({"Alchemy": "Journeyman", "Weaponsmithing": "Apprentice"}, {
+        1: ["Arcane Surge Potion", "Obsidian Dagger"],  # the planner's own user: not counted
+        2: ["Arcane Surge Potion", "Elixir of the Bear"],
+        3: ["arcane surge potion", "Obsidian Dagger"],
+    })
+    wanted = {r["name"]: r["wanted"] for section in cog.plan_craftable(1) for r in section["recipes"]}
+    assert wanted == {
+        "Recipe: Minor Healing Potion": 0,
+        "Recipe: Arcane Surge Potion": 2,
+        "Recipe: Elixir of the Bear": 1,
+        "Recipe: Obsidian Dagger": 1,
+    }
+
+
+def test_tier_caps_the_planned_levels():
+    cog = _planner({"Alchemy": "Apprentice"}, {})
+    (section,) = cog.plan_craftable(1)
+    assert section["max_level"] == tier_level("Apprentice", cog.catalog.levels()) == 10
+    assert sorted(r["name"] for r in section["recipes"]) == ["Recipe: Arcane Surge Potion", "Recipe: Minor Healing Potion"]
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from utils.price_sketch import ALPHA, HIGH, LOW, MAX_BUCKETS, PriceBands, QuantileSketch
+
+
+def _true_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def _sketch(values):
+    s = QuantileSketch()
+    for v in values:
+        s.add(v)
+    return s
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_quantiles_within_relative_error(seed):
+    rng = random.Random(seed)
+    values = [rng.lognormvariate(6, 0.8) for _ in range(5000)]
+    s = _sketch(values)
+    for q in (0.05, 0.25, 0.5, 0.75, 0.95):
+        true = _true_quantile(values, q)
+        assert abs(s.quantile(q) - true) <= ALPHA * true + 1e-9
+
+
+def test_zero_prices_and_empty_sketch():
+    assert QuantileSketch().quantile(0.5) is None
+    s = _sketch([0, 0, 0, 10, 20])
+    assert s.quantile(0.25) == 0.0 and s.count == 5
+
+
+def test_merge_equals_one_stream():
+    rng = random.Random(4)
+    a = [rng.uniform(1, 5000) for _ in range(700)]
+    b = [rng.uniform(100, 900) for _ in range(300)] + [0]
+    merged = _sketch(a)
+    merged.merge(_sketch(b))
+    whole = _sketch(a + b)
+    assert merged.bins == whole.bins and merged.zero == whole.zero and merged.count == whole.count
+
+
+def test_bucket_cap_only_blurs_the_low_tail():
+    values = [1.05 ** i for i in range(400)]  # spans far more than MAX_BUCKETS buckets
+    s = _sketch(values)
+    assert len(s.bins) <= MAX_BUCKETS and s.count == len(values)
+    # the cheapest ~2/3 share one bucket now; everything above keeps full accuracy
+    for q in (0.75, 0.9, 0.99):
+        true = _true_quantile(values, q)
+        assert abs(s.quantile(q) - true) <= ALPHA * true + 1e-9
+    restored = QuantileSketch.from_json(s.to_json())
+    assert restored.bins == s.bins and restored.count == s.count
+
+
+def test_bands_flag_prices_outside_the_fences(tmp_path):
+    bands = PriceBands(str(tmp_path / "bands.json"))
+    assert bands.fresh
+    for p in (90, 95, 100, 100, 105, 110, 100, 98):
+        bands.record("Iron Ore", p, save=False)
+    assert bands.assess("iron ore", 10) == LOW
+    assert bands.assess("iron ore", 400) == HIGH
+    assert bands.assess("iron ore", 101) is None
+    assert bands.assess("zinc ore", 10) is None  # no band yet
+    bands.save()
+    assert PriceBands(str(tmp_path / "bands.json")).band("Iron Ore")["count"] == 8
@@ -0,0 +1,41 @@
+import pytest
+
+from utils.prices import APPROX, EXACT, NONE, parse_price
+
+
+@pytest.mark.parametrize("raw, gold, confidence", [
+    ("1500g", 1500.0, EXACT),
+    ("1.2k", 1200.0, EXACT),
+    ("1,500", 1500.0, EXACT),
+    ("2g 50s", 2.5, EXACT),
+    (1500, 1500.0, EXACT),
+    ("~1500 obo", 1500.0, APPROX),
+    ("Offer", None, NONE),
+])
+def test_plain_prices(raw, gold, confidence):
+    assert parse_price(raw) == (gold, confidence)
+
+
+@pytest.mark.parametrize("raw, gold", [
+    ("100g-200g", 100.0),
+    ("1k - 2k", 1000.0),
+    ("1-2k", 1000.0),
+    ("500 to 800", 500.0),
+])
+def test_ranges_store_the_low_end(raw, gold):
+    assert parse_price(raw) == (gold, APPROX)
+
+
+@pytest.mark.parametrize("raw, gold", [
+    ("x2 for 300g", 300.0),
+    ("2 for 1k", 1000.0),
+    ("5x 300g", 300.0),
+])
+def test_quantities_are_not_prices(raw, gold):
+    assert parse_price(raw) == (gold, APPROX)
+
+
+@pytest.mark.parametrize("raw", ["cheap", "5kk", "—", ""])
+def test_unreadable_prices_give_none(raw):
+    # the search modal rejects a max price that reads as None instead of dropping the cap
+    assert parse_price(raw) == (None, NONE)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+
+import pytest
+
+from Scraper import scrape_recipes
+from Scraper.fixture_server import render_page
+
+PAGES = 5
+SAVE_STATE = scrape_recipes._save_state
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _recipes(changed=()):
+    out = []
+    for page in range(1, PAGES + 1):
+        for i in range(50):
+            name = f"Recipe: Item {page}-{i}" + (" Mk II" if page in changed else "")
+            out.append({"name": name, "profession": "Alchemy", "level": "10",
+                        "url": f"https://ashescodex.com/recipe/{page}-{i}"})
+    return out
+
+
+class FakeSession:
+    """The recipe tracker with ETag validators, served from a list of recipes."""
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+
+    def get(self, base, params, headers, timeout):
+        body = render_page(self.recipes, params["page"])
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        status = 304 if headers.get("If-None-Match") == etag else 200
+        return type("Response", (), {"status_code": status, "headers": {"ETag": etag},
+                                     "content": b"" if status == 304 else body})()
+
+
+class LazyFuture:
+    def __init__(self, fn, args):
+        self.fn, self.args = fn, args
+
+    def done(self):
+        return False
+
+    def result(self):
+        return self.fn(*self.args)
+
+
+class LazyPool:
+    """Parses only when a result is asked for, so later pages are always in flight."""
+
+    def __init__(self, max_workers):
+        pass
+
+    def submit(self, fn, *args):
+        return LazyFuture(fn, args)
+
+    def shutdown(self, cancel_futures=False):
+        pass
+
+
+def _run(monkeypatch, tmp_path, recipes, interrupt_at=None):
+    monkeypatch.setattr(scrape_recipes.requests, "Session", lambda: FakeSession(recipes))
+    monkeypatch.setattr(scrape_recipes, "ProcessPoolExecutor", LazyPool)
+
+    def save_then_stop(path, state):
+        SAVE_STATE(path, state)
+        if interrupt_at and (state.get("checkpoint") or {}).get("next_page") == interrupt_at:
+            raise Interrupted
+
+    monkeypatch.setattr(scrape_recipes, "_save_state", save_then_stop)
+    scrape_recipes.scrape_all_recipes(
+        max_pages=PAGES + 1, base="http://tracker", out_path=str(tmp_path / "recipes.ndjson"),
+        state_path=str(tmp_path / "state.json"), catalog_dir=str(tmp_path), workers=2,
+    )
+
+
+def _names(tmp_path):
+    with open(tmp_path / "recipes.ndjson", encoding="utf-8") as f:
+        return [json.loads(line)["name"] for line in f]
+
+
+def test_resume_after_interrupt_keeps_every_changed_page(monkeypatch, tmp_path):
+    _run(monkeypatch, tmp_path, _recipes())
+    assert _names(tmp_path) == [r["name"] for r in _recipes()]
+
+    changed = _recipes(changed=(2, 4))
+    with pytest.raises(Interrupted):
+        _run(monkeypatch, tmp_path, changed, interrupt_at=3)  # stop right after page 2's checkpoint
+    _run(monkeypatch, tmp_path, changed)
+    assert _names(tmp_path) == [r["name"] for r in changed]
+
+    # Later runs see only 304s and must keep the same output
+    _run(monkeypatch, tmp_path, changed)
+    assert _names(tmp_path) == [r["name"] for r in changed]
+
+
+def test_unchanged_pages_are_copied_on_304(monkeypatch, tmp_path):
+    _run(monkeypatch, tmp_path, _recipes())
+    first = _names(tmp_path)
+    _run(monkeypatch, tmp_path, _recipes())
+    assert _names(tmp_path) == first
+    state = json.loads((tmp_path / "state.json").read_text(encoding="utf-8"))
+    assert state["checkpoint"] is None
+    assert [state["pages"][str(p)]["count"] for p in range(1, PAGES + 1)] == [50] * PAGES
@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from utils.listings import ListingIndex, _ci
+from utils.textsearch import TextIndex
+
+
+def test_bm25_ranks_rarer_and_denser_matches_first():
+    idx = TextIndex()
+    idx.add(1, [("Iron Ore", 2.0), ("bulk discount", 1.0)])
+    idx.add(2, [("Iron Ingot", 2.0), ("", 1.0)])
+    idx.add(3, [("Obsidian Dagger", 2.0), ("enchanted, bulk", 1.0)])
+    idx.add(4, [("Iron Ore", 2.0), ("iron iron", 1.0)])
+    assert [d for _, d in idx.search("iron")][0] == 4
+    assert {d for _, d in idx.search("iron bulk")} == {1}  # every word matches when some doc has all
+    assert {d for _, d in idx.search("obsid")} == {3}     # last word matches as a prefix
+    idx.remove(4)
+    assert idx.matching("iron") == {1, 2}
+
+
+def test_search_pages_from_a_cursor_without_repeats():
+    idx = TextIndex()
+    rng = random.Random(3)
+    for d in range(1, 200):
+        idx.add(d, [(" ".join(rng.choice(["ore", "iron", "zinc", "bulk", "cheap"]) for _ in range(4)), 1.0)])
+    full = [(-s, d) for s, d in idx.search("ore")]
+    paged, after = [], None
+    while True:
+        page = [(-s, d) for s, d in idx.search("ore", 6, after=after)]
+        if not page:
+            break
+        paged += page
+        after = page[-1]
+    assert paged == full
+
+
+@pytest.fixture(scope="module")
+def market():
+    rng = random.Random(9)
+    words = ["bulk", "enchanted", "cheap", "rare"] + [f"w{i}" for i in range(300)]
+    ix = ListingIndex()
+    for _ in range(2500):
+        ix.add(rng.randrange(40), {
+            "item": f"Item{rng.randrange(60)}",
+            "price_str": rng.choice(["—", f"{rng.randint(1, 900)}g"]),
+            "village": rng.choice(["Winstead", "Halcyon", "—"]),
+            "note": " ".join(rng.choice(words[:4]) if rng.random() < 0.3 else rng.choice(words) for _ in range(3)),
+        })
+    return ix
+
+
+def _all_pages(fn, **kw):
+    out, cursor = [], None
+    while True:
+        rows, cursor = fn(after=cursor, limit=6, **kw)
+        out += [l["id"] for _, l in rows]
+        if cursor is None:
+            return out
+
+
+def _brute(ix, query, key, items=None, village="", max_price=None):
+    hits = ix.text.matching(query)
+    rows = []
+    for i, (_, l) in ix.by_id.items():
+        if hits is not None and i not in hits:
+            continue
+        if items is not None and _ci(l["item"]) not in items:
+            continue
+        if village and _ci(l.get("village", "")) != _ci(village):
+            continue
+        if key == "price" and (l.get("price") is None or (max_price is not None and l["price"] > max_price)):
+            continue
+        rows.append(((_ci(l["item"]) if key == "name" else float(l["price"])), i))
+    return [i for _, i in sorted(rows)]
+
+
+# sparse ("w17", "w17 bulk") and dense ("bulk") hits take different paths
+@pytest.mark.parametrize("query", ["bulk", "w17", "w17 bulk", "enchant", "nothing", ""])
+@pytest.mark.parametrize("items, village", [(None, ""), ({"item3", "item7", "item12"}, ""), (None, "Halcyon")])
+def test_listing_pages_match_brute_force(market, query, items, village):
+    assert _all_pages(market.page, query=query, items=items, village=village) == \
+        _brute(market, query, "name", items, village)
+    assert _all_pages(market.page_by_price, query=query, items=items, village=village, max_price=600) == \
+        _brute(market, query, "price", items, village, 600)
+
+
+@pytest.mark.parametrize("query", ["bulk", "w17", "rare cheap"])
+def test_relevance_pages_follow_the_full_ranking(market, query):
+    assert _all_pages(market.page_by_relevance, query=query) == [d for _, d in market.text.search(query)]
+
+
+def test_relevance_pages_rerank_after_a_change():
+    ix = ListingIndex()
+    for n in range(20):
+        ix.add(1, {"item": f"Ore {n}", "price_str": "5g", "note": "bulk"})
+    rows, cursor = ix.page_by_relevance(limit=6, query="bulk")
+    ix.page_by_relevance(after=cursor, limit=6, query="bulk")  # caches the ranking
+    best = ix.add(2, {"item": "Bulk Ore", "price_str": "5g", "note": "bulk bulk bulk"})
+    rows, _ = ix.page_by_relevance(after=(float("-inf"), 0), limit=6, query="bulk")
+    assert rows[0][1]["id"] == best
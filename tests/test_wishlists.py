@@ -0,0 +1,56 @@
+import random
+
+from utils.wishlists import MatchCounter, WishlistIndex
+
+
+def _brute(wishlists, posted):
+    counts = {}
+    for uid, items in wishlists.items():
+        n = sum(1 for p in posted if p.casefold() in {i.casefold() for i in items})
+        if n:
+            counts[uid] = n
+    return counts
+
+
+def test_index_ignores_casing_and_repeats():
+    idx = WishlistIndex()
+    assert idx.add(1, "Obsidian Dagger")
+    assert not idx.add(1, "obsidian dagger ")
+    idx.add(2, "OBSIDIAN DAGGER")
+    assert idx.wishers_of("Obsidian dagger") == {1, 2}
+    assert idx.remove(1, "Obsidian Dagger")
+    assert not idx.remove(1, "Obsidian Dagger")
+    assert idx.wishers_of("obsidian dagger") == {2}
+    idx.remove(2, "obsidian dagger")
+    assert "obsidian dagger" not in idx.wishers
+
+
+def test_counters_follow_posts_and_wishlist_edits():
+    rng = random.Random(7)
+    items = ["Iron Ore", "Zinc Ore", "Phoenix Cloak", "Obsidian Dagger"]
+    wishlists = {uid: set() for uid in range(1, 6)}
+    idx = WishlistIndex()
+    counter = MatchCounter(idx)
+    posted = []
+    for _ in range(500):
+        roll = rng.random()
+        item = rng.choice(items)
+        uid = rng.randrange(1, 6)
+        if roll < 0.35:
+            posted.append(item)
+            counter.posted_item(item, +1)
+        elif roll < 0.6 and item in posted:
+            posted.remove(item)
+            counter.posted_item(item, -1)
+        elif roll < 0.8:
+            if idx.add(uid, item):
+                wishlists[uid].add(item)
+                counter.wish_changed(uid, item, added=True)
+        elif idx.remove(uid, item):
+            wishlists[uid].discard(item)
+            counter.wish_changed(uid, item, added=False)
+        assert {u: c for u, c in counter.counts.items() if c} == _brute(wishlists, posted)
+
+    rebuilt = MatchCounter(idx)
+    rebuilt.rebuild(posted)
+    assert {u: c for u, c in rebuilt.counts.items() if c} == _brute(wishlists, posted)
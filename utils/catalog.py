@@ -0,0 +1,445 @@
+# utils/catalog.py
+"""
+Recipe catalog: one streaming pass from scraped rows to everything the bot reads.
+
+    rows (NDJSON or legacy recipes.json)
+      -> recipes_grouped.json   grouped view { profession: [ {name, level, url} ] }
+      -> recipes_index.json     search index { token: [recipe_id, ...] }
+      -> catalog.json           compact snapshot the bot loads at startup
+
+Rows are read one at a time and spilled to one temp file per profession, so
+peak memory is bounded by the largest profession (plus the token postings),
+not by the size of the whole scrape.
+
+Run:  python -m utils.catalog [data/recipes.ndjson] [--measure]
+"""
+import bisect
+import json
+import os
+import re
+import sys
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DATA_DIR = "data"
+SOURCE_FILE = os.path.join(DATA_DIR, "recipes.ndjson")
+LEGACY_SOURCE_FILE = os.path.join(DATA_DIR, "recipes.json")
+GROUPED_FILE = os.path.join(DATA_DIR, "recipes_grouped.json")
+INDEX_FILE = os.path.join(DATA_DIR, "recipes_index.json")
+CATALOG_FILE = os.path.join(DATA_DIR, "catalog.json")
+
+CATALOG_VERSION = 1
+STOPWORDS = {"recipe", "of", "the", "a"}
+_TOKEN_RE = re.compile(r"[0-9a-z']+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").casefold()) if t not in STOPWORDS]
+
+
+def item_key(name: str) -> str:
+    """
+    What a recipe makes, comparable with item names on wishlists and listings:
+    "Recipe: Obsidian Dagger" and "obsidian dagger" have the same key.
+    """
+    return " ".join(tokenize(name))
+
+
+def parse_level(raw: Any) -> int:
+    try:
+        return int(str(raw).strip() or 0)
+    except ValueError:
+        return 0
+
+
+# ---------- Input ----------
+def iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield recipe rows one at a time. NDJSON is streamed line by line; a legacy
+    JSON array (old recipes.json) is still accepted but has to be loaded whole.
+    """
+    if path.endswith(".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    if isinstance(raw, dict):  # grouped layout
+        for prof, items in raw.items():
+            for r in items or []:
+                yield {**r, "profession": prof}
+    else:
+        yield from raw
+
+
+def default_source() -> str:
+    return SOURCE_FILE if os.path.exists(SOURCE_FILE) else LEGACY_SOURCE_FILE
+
+
+# ---------- Build ----------
+def _atomic_writer(path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return open(f"{path}.tmp", "w", encoding="utf-8")
+
+
+def build_catalog(rows: Iterable[Dict[str, Any]], out_dir: str = DATA_DIR) -> Dict[str, int]:
+    """
+    Consume rows once and write the grouped view, the search index and the
+    compact snapshot. Returns {"recipes": n, "professions": m}.
+    """
+    grouped_path = os.path.join(out_dir, os.path.basename(GROUPED_FILE))
+    index_path = os.path.join(out_dir, os.path.basename(INDEX_FILE))
+    catalog_path = os.path.join(out_dir, os.path.basename(CATALOG_FILE))
+
+    with tempfile.TemporaryDirectory(prefix="catalog_") as spill_dir:
+        # Pass over the input: normalise and spill each row to its profession's file
+        spills: Dict[str, Any] = {}
+        try:
+            for r in rows:
+                name = (r.get("name") or "").strip()
+                if not name:
+                    continue
+                prof = (r.get("profession") or "").strip() or "Unknown"
+                f = spills.get(prof)
+                if f is None:
+                    f = spills[prof] = open(os.path.join(spill_dir, f"{len(spills)}.ndjson"), "w+", encoding="utf-8")
+                row = [name, parse_level(r.get("level")), r.get("url") or r.get("link") or ""]
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        except BaseException:
+            for f in spills.values():
+                f.close()
+            raise
+
+        # Stitch: one profession in memory at a time, sorted by level then name
+        tokens: Dict[str, List[int]] = {}
+        ranges: Dict[str, List[int]] = {}
+        next_id = 0
+        with _atomic_writer(grouped_path) as g, _atomic_writer(catalog_path) as c:
+            g.write("{")
+            c.write(f'{{"version": {CATALOG_VERSION}, "fields": ["name", "level", "url"], "rows": [')
+            for p_i, prof in enumerate(sorted(spills)):
+                f = spills[prof]
+                f.seek(0)
+                chunk = sorted((json.loads(line) for line in f), key=lambda x: (x[1], x[0].casefold()))
+                f.close()
+
+                g.write(("," if p_i else "") + "\n  " + json.dumps(prof, ensure_ascii=False) + ": [")
+                for r_i, (name, level, url) in enumerate(chunk):
+                    rid = next_id + r_i
+                    g.write(("," if r_i else "") + "\n    " + json.dumps(
+                        {"name": name, "level": str(level), "url": url}, ensure_ascii=False))
+                    c.write(("," if rid else "") + "\n" + json.dumps([name, level, url], ensure_ascii=False))
+                    for t in set(tokenize(name)):
+                        tokens.setdefault(t, []).append(rid)
+                g.write("\n  ]")
+                ranges[prof] = [next_id, next_id + len(chunk)]
+                next_id += len(chunk)
+            g.write("\n}\n")
+            c.write("\n], \"professions\": " + json.dumps(ranges, ensure_ascii=False) + "}\n")
+
+    with _atomic_writer(index_path) as ix:
+        json.dump({"version": CATALOG_VERSION, "tokens": tokens}, ix, ensure_ascii=False, separators=(",", ":"))
+    for path in (grouped_path, catalog_path, index_path):
+        os.replace(f"{path}.tmp", path)
+    return {"recipes": next_id, "professions": len(ranges)}
+
+
+# ---------- Load ----------
+def recipe_key(name: str, url: str) -> str:
+    """Stable identity of a recipe across scrapes: its URL slug, else its name."""
+    slug = (url or "").rstrip("/").rsplit("/", 1)[-1]
+    return slug or (name or "").casefold()
+
+
+class Catalog:
+    """
+    Read side of the snapshot. Recipes are addressed by integer id, which stays
+    stable while deltas are applied (removed ids are tombstoned, new ones are
+    appended). Each profession keeps its ids in a (level, name)-sorted array.
+    """
+
+    def __init__(self, rows: List[List[Any]], professions: Dict[str, List[int]],
+                 tokens: Optional[Dict[str, List[int]]] = None):
+        self.rows: List[Optional[List[Any]]] = rows
+        self._prof: List[str] = [""] * len(rows)
+        # { profession: [ (level, name_cf, id), ... ] } sorted
+        self.by_profession: Dict[str, List[Tuple[int, str, int]]] = {}
+        # { level: number of recipes } for the tier -> level scale (see utils/crafters.tier_level)
+        self._level_counts: Dict[int, int] = {}
+        for prof, (a, b) in professions.items():
+            keys = []
+            for rid in range(int(a), int(b)):
+                self._prof[rid] = prof
+                keys.append((rows[rid][1], rows[rid][0].casefold(), rid))
+                self._level_counts[rows[rid][1]] = self._level_counts.get(rows[rid][1], 0) + 1
+            keys.sort()
+            self.by_profession[prof] = keys
+        self._by_key: Dict[str, int] = {recipe_key(r[0], r[2]): rid for rid, r in enumerate(rows)}
+        if tokens is None:
+            tokens = {}
+            for rid, row in enumerate(rows):
+                for t in set(tokenize(row[0])):
+                    tokens.setdefault(t, []).append(rid)
+        self.tokens = tokens
+        self._vocab = sorted(tokens)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def ids(self) -> Iterator[int]:
+        return (rid for rid, r in enumerate(self.rows) if r is not None)
+
+    def profession_of(self, rid: int) -> str:
+        return self._prof[rid] or "Unknown"
+
+    def get(self, rid: int) -> Dict[str, Any]:
+        name, level, url = self.rows[rid][:3]
+        return {"id": rid, "name": name, "profession": self.profession_of(rid), "level": level, "link": url}
+
+    def find(self, name: str, url: str = "") -> Optional[int]:
+        return self._by_key.get(recipe_key(name, url))
+
+    def levels(self) -> List[int]:
+        """Distinct recipe levels in the catalog, ascending."""
+        return sorted(self._level_counts)
+
+    def in_level_range(self, profession: str, max_level: int, min_level: int = 0) -> List[int]:
+        """Ids in `profession` with min_level <= level <= max_level, lowest level first (two bisects)."""
+        keys = self.by_profession.get(profession, [])
+        lo = bisect.bisect_left(keys, (min_level,))
+        hi = bisect.bisect_left(keys, (max_level + 1,))
+        return [k[2] for k in keys[lo:hi]]
+
+    def _token_ids(self, prefix: str) -> set:
+        """Ids of recipes with a word starting with `prefix` (bisect over the vocabulary)."""
+        out: set = set()
+        i = bisect.bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            out.update(self.tokens[self._vocab[i]])
+            i += 1
+        return out
+
+    def search(self, query: str, professions: Optional[List[str]] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Word-prefix search: every query word must prefix some word of the recipe name."""
+        terms = tokenize(query)
+        if terms:
+            ids: Optional[set] = None
+            for t in sorted(terms, key=len, reverse=True):
+                hit = self._token_ids(t)
+                ids = hit if ids is None else ids & hit
+                if not ids:
+                    return []
+            candidates = sorted(ids or ())
+        else:
+            candidates = self.ids()
+
+        out: List[Dict[str, Any]] = []
+        for rid in candidates:
+            if professions and self.profession_of(rid) not in professions:
+                continue
+            out.append(self.get(rid))
+            if len(out) >= limit:
+                break
+        return out
+
+    # ----- incremental maintenance (used by apply_delta) -----
+    def _index_tokens(self, rid: int, name: str, add: bool):
+        for t in set(tokenize(name)):
+            postings = self.tokens.get(t)
+            if add:
+                if postings is None:
+                    postings = self.tokens[t] = []
+                    bisect.insort(self._vocab, t)
+                bisect.insort(postings, rid)
+            elif postings is not None:
+                i = bisect.bisect_left(postings, rid)
+                if i < len(postings) and postings[i] == rid:
+                    postings.pop(i)
+                if not postings:
+                    del self.tokens[t]
+                    self._vocab.pop(bisect.bisect_left(self._vocab, t))
+
+    def _place(self, rid: int, add: bool):
+        name, level = self.rows[rid][0], self.rows[rid][1]
+        prof = self._prof[rid]
+        key = (level, name.casefold(), rid)
+        keys = self.by_profession.setdefault(prof, [])
+        if add:
+            bisect.insort(keys, key)
+            self._level_counts[level] = self._level_counts.get(level, 0) + 1
+        else:
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                keys.pop(i)
+                self._level_counts[level] -= 1
+                if not self._level_counts[level]:
+                    del self._level_counts[level]
+
+    def _add(self, name: str, profession: str, level: int, url: str) -> int:
+        rid = len(self.rows)
+        self.rows.append([name, level, url])
+        self._prof.append(profession)
+        self._by_key[recipe_key(name, url)] = rid
+        self._place(rid, True)
+        self._index_tokens(rid, name, True)
+        return rid
+
+    def _remove(self, rid: int):
+        name, _, url = self.rows[rid]
+        self._place(rid, False)
+        self._index_tokens(rid, name, False)
+        self._by_key.pop(recipe_key(name, url), None)
+        self.rows[rid] = None
+
+    def _update(self, rid: int, name: str, profession: str, level: int, url: str):
+        old_name, _, old_url = self.rows[rid]
+        self._place(rid, False)
+        if name != old_name:
+            self._index_tokens(rid, old_name, False)
+            self._index_tokens(rid, name, True)
+        self._by_key.pop(recipe_key(old_name, old_url), None)
+        self.rows[rid] = [name, level, url]
+        self._prof[rid] = profession
+        self._by_key[recipe_key(name, url)] = rid
+        self._place(rid, True)
+
+    def apply_delta(self, delta: "CatalogDiff"):
+        """Patch ids, profession arrays and token postings for just the changed recipes."""
+        for old in delta.removed:
+            self._remove(old["id"])
+        for old, new in delta.renamed + delta.level_changed:
+            self._update(old["id"], new["name"], new["profession"], new["level"], new["link"])
+        for new in delta.added:
+            new["id"] = self._add(new["name"], new["profession"], new["level"], new["link"])
+
+
+class CatalogDiff:
+    """
+    Keyed difference between two catalogs (key = URL slug, see recipe_key).
+    Entries are Catalog.get() dicts; pairs are (old, new).
+    """
+
+    def __init__(self):
+        self.added: List[Dict[str, Any]] = []
+        self.removed: List[Dict[str, Any]] = []
+        self.renamed: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        self.level_changed: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.renamed or self.level_changed)
+
+    def counts(self) -> Dict[str, int]:
+        return {"added": len(self.added), "removed": len(self.removed),
+                "renamed": len(self.renamed), "level_changed": len(self.level_changed)}
+
+
+def diff_catalogs(old: Catalog, new: Catalog) -> CatalogDiff:
+    """
+    Compare by recipe key. Same key with a different name is a rename; same
+    name with a different level (or profession) is a level change.
+    """
+    d = CatalogDiff()
+    seen = set()
+    for rid in new.ids():
+        n = new.get(rid)
+        key = recipe_key(n["name"], n["link"])
+        seen.add(key)
+        oid = old._by_key.get(key)
+        if oid is None:
+            d.added.append(n)
+            continue
+        o = old.get(oid)
+        if o["name"] != n["name"]:
+            d.renamed.append((o, n))
+        elif o["level"] != n["level"] or o["profession"] != n["profession"]:
+            d.level_changed.append((o, n))
+    for key, oid in old._by_key.items():
+        if key not in seen:
+            d.removed.append(old.get(oid))
+    return d
+
+
+def load_catalog(catalog_path: str = CATALOG_FILE, index_path: str = INDEX_FILE) -> Optional[Catalog]:
+    """Load the snapshot written by build_catalog. Returns None if it is missing or stale."""
+    try:
+        with open(catalog_path, "r", encoding="utf-8") as f:
+            snap = json.load(f)
+        if snap.get("version") != CATALOG_VERSION:
+            return None
+    except Exception:
+        return None
+    tokens = None
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            ix = json.load(f)
+        if ix.get("version") == CATALOG_VERSION:
+            tokens = ix.get("tokens")
+    except Exception:
+        pass
+    return Catalog(snap.get("rows", []), snap.get("professions", {}), tokens)
+
+
+def catalog_from_rows(rows: Iterable[Dict[str, Any]]) -> Catalog:
+    """In-memory fallback when no snapshot has been built yet."""
+    by_prof: Dict[str, List[List[Any]]] = {}
+    for r in rows:
+        name = (r.get("name") or "").strip()
+        if name:
+            prof = (r.get("profession") or "").strip() or "Unknown"
+            by_prof.setdefault(prof, []).append([name, parse_level(r.get("level")), r.get("url") or r.get("link") or ""])
+    flat: List[List[Any]] = []
+    ranges: Dict[str, List[int]] = {}
+    for prof in sorted(by_prof):
+        chunk = sorted(by_prof[prof], key=lambda x: (x[1], x[0].casefold()))
+        ranges[prof] = [len(flat), len(flat) + len(chunk)]
+        flat.extend(chunk)
+    return Catalog(flat, ranges)
+
+
+# ---------- CLI ----------
+def _legacy_flow(source: str):
+    """The old three steps: load all rows, migrate to grouped, regroup in the bot."""
+    recipes = list(iter_rows(source))
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for r in recipes:
+        grouped.setdefault(r.get("profession", "Unknown"), []).append(
+            {"name": r["name"], "level": r["level"], "url": r["url"]})
+    blob = json.dumps(grouped, indent=2, ensure_ascii=False)
+    reloaded = json.loads(blob)
+    normalized: Dict[str, List[Dict[str, str]]] = {}
+    for prof, items in reloaded.items():
+        for r in items:
+            normalized.setdefault(prof, []).append(
+                {"name": r.get("name", "Unknown"), "profession": prof, "link": r.get("url") or ""})
+    return normalized
+
+
+def _measure(source: str, out_dir: str):
+    import time
+    import tracemalloc
+
+    for label, fn in (
+        ("legacy (scrape list -> migrate -> regroup)", lambda: _legacy_flow(source)),
+        ("streaming build_catalog", lambda: build_catalog(iter_rows(source), out_dir)),
+    ):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:45s} peak {peak / 1024:8.0f} KiB  {elapsed * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    src = args[0] if args else default_source()
+    if "--measure" in sys.argv:
+        with tempfile.TemporaryDirectory() as tmp:
+            _measure(src, tmp)
+    else:
+        stats = build_catalog(iter_rows(src))
+        print(f"✅ Catalog built from {src}: {stats['recipes']} recipes in {stats['professions']} professions.")
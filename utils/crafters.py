@@ -0,0 +1,269 @@
+# utils/crafters.py
+"""
+Crafter index: recipe -> who can craft it, derived from learned recipes plus
+profession tiers. It is never persisted; the Recipes cog rebuilds it in one
+pass on startup and keeps it current on learn / unlearn / tier changes.
+
+Crafters are kept ranked per recipe (best tier first, then most recently
+active), and TierIndex keeps the same ranking per profession, so "who is
+best at X" is a slice rather than a sort.
+"""
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+TIERS = ["Novice", "Apprentice", "Journeyman", "Master", "Grandmaster"]
+
+# Professions cog names vs. catalog profession names
+PROFESSION_ALIASES = {
+    "jewelry": "jeweler",
+    "jewelcrafting": "jeweler",
+    "scribing": "scribe",
+    "armor smithing": "armorsmithing",
+    "weapon smithing": "weaponsmithing",
+    "weaving": "tailoring",  # the Professions list still calls the cloth crafter Weaving
+}
+
+
+def prof_key(name: str) -> str:
+    """Normalise a profession name so 'Jewelry' and 'Jeweler' meet."""
+    k = (name or "").strip().casefold()
+    return PROFESSION_ALIASES.get(k, k)
+
+
+def tier_rank(tier: Optional[str]) -> int:
+    """Novice=1 … Grandmaster=5; numeric tiers ("1".."5") pass through; unknown=0."""
+    t = str(tier or "").strip()
+    if t.isdigit():
+        return int(t)
+    for i, name in enumerate(TIERS, 1):
+        if name.casefold() == t.casefold():
+            return i
+    return 0
+
+
+def tier_level(tier: Optional[str], levels: Sequence[int]) -> int:
+    """
+    Highest recipe level reachable at `tier`, on the catalog's own scale.
+    `levels` are the distinct recipe levels in the catalog (Catalog.levels();
+    the scraped data has 0, 10 and 20). The n-th tier reaches the n-th level:
+    Novice 0, Apprentice 10, Journeyman 20. Tiers past the last level
+    (Master, Grandmaster) reach every recipe. Unknown tiers count as Novice.
+    """
+    if not levels:
+        return 0
+    return levels[min(max(tier_rank(tier), 1), len(levels)) - 1]
+
+
+RankKey = Tuple[int, float, int]  # (-tier_rank, -last_active, user_id): ascending = best first
+
+
+def _rank_key(user_id: int, tier: Optional[str], active: float) -> RankKey:
+    return (-tier_rank(tier), -float(active or 0), int(user_id))
+
+
+def _discard(keys: List[RankKey], key: RankKey):
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        keys.pop(i)
+
+
+class TierIndex:
+    """
+    Per-profession members sorted by tier (Grandmaster first), ties broken by
+    most recent activity. Maintained by the Professions cog.
+      members: { prof_key: [ (-rank, -active, user_id), ... ] }
+    """
+
+    def __init__(self):
+        self.members: Dict[str, List[RankKey]] = {}
+        self._keys: Dict[Tuple[str, int], RankKey] = {}
+        self._tiers: Dict[Tuple[str, int], str] = {}
+
+    def rebuild(self, data: Dict[str, Dict[str, Any]]):
+        self.members.clear()
+        self._keys.clear()
+        self._tiers.clear()
+        for uid, rec in data.items():
+            for prof, tier in (rec or {}).get("professions", {}).items():
+                k = prof_key(prof)
+                key = _rank_key(int(uid), tier, (rec or {}).get("last_active", 0))
+                self.members.setdefault(k, []).append(key)
+                self._keys[(k, int(uid))] = key
+                self._tiers[(k, int(uid))] = tier
+        for keys in self.members.values():
+            keys.sort()
+
+    def upsert(self, user_id: int, profession: str, tier: str, active: float = 0):
+        k = prof_key(profession)
+        self.remove(user_id, profession)
+        key = _rank_key(user_id, tier, active)
+        bisect.insort(self.members.setdefault(k, []), key)
+        self._keys[(k, int(user_id))] = key
+        self._tiers[(k, int(user_id))] = tier
+
+    def remove(self, user_id: int, profession: str):
+        k = prof_key(profession)
+        key = self._keys.pop((k, int(user_id)), None)
+        self._tiers.pop((k, int(user_id)), None)
+        if key is not None:
+            _discard(self.members.get(k, []), key)
+
+    def ranked(self, profession: str, limit: Optional[int] = None) -> List[Tuple[int, str]]:
+        """Best members first: [(user_id, tier)]."""
+        k = prof_key(profession)
+        keys = self.members.get(k, [])
+        return [(key[2], self._tiers[(k, key[2])]) for key in keys[:limit]]
+
+    def at_least(self, profession: str, tier: str, limit: Optional[int] = None) -> List[Tuple[int, str]]:
+        """Members at `tier` or above, best first. O(log n + k)."""
+        k = prof_key(profession)
+        keys = self.members.get(k, [])
+        end = bisect.bisect_right(keys, (-tier_rank(tier), float("inf"), 0))
+        if limit is not None:
+            end = min(end, limit)
+        return [(key[2], self._tiers[(k, key[2])]) for key in keys[:end]]
+
+
+class CrafterIndex:
+    """
+    entries:  { recipe_cf: {"name", "profession", "users": {user_id, ...}, "ranked": [RankKey, ...]} }
+    tiers:    { (user_id, prof_key): tier }
+    active:   { user_id: last activity timestamp }
+    by_user:  { user_id: {recipe_cf, ...} }
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.tiers: Dict[Tuple[int, str], str] = {}
+        self.active: Dict[int, float] = {}
+        self.by_user: Dict[int, Set[str]] = {}
+
+    def _key(self, user_id: int, profession: str) -> RankKey:
+        return _rank_key(user_id, self.tier_of(user_id, profession), self.active.get(int(user_id), 0))
+
+    def _rerank_user(self, user_id: int, change, profession: Optional[str] = None):
+        """Apply `change()` (a tier/activity update) and move the user's keys in every affected recipe."""
+        uid = int(user_id)
+        touched = [self.entries[cf] for cf in self.by_user.get(uid, ())
+                   if profession is None or prof_key(self.entries[cf]["profession"]) == prof_key(profession)]
+        for entry in touched:
+            _discard(entry["ranked"], self._key(uid, entry["profession"]))
+        change()
+        for entry in touched:
+            bisect.insort(entry["ranked"], self._key(uid, entry["profession"]))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ---------- Build ----------
+    def rebuild(self, learned: Dict[str, Dict[str, List[Dict[str, Any]]]],
+                professions: Dict[str, Dict[str, Dict[str, str]]]):
+        """Derive everything from scratch in a single pass over both stores."""
+        self.entries.clear()
+        self.tiers.clear()
+        self.active.clear()
+        self.by_user.clear()
+        for uid, rec in professions.items():
+            for prof, tier in (rec or {}).get("professions", {}).items():
+                self.tiers[(int(uid), prof_key(prof))] = tier
+            if (rec or {}).get("last_active"):
+                self.active[int(uid)] = float(rec["last_active"])
+        for uid, buckets in learned.items():
+            for prof, items in (buckets or {}).items():
+                for r in items or []:
+                    if r.get("name"):
+                        self.learn(int(uid), prof, r["name"])
+
+    # ---------- Incremental updates ----------
+    def learn(self, user_id: int, profession: str, name: str):
+        cf = name.casefold()
+        uid = int(user_id)
+        entry = self.entries.setdefault(cf, {"name": name, "profession": profession or "Unknown", "users": set(), "ranked": []})
+        if profession and entry["profession"] in ("", "Unknown"):
+            entry["profession"] = profession
+            entry["ranked"] = sorted(self._key(u, profession) for u in entry["users"])
+        if uid not in entry["users"]:
+            entry["users"].add(uid)
+            bisect.insort(entry["ranked"], self._key(uid, entry["profession"]))
+        self.by_user.setdefault(uid, set()).add(cf)
+
+    def unlearn(self, user_id: int, name: str):
+        cf = name.casefold()
+        entry = self.entries.get(cf)
+        if entry and int(user_id) in entry["users"]:
+            _discard(entry["ranked"], self._key(user_id, entry["profession"]))
+            entry["users"].discard(int(user_id))
+            if not entry["users"]:
+                del self.entries[cf]
+        mine = self.by_user.get(int(user_id))
+        if mine:
+            mine.discard(cf)
+            if not mine:
+                del self.by_user[int(user_id)]
+
+    def set_tier(self, user_id: int, profession: str, tier: Optional[str]):
+        """Record (or with tier=None, forget) a user's tier in a profession."""
+        key = (int(user_id), prof_key(profession))
+
+        def change():
+            if tier:
+                self.tiers[key] = tier
+            else:
+                self.tiers.pop(key, None)
+
+        self._rerank_user(user_id, change, profession)
+
+    def touch(self, user_id: int, ts: float):
+        """Record activity; it breaks ties between crafters of the same tier."""
+        self._rerank_user(user_id, lambda: self.active.__setitem__(int(user_id), float(ts)))
+
+    def rename(self, old: str, new: str, profession: Optional[str] = None):
+        entry = self.entries.pop(old.casefold(), None)
+        if not entry:
+            return
+        new_cf = new.casefold()
+        target = self.entries.setdefault(new_cf, {"name": new, "profession": profession or entry["profession"], "users": set(), "ranked": []})
+        target["users"] |= entry["users"]
+        target["ranked"] = sorted(self._key(u, target["profession"]) for u in target["users"])
+        for uid in entry["users"]:
+            mine = self.by_user.get(uid)
+            if mine is not None:
+                mine.discard(old.casefold())
+                mine.add(new_cf)
+
+    def set_profession(self, name: str, profession: str):
+        """A recipe moved to another profession: crafters are now ranked by their tier in that one."""
+        entry = self.entries.get((name or "").casefold())
+        if not entry or entry["profession"] == profession:
+            return
+        entry["profession"] = profession
+        entry["ranked"] = sorted(self._key(u, profession) for u in entry["users"])
+
+    # ---------- Queries ----------
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get((name or "").casefold())
+
+    def users_of(self, name: str) -> Set[int]:
+        entry = self.get(name)
+        return set(entry["users"]) if entry else set()
+
+    def tier_of(self, user_id: int, profession: str) -> Optional[str]:
+        return self.tiers.get((int(user_id), prof_key(profession)))
+
+    def crafters(self, name: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """[{id, tier}] for a recipe, best tier first, then most recently active."""
+        entry = self.get(name)
+        if not entry:
+            return []
+        prof = entry["profession"]
+        return [{"id": key[2], "tier": self.tier_of(key[2], prof) or ""} for key in entry["ranked"][:limit]]
+
+    def names_matching(self, query: str) -> Iterable[str]:
+        q = (query or "").strip().casefold()
+        return (e["name"] for cf, e in self.entries.items() if q in cf)
+
+    def user_count(self) -> int:
+        return len(self.by_user)
+
+    def professions(self) -> Set[str]:
+        return {e["profession"] for e in self.entries.values()}
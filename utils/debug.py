@@ -1,12 +1,23 @@
 # utils/debug.py
+import os
 import discord
 from discord.ext import commands
 from utils.data import load_json
 from cogs.hub import (
     PROFILES_FILE, RECIPES_FILE, LEARNED_FILE,
-    MARKET_FILE, TRADES_FILE, MAILBOX_FILE, REGISTRY_FILE
+    MARKET_FILE, TRADES_FILE, MAILBOX_FILE
 )
 
+DEV_USER_ID = int(os.getenv("DEV_USER_ID", "0"))
+
+
+def _sample(lines, n: int = 5) -> str:
+    out = "\n".join(lines[:n])
+    if len(lines) > n:
+        out += f"\n…and {len(lines) - n} more"
+    return out or "—"
+
+
 # ✅ Global helper for bot.py and other modules
 def debug_log(message: str, logger=None, bot=None, **extra):
     """
@@ -94,9 +105,50 @@ class Debug(commands.Cog):
             e.add_field(name="📬 Mailbox", value=f"⚠️ Cog not loaded | {len(inbox)} raw", inline=False)
 
         # ---- Registry ----
-        reg = load_json(REGISTRY_FILE, {})
-        e.add_field(name="📜 Registry", value=f"{len(reg)} recipes tracked", inline=False)
+        if recipes_cog and hasattr(recipes_cog, "crafters"):
+            e.add_field(name="📜 Registry", value=f"{len(recipes_cog.crafters)} recipes tracked", inline=False)
+        else:
+            e.add_field(name="📜 Registry", value="⚠️ Crafter index unavailable (Recipes cog not loaded)", inline=False)
+
+        await ctx.reply(embed=e, ephemeral=True)
 
+    @commands.hybrid_command(name="catalog_sync", description="(Dev) Apply the latest catalog build and show the diff.")
+    async def catalog_sync(self, ctx: commands.Context):
+        if ctx.author.id != DEV_USER_ID:
+            return await ctx.reply("⛔ Dev only.", ephemeral=True)
+
+        recipes_cog = self.bot.get_cog("Recipes")
+        if not recipes_cog or not hasattr(recipes_cog, "reload_catalog"):
+            return await ctx.reply("⚠️ Recipes cog not loaded.", ephemeral=True)
+        result = recipes_cog.reload_catalog()
+        if result is None:
+            return await ctx.reply("⚠️ No catalog snapshot found. Run `python -m utils.catalog` first.", ephemeral=True)
+        delta, report = result
+
+        c = delta.counts()
+        e = discord.Embed(
+            title="🗂 Catalog Sync",
+            description=(
+                f"➕ {c['added']} added · ➖ {c['removed']} removed · "
+                f"✏️ {c['renamed']} renamed · 📶 {c['level_changed']} level changes"
+                if delta else "No changes since the live catalog."
+            ),
+            color=discord.Color.purple() if delta else discord.Color.greyple(),
+        )
+        if delta:
+            e.add_field(name="➕ Added", value=_sample([f"{r['name']} ({r['profession']})" for r in delta.added]), inline=False)
+            e.add_field(name="➖ Removed", value=_sample([r["name"] for r in delta.removed]), inline=False)
+            e.add_field(name="✏️ Renamed", value=_sample([f"{o['name']} → {n['name']}" for o, n in delta.renamed]), inline=False)
+            e.add_field(name="📶 Level", value=_sample([f"{n['name']}: {o['level']} → {n['level']}" for o, n in delta.level_changed]), inline=False)
+            e.add_field(
+                name="📘 Learned references",
+                value=(
+                    f"{report['learned_renamed']} renamed · {report['moved']} moved · {report['restored']} restored\n"
+                    f"⚠️ {len(report['flagged'])} flagged as missing\n"
+                    + _sample([f"<@{uid}> — {name}" for uid, name in report["flagged"]])
+                ),
+                inline=False,
+            )
         await ctx.reply(embed=e, ephemeral=True)
 
 
@@ -0,0 +1,112 @@
+# utils/digests.py
+"""
+Wishlist match digests.
+
+Users who pick an hourly or daily digest don't get one mail per matching
+listing; instead each match is folded into a small per-user buffer keyed by
+item (count, cheapest price, villages), and the whole buffer goes out as one
+message when its period closes. A min-heap of due times tells the scheduler
+who is due without scanning every buffer.
+"""
+import heapq
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.data import load_json, save_json
+from utils.prices import format_gold
+
+DIGEST_FILE = "data/digests.json"
+
+IMMEDIATE, HOURLY, DAILY = "immediate", "hourly", "daily"
+MODES = {IMMEDIATE: "Immediately", HOURLY: "Hourly digest", DAILY: "Daily digest"}
+PERIODS = {HOURLY: 3600, DAILY: 86400}
+
+MAX_VILLAGES = 5
+
+
+def next_boundary(mode: str, now: float) -> float:
+    """End of the current hour/day (UTC) — digests go out on the boundary."""
+    period = PERIODS[mode]
+    return (int(now // period) + 1) * period
+
+
+class DigestBuffer:
+    """
+    buffers: { user_id: {
+        "due": ts,
+        "items": { item_cf: {"item", "count", "low", "low_str", "villages": [..], "last": ts} }
+    } }
+    """
+
+    def __init__(self, path: str = DIGEST_FILE):
+        self.path = path
+        self.buffers: Dict[str, Dict[str, Any]] = load_json(path, {})
+        self.heap: List[Tuple[float, int]] = [(float(b["due"]), int(uid)) for uid, b in self.buffers.items()]
+        heapq.heapify(self.heap)
+
+    def save(self):
+        save_json(self.path, self.buffers)
+
+    def add(self, user_id: int, mode: str, listing: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Fold one matching listing into the user's buffer (caller saves). True if a new period was opened."""
+        now = time.time() if now is None else now
+        buf = self.buffers.get(str(user_id))
+        opened = buf is None
+        if opened:
+            buf = self.buffers[str(user_id)] = {"due": next_boundary(mode, now), "items": {}}
+            heapq.heappush(self.heap, (buf["due"], int(user_id)))
+
+        name = (listing.get("item") or "").strip()
+        row = buf["items"].setdefault(name.casefold(), {
+            "item": name, "count": 0, "low": None, "low_str": "—", "villages": [], "last": now,
+        })
+        row["count"] += 1
+        row["last"] = now
+        price = listing.get("price")
+        if price is not None and (row["low"] is None or price < row["low"]):
+            row["low"], row["low_str"] = price, listing.get("price_str", "—")
+        village = listing.get("village") or "—"
+        if village != "—" and village not in row["villages"] and len(row["villages"]) < MAX_VILLAGES:
+            row["villages"].append(village)
+        return opened
+
+    def next_due(self) -> Optional[float]:
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """Take every buffer whose period has closed (caller saves)."""
+        now = time.time() if now is None else now
+        out: List[Tuple[int, Dict[str, Any]]] = []
+        while self.heap and self.heap[0][0] <= now:
+            due, uid = heapq.heappop(self.heap)
+            buf = self.buffers.get(str(uid))
+            if buf is None or float(buf["due"]) != due:
+                continue  # already flushed
+            out.append((uid, self.buffers.pop(str(uid))))
+        return out
+
+    def restore(self, due: List[Tuple[int, Dict[str, Any]]]):
+        """Put back buffers taken by pop_due() that couldn't be delivered; they stay due."""
+        for uid, buf in due:
+            if self.buffers.setdefault(str(uid), buf) is buf:
+                heapq.heappush(self.heap, (float(buf["due"]), int(uid)))
+
+
+def render_digest(buf: Dict[str, Any], limit: int = 20) -> Tuple[str, str]:
+    """(subject, body) summarizing one user's buffered matches, busiest items first."""
+    rows = sorted(buf["items"].values(), key=lambda r: (-r["count"], r["item"].casefold()))
+    total = sum(r["count"] for r in rows)
+    lines = []
+    for r in rows[:limit]:
+        where = f" — {', '.join(r['villages'])}" if r["villages"] else ""
+        low = format_gold(r["low"]) if r["low"] is not None else r["low_str"]
+        lines.append(f"• **{r['item']}** ×{r['count']} (from {low}){where}")
+    if len(rows) > limit:
+        lines.append(f"…and {len(rows) - limit} more items")
+    subject = f"Wishlist digest: {total} new listing{'s' if total != 1 else ''}"
+    body = (
+        "Listings matching your wishlist since your last digest:\n\n"
+        + "\n".join(lines)
+        + "\n\n(Open `/home` → Market to view. Change how often you get these under Profile → Match Alerts.)"
+    )
+    return subject, body
@@ -0,0 +1,64 @@
+# utils/expiry.py
+"""
+Min-heap of expiry times for market listings and trade posts.
+
+Entries are never removed in place: a listing that was taken down or renewed
+simply leaves a stale entry behind, and the owning cog skips it when the
+entry comes due (lazy deletion). That keeps scheduling O(log n) and means
+nothing ever rescans the stores on a timer.
+"""
+import heapq
+import re
+import time
+from typing import List, Optional, Tuple
+
+Entry = Tuple[float, str, int, int]  # (expires_at, kind, owner_id, item_id)
+
+MAX_TTL_DAYS = 90
+TTL_HELP = f"Use e.g. 30m, 12h, 7d, 2w or 1mo (up to {MAX_TTL_DAYS} days), or leave it blank."
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+TTL_UNITS = {
+    "m": MINUTE, "min": MINUTE, "mins": MINUTE, "minute": MINUTE, "minutes": MINUTE,
+    "h": HOUR, "hr": HOUR, "hrs": HOUR, "hour": HOUR, "hours": HOUR,
+    "": DAY, "d": DAY, "day": DAY, "days": DAY,
+    "w": 7 * DAY, "wk": 7 * DAY, "week": 7 * DAY, "weeks": 7 * DAY,
+    "mo": 30 * DAY, "month": 30 * DAY, "months": 30 * DAY,
+}
+
+
+def parse_ttl(text: str) -> Optional[float]:
+    """
+    '30m', '12h', '7' or '7d', '2w', '1mo' -> seconds. Unknown units, zero
+    and anything past MAX_TTL_DAYS -> None; callers reject a non-blank
+    input that gives None (blank means no expiry).
+    """
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-z]*)\s*", (text or "").lower())
+    if not m or m.group(2) not in TTL_UNITS:
+        return None
+    n = float(m.group(1)) * TTL_UNITS[m.group(2)]
+    if n <= 0 or n > MAX_TTL_DAYS * DAY:
+        return None
+    return n
+
+
+class ExpiryHeap:
+    def __init__(self):
+        self.heap: List[Entry] = []
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, expires_at: float, kind: str, owner_id: int, item_id: int):
+        heapq.heappush(self.heap, (float(expires_at), kind, int(owner_id), int(item_id)))
+
+    def next_due(self) -> Optional[float]:
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now: Optional[float] = None, limit: int = 500) -> List[Entry]:
+        """Every entry due by `now` (at most `limit`, so one sweep stays bounded)."""
+        now = time.time() if now is None else now
+        out: List[Entry] = []
+        while self.heap and self.heap[0][0] <= now and len(out) < limit:
+            out.append(heapq.heappop(self.heap))
+        return out
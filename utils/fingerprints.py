@@ -0,0 +1,76 @@
+# utils/fingerprints.py
+"""
+Duplicate and repost detection for market listings and trade posts.
+
+Each live posting gets a content fingerprint (a hash of the normalized
+seller, item, price and village/type). Posting something whose fingerprint
+is already live is a duplicate and is merged into the existing posting.
+Posting the same item again within POST_COOLDOWN seconds is rejected; the
+cooldown is per kind of post (a Wanted post doesn't block a For Sale one)
+and ends early when the seller takes the posting down themselves.
+Both checks are dict lookups.
+"""
+import hashlib
+import os
+import re
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from utils.prices import parse_price
+
+POST_COOLDOWN = int(os.getenv("POST_COOLDOWN_SECONDS", "300"))
+
+
+def _norm(s: Any) -> str:
+    return re.sub(r"\s+", " ", str(s or "").strip().casefold())
+
+
+def fingerprint(seller_id: int, item: str, price: Any, where: str = "") -> str:
+    """Same seller, item, price (by value when it parses) and village/type -> same fingerprint."""
+    gold, _ = parse_price(price)
+    price_key = f"{gold:g}" if gold is not None else _norm(price)
+    where = _norm(where)
+    raw = "\x1f".join((str(int(seller_id)), _norm(item), price_key, "" if where == "—" else where))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class FingerprintIndex:
+    """
+    live:       { fingerprint: posting id }
+    last_post:  { (seller_id, kind, item_cf): posted_at }   for the per-item cooldown
+    kind is the trade type ("For Sale" / "Wanted"), "" for market listings.
+    """
+
+    def __init__(self, cooldown: int = POST_COOLDOWN):
+        self.cooldown = cooldown
+        self.live: Dict[str, int] = {}
+        self.last_post: Dict[Tuple[int, str, str], float] = {}
+
+    def add(self, fp: str, entry_id: int, seller_id: int, item: str, posted_at: Optional[float] = None,
+            kind: str = ""):
+        self.live[fp] = int(entry_id)
+        if posted_at:
+            key = (int(seller_id), _norm(kind), _norm(item))
+            self.last_post[key] = max(posted_at, self.last_post.get(key, 0.0))
+            if len(self.last_post) > 4096:
+                cutoff = time.time() - self.cooldown
+                self.last_post = {k: ts for k, ts in self.last_post.items() if ts > cutoff}
+
+    def remove(self, fp: str, entry_id: int):
+        if self.live.get(fp) == int(entry_id):
+            del self.live[fp]
+
+    def find(self, fp: str) -> Optional[int]:
+        return self.live.get(fp)
+
+    def clear_cooldown(self, seller_id: int, item: str, kind: str = ""):
+        """The seller took their posting down: let them post the item again right away."""
+        self.last_post.pop((int(seller_id), _norm(kind), _norm(item)), None)
+
+    def cooldown_left(self, seller_id: int, item: str, now: Optional[float] = None, kind: str = "") -> float:
+        """Seconds until this seller may post this item (as `kind`) again (0 when free)."""
+        last = self.last_post.get((int(seller_id), _norm(kind), _norm(item)))
+        if last is None:
+            return 0.0
+        now = time.time() if now is None else now
+        return max(0.0, last + self.cooldown - now)
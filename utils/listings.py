@@ -0,0 +1,573 @@
+# utils/listings.py
+"""
+In-memory listing engine for the Market and the trade board.
+
+ListingStore keeps postings by stable id with secondary indexes (seller,
+item, type, village), so lookups and removals never scan the board.
+ListingIndex adds the sorted arrays Market browsing pages through. Both
+carry a full-text index (utils/textsearch.py) over item names and notes.
+
+market.json and trades.json keep their { user_id: [entry, ...] } layout on
+disk; in memory the store is primary. The index keeps (item_cf, id) keys
+in one sorted array. Pages are read from a cursor (the
+last key shown), so a page turn is a bisect plus the rows on the page.
+Every add/remove bumps the store's version, so a view can tell its pages
+are out of date (utils/snapshots.py). A text query with few hits is paged
+from the hits themselves (the smallest keys past the cursor, by heap)
+instead of walking the arrays past rows that don't match.
+
+Listings with a readable price (see utils/prices.py) are also kept in
+(price, id) order, globally and per item, for "cheapest first", "under N
+gold" and min/median summaries.
+"""
+import bisect
+import heapq
+from typing import AbstractSet, Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from utils.prices import APPROX, parse_price
+from utils.snapshots import Versions
+from utils.textsearch import TextIndex
+
+Cursor = Tuple[str, int]  # (item_cf, listing id) of the last row on a page
+PriceCursor = Tuple[float, int]  # (price, listing id)
+RankCursor = Tuple[float, int]  # (-relevance, listing id)
+Row = Tuple[int, Dict[str, Any]]  # (seller_id, listing)
+
+RANKINGS_KEPT = 8  # relevance rankings kept for page turns (most recently used)
+
+
+def _ci(s: str) -> str:
+    return (s or "").strip().casefold()
+
+
+def normalize_market(raw: Any) -> Dict[str, List[Dict[str, Any]]]:
+    """Accept the old flat list layout ([{item, price, seller_id, ...}]) as well as the per-user dict."""
+    if isinstance(raw, dict):
+        return raw
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for l in raw or []:
+        uid = str(l.get("seller_id") or 0)
+        out.setdefault(uid, []).append({
+            "item": l.get("item", ""),
+            "price_str": l.get("price_str") or (str(l["price"]) if l.get("price") is not None else "—"),
+            "price": l.get("price"),
+            "village": l.get("village") or "—",
+            "note": l.get("note", ""),
+        })
+    return out
+
+
+def _discard(keys: List[Any], key: Any):
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        keys.pop(i)
+
+
+def _after(keys: List[Any], after: Optional[Any]) -> Iterator[Any]:
+    """Keys strictly after `after` (all of them if None), starting with one bisect."""
+    i = bisect.bisect_right(keys, after) if after else 0
+    for j in range(i, len(keys)):
+        yield keys[j]
+
+
+def village_key(listing: Dict[str, Any]) -> str:
+    """Normalized village ("" when the listing has none)."""
+    v = _ci(listing.get("village", ""))
+    return "" if v == "—" else v
+
+
+def normalize_price(listing: Dict[str, Any]) -> bool:
+    """
+    Fill the numeric "price" (gold, or None) and "price_confidence" columns
+    from price_str. Approximate prices are parsed again, so listings saved
+    before a parser fix (ranges, quantities) pick it up. Returns True if
+    the listing was changed.
+    """
+    if "price_confidence" in listing:
+        if listing["price_confidence"] != APPROX or not listing.get("price_str"):
+            return False
+        parsed = parse_price(listing["price_str"])
+        if parsed == (listing.get("price"), listing["price_confidence"]):
+            return False
+        listing["price"], listing["price_confidence"] = parsed
+        return True
+    raw = listing.get("price") if isinstance(listing.get("price"), (int, float)) else listing.get("price_str")
+    listing["price"], listing["price_confidence"] = parse_price(raw)
+    return True
+
+
+class ListingStore:
+    """
+    Postings (market listings or trade posts) keyed by stable integer id.
+
+    by_id:       { id: (seller_id, entry) }            primary storage
+    by_seller:   { seller_id: {id: None} }             insertion-ordered id sets
+    by_item:     { item_cf: {id: None} }
+    by_type:     { type: {id: None} }                  trade posts ("For Sale"/"Wanted")
+    by_village:  { village_cf: {id: None} }            listings with a village
+    text:        full-text index over item + note (BM25)
+
+    The JSON files keep their { user_id: [entry, ...] } layout: `load` reads
+    it and `grouped` writes it back.
+    """
+
+    def __init__(self):
+        self.by_id: Dict[int, Row] = {}
+        self.by_seller: Dict[int, Dict[int, None]] = {}
+        self.by_item: Dict[str, Dict[int, None]] = {}
+        self.by_type: Dict[str, Dict[int, None]] = {}
+        self.by_village: Dict[str, Dict[int, None]] = {}
+        self.text = TextIndex()
+        self.next_id = 1
+        # bumped on every change, so open views can offer a refresh (utils/snapshots.py)
+        self.versions = Versions()
+        # (query, filter) -> (version, full ranking), for relevance page turns
+        self._rankings: Dict[Tuple[str, Hashable], Tuple[int, List[RankCursor]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def _secondary(self, seller_id: int, entry: Dict[str, Any]) -> List[Tuple[Dict[Any, Dict[int, None]], Any]]:
+        out: List[Tuple[Dict[Any, Dict[int, None]], Any]] = [
+            (self.by_seller, int(seller_id)),
+            (self.by_item, _ci(entry.get("item", ""))),
+        ]
+        if entry.get("type"):
+            out.append((self.by_type, entry["type"]))
+        village = village_key(entry)
+        if village:
+            out.append((self.by_village, village))
+        return out
+
+    def clear(self):
+        for d in (self.by_id, self.by_seller, self.by_item, self.by_type, self.by_village):
+            d.clear()
+        self.text = TextIndex()
+        self._rankings.clear()
+        self.next_id = 1
+
+    def load(self, grouped: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """Index every entry; returns True if some entries had to be given ids."""
+        self.clear()
+        self.next_id = 1 + max((int(e["id"]) for es in grouped.values() for e in es if "id" in e), default=0)
+        assigned = False
+        for uid, es in grouped.items():
+            for e in es:
+                if "id" not in e:
+                    e["id"] = self.next_id
+                    assigned = True
+                self.add(int(uid), e)
+        return assigned
+
+    def add(self, seller_id: int, entry: Dict[str, Any]) -> int:
+        if "id" not in entry:
+            entry["id"] = self.next_id
+        eid = int(entry["id"])
+        self.next_id = max(self.next_id, eid + 1)
+        self.by_id[eid] = (int(seller_id), entry)
+        for index, key in self._secondary(seller_id, entry):
+            index.setdefault(key, {})[eid] = None
+        self.text.add(eid, [(entry.get("item", ""), 2.0), (entry.get("note", ""), 1.0)])
+        self.versions.bump()
+        return eid
+
+    def remove(self, entry_id: int) -> Optional[Row]:
+        row = self.by_id.pop(int(entry_id), None)
+        if row is None:
+            return None
+        self.text.remove(int(entry_id))
+        for index, key in self._secondary(*row):
+            ids = index.get(key)
+            if ids is not None:
+                ids.pop(int(entry_id), None)
+                if not ids:
+                    del index[key]
+        self.versions.bump()
+        return row
+
+    def get(self, entry_id: int) -> Optional[Row]:
+        return self.by_id.get(int(entry_id))
+
+    def reindex_text(self, entry_id: int):
+        """Call after editing an entry's note in place."""
+        row = self.by_id.get(int(entry_id))
+        if row:
+            self.text.add(int(entry_id), [(row[1].get("item", ""), 2.0), (row[1].get("note", ""), 1.0)])
+            self.versions.bump()
+
+    def version(self) -> int:
+        return self.versions.version()
+
+    def of_seller(self, seller_id: int) -> List[Dict[str, Any]]:
+        return [self.by_id[i][1] for i in self.by_seller.get(int(seller_id), ())]
+
+    def rows(self) -> List[Row]:
+        return list(self.by_id.values())
+
+    def find(self, seller_id: Optional[int] = None, item: Optional[str] = None,
+             type: Optional[str] = None, village: Optional[str] = None) -> List[int]:
+        """Ids matching every given filter (intersection, smallest set first), in id order."""
+        sets = []
+        if seller_id is not None:
+            sets.append(self.by_seller.get(int(seller_id), {}))
+        if item is not None:
+            sets.append(self.by_item.get(_ci(item), {}))
+        if type is not None:
+            sets.append(self.by_type.get(type, {}))
+        if village is not None:
+            sets.append(self.by_village.get(_ci(village), {}))
+        if not sets:
+            return sorted(self.by_id)
+        sets.sort(key=len)
+        first, rest = sets[0], sets[1:]
+        return sorted(i for i in first if all(i in s for s in rest))
+
+    def search(self, query: str, after: Optional[RankCursor] = None, limit: int = 6,
+               accept: Optional[AbstractSet[int]] = None,
+               accept_key: Hashable = None) -> Tuple[List[Row], Optional[RankCursor]]:
+        """
+        Full-text search over item + note, best match first. Returns
+        (rows, cursor for the next page or None); `accept` limits the ids and
+        `accept_key` names that filter, so rankings can be reused.
+
+        The first page is a top-k pick from the scores (no sort). Turning a
+        page ranks the whole result once and keeps it, keyed by store version,
+        query and filter, so later pages are a bisect plus their own rows.
+        """
+        if after is None:
+            best = [(-score, eid) for score, eid in self.text.search(query, limit + 1, accept)]
+        else:
+            key = (_ci(query), accept_key)
+            cached = self._rankings.pop(key, None)
+            if cached is None or cached[0] != self.version():
+                cached = (self.version(), [(-score, eid) for score, eid in self.text.search(query, accept=accept)])
+            self._rankings[key] = cached  # most recent last
+            while len(self._rankings) > RANKINGS_KEPT:
+                del self._rankings[next(iter(self._rankings))]
+            ranked = cached[1]
+            i = bisect.bisect_right(ranked, after)
+            best = ranked[i:i + limit + 1]
+        page = best[:limit]
+        return [self.by_id[eid] for _, eid in page], (page[-1] if len(best) > limit else None)
+
+    def grouped(self) -> Dict[str, List[Dict[str, Any]]]:
+        """{ seller_id: [entry, ...] } in posting order, for saving."""
+        return {str(uid): [self.by_id[i][1] for i in ids] for uid, ids in self.by_seller.items()}
+
+
+class BoardIndex(ListingStore):
+    """
+    A ListingStore plus newest-first paging for the trade board. Ids grow
+    with posting time, so sorted id arrays double as the time index:
+    recent:     [ id, ... ] ascending
+    type_ids:   { type: [ id, ... ] } ascending
+    item_ids:   { item_cf: [ id, ... ] } ascending
+    A page is a bisect below the cursor (the last id shown) plus the rows on it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.recent: List[int] = []
+        self.type_ids: Dict[str, List[int]] = {}
+        self.item_ids: Dict[str, List[int]] = {}
+
+    def clear(self):
+        super().clear()
+        self.recent.clear()
+        self.type_ids.clear()
+        self.item_ids.clear()
+
+    def add(self, seller_id: int, entry: Dict[str, Any]) -> int:
+        eid = super().add(seller_id, entry)
+        bisect.insort(self.recent, eid)
+        bisect.insort(self.type_ids.setdefault(entry.get("type", ""), []), eid)
+        bisect.insort(self.item_ids.setdefault(_ci(entry.get("item", "")), []), eid)
+        return eid
+
+    def remove(self, entry_id: int) -> Optional[Row]:
+        row = super().remove(entry_id)
+        if row is None:
+            return None
+        _discard(self.recent, int(entry_id))
+        for groups, key in ((self.type_ids, row[1].get("type", "")), (self.item_ids, _ci(row[1].get("item", "")))):
+            ids = groups.get(key, [])
+            _discard(ids, int(entry_id))
+            if not ids:
+                groups.pop(key, None)
+        return row
+
+    def newest(self, before: Optional[int] = None, limit: int = 8, type: str = "",
+               item: str = "") -> Tuple[List[Row], Optional[int]]:
+        """
+        Newest first, optionally one type and/or one item. Returns
+        (rows, cursor for the next page or None if this is the last).
+        """
+        if type and item:
+            # walk the shorter array, check the other through its id set
+            by_type, by_item = self.type_ids.get(type, []), self.item_ids.get(_ci(item), [])
+            ids, other = (by_type, self.by_item.get(_ci(item), {})) if len(by_type) <= len(by_item) \
+                else (by_item, self.by_type.get(type, {}))
+        elif type:
+            ids, other = self.type_ids.get(type, []), None
+        elif item:
+            ids, other = self.item_ids.get(_ci(item), []), None
+        else:
+            ids, other = self.recent, None
+        j = bisect.bisect_left(ids, before) if before is not None else len(ids)
+        rows: List[Row] = []
+        last: Optional[int] = None
+        while j > 0:
+            j -= 1
+            eid = ids[j]
+            if other is not None and eid not in other:
+                continue
+            if len(rows) == limit:
+                return rows, last
+            rows.append(self.by_id[eid])
+            last = eid
+        return rows, None
+
+
+class ListingIndex(ListingStore):
+    """
+    A ListingStore plus the sorted arrays Market browsing reads from:
+    keys:         [ (item_cf, id), ... ] sorted
+    prices:       [ (price, id), ... ] sorted, priced listings only
+    item_prices:  { item_cf: [ (price, id), ... ] } sorted
+    village_keys:   { village_cf: [ (item_cf, id), ... ] } sorted
+    village_prices: { village_cf: [ (price, id), ... ] } sorted
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.keys: List[Cursor] = []
+        self.prices: List[PriceCursor] = []
+        self.item_prices: Dict[str, List[PriceCursor]] = {}
+        self.village_keys: Dict[str, List[Cursor]] = {}
+        self.village_prices: Dict[str, List[PriceCursor]] = {}
+
+    def clear(self):
+        super().clear()
+        self.keys.clear()
+        self.prices.clear()
+        self.item_prices.clear()
+        self.village_keys.clear()
+        self.village_prices.clear()
+
+    def rebuild(self, market: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """Index every listing; returns True if some listings had to be given ids or prices."""
+        changed = any([normalize_price(l) for ls in market.values() for l in ls])
+        return self.load(market) or changed
+
+    def add(self, seller_id: int, listing: Dict[str, Any]) -> int:
+        normalize_price(listing)
+        lid = super().add(seller_id, listing)
+        village = village_key(listing)
+        bisect.insort(self.keys, (_ci(listing.get("item", "")), lid))
+        if village:
+            bisect.insort(self.village_keys.setdefault(village, []), (_ci(listing.get("item", "")), lid))
+        if listing.get("price") is not None:
+            key = (float(listing["price"]), lid)
+            bisect.insort(self.prices, key)
+            bisect.insort(self.item_prices.setdefault(_ci(listing.get("item", "")), []), key)
+            if village:
+                bisect.insort(self.village_prices.setdefault(village, []), key)
+        return lid
+
+    def remove(self, listing_id: int) -> Optional[Row]:
+        row = super().remove(listing_id)
+        if row is None:
+            return None
+        item_cf = _ci(row[1].get("item", ""))
+        village = village_key(row[1])
+        _discard(self.keys, (item_cf, int(listing_id)))
+        if village:
+            self._discard_in(self.village_keys, village, (item_cf, int(listing_id)))
+        if row[1].get("price") is not None:
+            key = (float(row[1]["price"]), int(listing_id))
+            _discard(self.prices, key)
+            self._discard_in(self.item_prices, item_cf, key)
+            if village:
+                self._discard_in(self.village_prices, village, key)
+        return row
+
+    @staticmethod
+    def _discard_in(groups: Dict[str, List[Any]], group: str, key: Any):
+        keys = groups.get(group, [])
+        _discard(keys, key)
+        if not keys:
+            groups.pop(group, None)
+
+    def villages(self) -> List[Tuple[str, str, int]]:
+        """[(village_cf, display name, listings)] busiest first."""
+        out = []
+        for cf, ids in self.by_village.items():
+            first = self.by_id[next(iter(ids))][1]
+            out.append((cf, first.get("village", cf).strip(), len(ids)))
+        out.sort(key=lambda v: (-v[2], v[0]))
+        return out
+
+    # ---------- Reads ----------
+    def _range(self, item_cf: str, after: Optional[Cursor] = None) -> Tuple[int, int]:
+        lo = bisect.bisect_right(self.keys, after) if after and after[0] == item_cf else bisect.bisect_left(self.keys, (item_cf,))
+        hi = bisect.bisect_left(self.keys, (item_cf, float("inf")))
+        return lo, hi
+
+    def _scan(self, after: Optional[Cursor], items: Optional[Iterable[str]],
+              village: str = "") -> Iterator[Cursor]:
+        if village:
+            vkeys = self.village_keys.get(village, [])
+            if items is None:
+                yield from _after(vkeys, after)
+                return
+            # Intersect item ranges with the village, driving from the smaller side
+            wanted = set(items)
+            if sum(len(self.by_item.get(cf, ())) for cf in wanted) < len(vkeys):
+                in_village = self.by_village.get(village, {})
+                yield from (k for k in self._scan(after, wanted) if k[1] in in_village)
+            else:
+                yield from (k for k in _after(vkeys, after) if k[0] in wanted)
+            return
+        if items is None:
+            i = bisect.bisect_right(self.keys, after) if after else 0
+            yield from (self.keys[j] for j in range(i, len(self.keys)))
+            return
+        # Exact-item filter (e.g. a wishlist): one bisected range per item, in key order
+        for cf in sorted(set(items)):
+            if after and cf < after[0]:
+                continue
+            lo, hi = self._range(cf, after)
+            yield from (self.keys[j] for j in range(lo, hi))
+
+    def _sparse(self, hits: Optional[AbstractSet[int]], limit: int) -> bool:
+        """
+        True when a query's hits are few enough to page from directly. Walking
+        a sorted array costs about limit * n / hits rows before a page fills;
+        ranking the hits costs len(hits). Whichever is smaller wins.
+        """
+        return hits is not None and len(hits) * len(hits) <= limit * max(len(self.by_id), 1)
+
+    def _hit_page(self, hits: AbstractSet[int], after: Optional[Any], limit: int,
+                  key_of: Callable[[int], Optional[Any]]) -> Tuple[List[Row], Optional[Any]]:
+        """
+        A page built from the text hits alone: each hit's sort key (None = filtered
+        out), then the `limit` smallest past the cursor. O(hits · log limit).
+        """
+        keys = (k for k in map(key_of, hits) if k is not None and (after is None or k > after))
+        best = heapq.nsmallest(limit + 1, keys)
+        rows = [self.by_id[k[1]] for k in best[:limit]]
+        return rows, (best[limit - 1] if len(best) > limit else None)
+
+    def page(self, after: Optional[Cursor] = None, limit: int = 6, query: str = "",
+             items: Optional[Iterable[str]] = None, village: str = "") -> Tuple[List[Row], Optional[Cursor]]:
+        """
+        Up to `limit` rows after the cursor, optionally only item names
+        or note matching `query` (every word), exactly one of `items`
+        (casefolded) and/or in `village`.
+        Returns (rows, cursor for the next page or None if this is the last).
+        """
+        hits = self.text.matching(query)
+        village = _ci(village)
+        if self._sparse(hits, limit):
+            wanted = set(items) if items is not None else None
+            in_village = self.by_village.get(village, {}) if village else None
+
+            def key_of(eid: int) -> Optional[Cursor]:
+                cf = _ci(self.by_id[eid][1].get("item", ""))
+                if (wanted is not None and cf not in wanted) or (in_village is not None and eid not in in_village):
+                    return None
+                return cf, eid
+            return self._hit_page(hits, after, limit, key_of)
+        rows: List[Row] = []
+        last: Optional[Cursor] = None
+        for key in self._scan(after, items, village):
+            if hits is not None and key[1] not in hits:
+                continue
+            if len(rows) == limit:
+                return rows, last
+            rows.append(self.by_id[key[1]])
+            last = key
+        return rows, None
+
+    def page_by_price(self, after: Optional[PriceCursor] = None, limit: int = 6, query: str = "",
+                      items: Optional[Iterable[str]] = None,
+                      max_price: Optional[float] = None,
+                      village: str = "") -> Tuple[List[Row], Optional[PriceCursor]]:
+        """
+        Cheapest first, priced listings only. With `items`, the per-item price
+        arrays are merged; with `village`, that village's price array is read
+        (intersected with `items` from the smaller side). `max_price` stops the
+        scan at the first dearer row.
+        """
+        village = _ci(village)
+        wanted = set(items) if items is not None else None
+        hits = self.text.matching(query)
+        if self._sparse(hits, limit):
+            in_village = self.by_village.get(village, {}) if village else None
+
+            def key_of(eid: int) -> Optional[PriceCursor]:
+                listing = self.by_id[eid][1]
+                price = listing.get("price")
+                if price is None or (max_price is not None and float(price) > max_price):
+                    return None
+                if wanted is not None and _ci(listing.get("item", "")) not in wanted:
+                    return None
+                if in_village is not None and eid not in in_village:
+                    return None
+                return float(price), eid
+            return self._hit_page(hits, after, limit, key_of)
+        vprices = self.village_prices.get(village, []) if village else None
+        source: Iterable[PriceCursor]
+        if wanted is None:
+            source = _after(self.prices if vprices is None else vprices, after)
+        else:
+            merged = heapq.merge(*(_after(self.item_prices.get(cf, []), after) for cf in wanted))
+            if vprices is None:
+                source = merged
+            elif sum(len(self.item_prices.get(cf, ())) for cf in wanted) < len(vprices):
+                in_village = self.by_village.get(village, {})
+                source = (k for k in merged if k[1] in in_village)
+            else:
+                source = (k for k in _after(vprices, after) if _ci(self.by_id[k[1]][1].get("item", "")) in wanted)
+        rows: List[Row] = []
+        last: Optional[PriceCursor] = None
+        for key in source:
+            if max_price is not None and key[0] > max_price:
+                break
+            if hits is not None and key[1] not in hits:
+                continue
+            seller_id, listing = self.by_id[key[1]]
+            if len(rows) == limit:
+                return rows, last
+            rows.append((seller_id, listing))
+            last = key
+        return rows, None
+
+    def page_by_relevance(self, after: Optional[RankCursor] = None, limit: int = 6, query: str = "",
+                          items: Optional[Iterable[str]] = None, max_price: Optional[float] = None,
+                          village: str = "") -> Tuple[List[Row], Optional[RankCursor]]:
+        """Best text match first; the other filters narrow the candidate ids before ranking."""
+        accept: Optional[Set[int]] = None
+        if items is not None:
+            accept = {i for cf in set(items) for i in self.by_item.get(cf, ())}
+        if village:
+            in_village = self.by_village.get(_ci(village), {})
+            accept = set(in_village) if accept is None else {i for i in accept if i in in_village}
+        if max_price is not None:
+            cheap = {i for p, i in self.prices[:bisect.bisect_right(self.prices, (max_price, float("inf")))]}
+            accept = cheap if accept is None else accept & cheap
+        key = (tuple(sorted(set(items))) if items is not None else None, _ci(village), max_price)
+        return self.search(query, after, limit, accept, key)
+
+    def price_summary(self, item: str) -> Optional[Dict[str, float]]:
+        """{count, min, median, max} over an item's priced listings, or None. O(1)."""
+        keys = self.item_prices.get(_ci(item))
+        if not keys:
+            return None
+        n = len(keys)
+        mid = keys[n // 2][0] if n % 2 else (keys[n // 2 - 1][0] + keys[n // 2][0]) / 2
+        return {"count": n, "min": keys[0][0], "median": mid, "max": keys[-1][0]}
+
+    def count_items(self, items: Iterable[str]) -> int:
+        """Number of listings whose item is exactly one of `items` (casefolded)."""
+        return sum(len(self.by_item.get(cf, ())) for cf in set(items))
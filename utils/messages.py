@@ -0,0 +1,264 @@
+# utils/messages.py
+"""
+The one message store behind both mail UIs (cogs/mailbox.py and cogs/mail.py).
+
+mailbox.json keeps its { user_id: [msg, ...] } layout, each message
+{id, from, subject, body, ts, read}. Ids are mailbox-wide ints handed out in
+delivery order, so an inbox in id order is also in time order: sending
+appends, and nothing is ever re-sorted. Lookup by id is a dict hit.
+
+Each inbox also keeps sorted id lists of its unread messages and of each
+sender's messages, updated on send/read/delete. Unread badges are their
+lengths, and inbox pages are read newest first from a cursor (the last id
+shown) with one bisect into whichever list the filters pick, so a page
+costs its own rows however large the inbox is.
+
+Older files (string ids from the Mail cog, messages without ids or "ts")
+are renumbered once on load, by time.
+
+send_many_async keeps big fan-outs off the event loop: messages are added
+in memory on the loop, and the JSON write runs in a worker thread. Writes
+are serialized by a lock and numbered, so an older snapshot never
+overwrites a newer one.
+"""
+import asyncio
+import bisect
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.data import load_json, save_json
+from utils.snapshots import Versions
+
+MAILBOX_FILE = "data/mailbox.json"
+
+
+def _discard(ids: List[int], msg_id: int):
+    i = bisect.bisect_left(ids, msg_id)
+    if i < len(ids) and ids[i] == msg_id:
+        ids.pop(i)
+
+
+class MessageStore:
+    """
+    by_id:   { msg_id: (user_id, msg) }
+    inboxes: { user_id: [msg_id, ...] }   ascending = oldest first
+    unread:  { user_id: [msg_id, ...] }   unread only, ascending
+    senders: { user_id: { from_id: [msg_id, ...] } }
+    """
+
+    def __init__(self, path: str = MAILBOX_FILE):
+        self.path = path
+        self.by_id: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+        self.inboxes: Dict[int, List[int]] = {}
+        self.unread: Dict[int, List[int]] = {}
+        self.senders: Dict[int, Dict[int, List[int]]] = {}
+        self.next_id = 1
+        # per-inbox versions, bumped when mail arrives, so open views can offer a refresh
+        self.versions = Versions()
+        self._write_lock = threading.Lock()
+        self._generation = 0   # snapshots taken
+        self._written = 0      # newest snapshot on disk
+        self.load()
+
+    def load(self):
+        raw = load_json(self.path, {}) or {}
+        rows = [(int(uid), pos, m) for uid, ms in raw.items() for pos, m in enumerate(ms or [])]
+        for _, _, m in rows:
+            m["from"] = int(m.get("from") or 0)
+            m["ts"] = int(m.get("ts") or 0)
+            m["read"] = bool(m.get("read"))
+            m.setdefault("subject", "(No Subject)")
+            m.setdefault("body", "")
+            m.pop("to", None)  # the inbox key is the recipient
+        ids = [m.get("id") for _, _, m in rows]
+        in_order = sorted(rows, key=lambda r: (r[2]["ts"], r[2]["id"] if isinstance(r[2].get("id"), int) else 0, r[1]))
+        migrate = (
+            any(not isinstance(i, int) for i in ids)
+            or len(set(ids)) != len(ids)
+            or [r[2]["id"] for r in in_order] != sorted(ids)
+        )
+        if migrate:
+            for n, (_, _, m) in enumerate(in_order, start=1):
+                m["id"] = n
+        self.by_id.clear()
+        self.inboxes.clear()
+        self.unread.clear()
+        self.senders.clear()
+        for uid, _, m in sorted(rows, key=lambda r: r[2]["id"]):
+            self._link(uid, m)
+        self.next_id = 1 + max(self.by_id, default=0)
+        if migrate:
+            self.save()
+
+    def _snapshot(self) -> Tuple[int, Dict[str, List[Dict[str, Any]]]]:
+        """Fresh lists of the current messages, safe to serialize while the store keeps changing."""
+        self._generation += 1
+        return self._generation, {
+            str(uid): [self.by_id[i][1] for i in ids] for uid, ids in self.inboxes.items() if ids
+        }
+
+    def _write(self, generation: int, payload: Dict[str, List[Dict[str, Any]]]):
+        with self._write_lock:
+            if generation > self._written:
+                save_json(self.path, payload)
+                self._written = generation
+
+    def save(self):
+        self._write(*self._snapshot())
+
+    async def save_async(self):
+        """save() with the JSON encoding and file write in a worker thread."""
+        await asyncio.to_thread(self._write, *self._snapshot())
+
+    def _link(self, user_id: int, msg: Dict[str, Any]):
+        self.by_id[msg["id"]] = (user_id, msg)
+        self.inboxes.setdefault(user_id, []).append(msg["id"])  # ids only grow
+        self.senders.setdefault(user_id, {}).setdefault(msg["from"], []).append(msg["id"])
+        if not msg["read"]:
+            self.unread.setdefault(user_id, []).append(msg["id"])
+
+    def _unlink(self, user_id: int, msg: Dict[str, Any]):
+        del self.by_id[msg["id"]]
+        _discard(self.inboxes[user_id], msg["id"])
+        by_sender = self.senders[user_id]
+        _discard(by_sender[msg["from"]], msg["id"])
+        if not by_sender[msg["from"]]:
+            del by_sender[msg["from"]]
+        if not msg["read"]:
+            _discard(self.unread[user_id], msg["id"])
+
+    # ---------- Writes ----------
+    def deliver(self, from_id: int, to_id: int, subject: str, body: str) -> Dict[str, Any]:
+        """Add a message without saving; call save() once after a batch."""
+        msg = {
+            "id": self.next_id,
+            "from": int(from_id),
+            "subject": subject or "(No Subject)",
+            "body": body,
+            "ts": int(time.time()),
+            "read": False,
+        }
+        self.next_id += 1
+        self._link(int(to_id), msg)
+        self.versions.bump(int(to_id))
+        return msg
+
+    def send(self, from_id: int, to_id: int, subject: str, body: str) -> Dict[str, Any]:
+        msg = self.deliver(from_id, to_id, subject, body)
+        self.save()
+        return msg
+
+    def send_many(self, messages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Deliver {from_id, to_id, subject, body} dicts and write mailbox.json once."""
+        sent = [self.deliver(m["from_id"], m["to_id"], m.get("subject", ""), m.get("body", "")) for m in messages]
+        if sent:
+            self.save()
+        return sent
+
+    async def send_many_async(self, messages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """send_many without blocking the event loop on the write."""
+        sent = [self.deliver(m["from_id"], m["to_id"], m.get("subject", ""), m.get("body", "")) for m in messages]
+        if sent:
+            await self.save_async()
+        return sent
+
+    def mark_read(self, user_id: int, msg_id: int, read: bool = True) -> bool:
+        msg = self.get(user_id, msg_id)
+        if msg is None or msg["read"] == read:
+            return False
+        msg["read"] = read
+        unread = self.unread.setdefault(int(user_id), [])
+        if read:
+            _discard(unread, msg["id"])
+        else:
+            bisect.insort(unread, msg["id"])
+        self.save()
+        return True
+
+    def mark_all_read(self, user_id: int, sender: Optional[int] = None) -> int:
+        """Mark every unread message (or every one from `sender`) read with a single write."""
+        uid = int(user_id)
+        unread = self.unread.get(uid, [])
+        keep: List[int] = []
+        done = 0
+        for i in unread:
+            msg = self.by_id[i][1]
+            if sender is not None and msg["from"] != int(sender):
+                keep.append(i)
+                continue
+            msg["read"] = True
+            done += 1
+        if done:
+            self.unread[uid] = keep
+            self.save()
+        return done
+
+    def delete(self, user_id: int, msg_id: int) -> bool:
+        msg = self.get(user_id, msg_id)
+        if msg is None:
+            return False
+        self._unlink(int(user_id), msg)
+        self.save()
+        return True
+
+    # ---------- Reads ----------
+    def get(self, user_id: int, msg_id: Any) -> Optional[Dict[str, Any]]:
+        """A message by id, only if it's in this user's inbox."""
+        try:
+            owner, msg = self.by_id[int(msg_id)]
+        except (KeyError, TypeError, ValueError):
+            return None
+        return msg if owner == int(user_id) else None
+
+    def inbox(self, user_id: int) -> List[Dict[str, Any]]:
+        return [self.by_id[i][1] for i in self.inboxes.get(int(user_id), [])]
+
+    def page(self, user_id: int, before: Optional[int] = None, limit: int = 5, unread: bool = False,
+             sender: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Newest first, optionally unread only and/or from one sender. Returns
+        (messages, cursor for the next page or None if this is the last).
+        """
+        uid = int(user_id)
+        by_sender = self.senders.get(uid, {}).get(int(sender), []) if sender is not None else None
+        check = None
+        if unread and by_sender is not None:
+            # walk the shorter list, check the other condition on the message
+            if len(self.unread.get(uid, [])) <= len(by_sender):
+                ids, check = self.unread.get(uid, []), lambda m: m["from"] == int(sender)
+            else:
+                ids, check = by_sender, lambda m: not m["read"]
+        elif unread:
+            ids = self.unread.get(uid, [])
+        elif by_sender is not None:
+            ids = by_sender
+        else:
+            ids = self.inboxes.get(uid, [])
+        j = bisect.bisect_left(ids, before) if before is not None else len(ids)
+        out: List[Dict[str, Any]] = []
+        last: Optional[int] = None
+        while j > 0:
+            j -= 1
+            msg = self.by_id[ids[j]][1]
+            if check is not None and not check(msg):
+                continue
+            if len(out) == limit:
+                return out, last
+            out.append(msg)
+            last = msg["id"]
+        return out, None
+
+    def senders_of(self, user_id: int, limit: int = 24) -> List[int]:
+        """Who has written to this user, most recent first."""
+        by_sender = self.senders.get(int(user_id), {})
+        return sorted(by_sender, key=lambda f: by_sender[f][-1], reverse=True)[:limit]
+
+    def version(self, user_id: int) -> int:
+        return self.versions.version(int(user_id))
+
+    def count(self, user_id: int) -> int:
+        return len(self.inboxes.get(int(user_id), ()))
+
+    def unread_count(self, user_id: int) -> int:
+        return len(self.unread.get(int(user_id), ()))
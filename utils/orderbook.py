@@ -0,0 +1,132 @@
+# utils/orderbook.py
+"""
+Per-item order books pairing "Wanted" trade posts (bids) with "For Sale"
+trade posts and Market listings (asks).
+
+Only orders with a readable price (utils/prices.py) take part. Each item has
+two sorted arrays with price-time priority:
+  asks: (price, posted_at, source, id)     cheapest, then oldest first
+  bids: (-price, posted_at, source, id)    highest, then oldest first
+Adding an order walks the opposite side from the best price and stops at the
+first one that doesn't cross, so matching costs the crossing depth of that
+item's book, never a scan of the whole board.
+
+Matching only introduces buyers to sellers; nothing is filled or removed.
+Each pair is found exactly once — when the later of its two orders arrives.
+"""
+import bisect
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from utils.prices import parse_price
+
+ASK, BID = "ask", "bid"
+MARKET, TRADE = "market", "trade"
+
+OrderKey = Tuple[str, int]  # (source, id)
+
+
+def _ci(s: str) -> str:
+    return (s or "").strip().casefold()
+
+
+class Order(NamedTuple):
+    source: str        # MARKET listing or TRADE post
+    id: int
+    owner_id: int
+    side: str          # ASK / BID
+    item: str
+    price: float
+    posted_at: float
+    price_str: str
+
+
+class Match(NamedTuple):
+    bid: Order
+    ask: Order
+
+
+class _Book:
+    __slots__ = ("asks", "bids")
+
+    def __init__(self):
+        self.asks: List[Tuple[float, float, str, int]] = []
+        self.bids: List[Tuple[float, float, str, int]] = []
+
+
+def _book_key(o: Order) -> Tuple[float, float, str, int]:
+    return (o.price if o.side == ASK else -o.price, o.posted_at, o.source, o.id)
+
+
+class OrderBooks:
+    def __init__(self):
+        self.books: Dict[str, _Book] = {}
+        self.orders: Dict[OrderKey, Order] = {}
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    @staticmethod
+    def make_order(source: str, owner_id: int, side: str, entry: Dict[str, Any]) -> Optional[Order]:
+        """Order for a listing/post dict, or None if it has no readable price."""
+        if source == MARKET:
+            raw, price = entry.get("price_str"), entry.get("price")  # parsed when listed
+        else:
+            raw = entry.get("price")
+            price = parse_price(raw)[0]
+        if price is None or not _ci(entry.get("item", "")) or "id" not in entry:
+            return None
+        return Order(source, int(entry["id"]), int(owner_id), side, entry.get("item", "").strip(),
+                     float(price), float(entry.get("posted_at") or 0), str(raw or "—"))
+
+    def add(self, order: Optional[Order], limit: int = 10) -> List[Match]:
+        """Insert an order and return the resting orders it crosses (best first, at most `limit`)."""
+        if order is None:
+            return []
+        key = (order.source, order.id)
+        if key in self.orders:
+            self.remove(order.source, order.id)
+        book = self.books.setdefault(_ci(order.item), _Book())
+        matches: List[Match] = []
+        if order.side == BID:
+            for price, _, src, oid in book.asks:
+                if price > order.price or len(matches) >= limit:
+                    break
+                ask = self.orders[(src, oid)]
+                if ask.owner_id != order.owner_id:
+                    matches.append(Match(order, ask))
+            bisect.insort(book.bids, _book_key(order))
+        else:
+            for neg, _, src, oid in book.bids:
+                if -neg < order.price or len(matches) >= limit:
+                    break
+                bid = self.orders[(src, oid)]
+                if bid.owner_id != order.owner_id:
+                    matches.append(Match(bid, order))
+            bisect.insort(book.asks, _book_key(order))
+        self.orders[key] = order
+        return matches
+
+    def remove(self, source: str, order_id: int):
+        order = self.orders.pop((source, int(order_id)), None)
+        if order is None:
+            return
+        cf = _ci(order.item)
+        book = self.books.get(cf)
+        if book is None:
+            return
+        side = book.bids if order.side == BID else book.asks
+        k = _book_key(order)
+        i = bisect.bisect_left(side, k)
+        if i < len(side) and side[i] == k:
+            side.pop(i)
+        if not book.asks and not book.bids:
+            del self.books[cf]
+
+    def best(self, item: str) -> Tuple[Optional[Order], Optional[Order]]:
+        """(highest bid, cheapest ask) for an item."""
+        book = self.books.get(_ci(item))
+        if not book:
+            return None, None
+        bid = self.orders[book.bids[0][2:]] if book.bids else None
+        ask = self.orders[book.asks[0][2:]] if book.asks else None
+        return bid, ask
@@ -0,0 +1,215 @@
+# utils/price_history.py
+"""
+Market price history.
+
+Every price observation (a listing posted or taken down, a trade posted) is
+appended to data/price_log.ndjson. Per item, observations are also rolled up
+as they arrive into hourly and daily buckets:
+  [min, max, count, median, gone]
+where `gone` counts listings taken down in that bucket. Only the open hour and
+open day keep their raw prices (to compute the median when they close).
+
+Storage stays bounded by downsampling: the raw log keeps RAW_KEEP, hourly
+buckets HOURLY_KEEP (the daily buckets already cover older hours), and daily
+buckets DAILY_KEEP.
+
+A write is one appended log line. The rollups are checkpointed to
+price_history.json at most every CHECKPOINT_EVERY seconds and on shutdown
+(flush). Each log line carries a sequence number, and loading replays the
+lines past the checkpoint's, so nothing recorded since is lost.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.data import DATA_DIR, load_json, save_json
+
+HISTORY_FILE = os.path.join(DATA_DIR, "price_history.json")
+LOG_FILE = os.path.join(DATA_DIR, "price_log.ndjson")
+
+HOUR = 3600
+DAY = 24 * HOUR
+RAW_KEEP = 2 * DAY
+HOURLY_KEEP = 14 * DAY
+DAILY_KEEP = 365 * DAY
+CHECKPOINT_EVERY = 5 * 60
+
+LISTED, DELISTED, TRADE = "listed", "delisted", "trade"
+
+Bucket = List[Any]  # [min, max, count, median, gone]
+
+
+def _ci(s: str) -> str:
+    return (s or "").strip().casefold()
+
+
+def _median(values: List[float]) -> Optional[float]:
+    if not values:
+        return None
+    v = sorted(values)
+    n = len(v)
+    return v[n // 2] if n % 2 else (v[n // 2 - 1] + v[n // 2]) / 2
+
+
+def _summarize(values: List[float], gone: int) -> Bucket:
+    if not values:
+        return [None, None, 0, None, gone]
+    return [min(values), max(values), len(values), _median(values), gone]
+
+
+def _weighted_median(buckets: List[Bucket]) -> Optional[float]:
+    """Median over bucket medians weighted by their counts (rollups don't keep raw prices)."""
+    pts = sorted((b[3], b[2]) for b in buckets if b[2])
+    total = sum(c for _, c in pts)
+    if not total:
+        return None
+    acc = 0
+    for m, c in pts:
+        acc += c
+        if acc * 2 >= total:
+            return m
+    return pts[-1][0]
+
+
+class PriceHistory:
+    """
+    items: { item_cf: {
+        "hourly": { "<hour_ts>": bucket },
+        "daily":  { "<day_ts>": bucket },
+        "open":   { "h": hour_ts, "hv": [prices], "hg": gone, "d": day_ts, "dv": [prices], "dg": gone }
+    } }
+    """
+
+    def __init__(self, path: str = HISTORY_FILE, log_path: str = LOG_FILE):
+        self.path = path
+        self.log_path = log_path
+        data = load_json(path, {})
+        self.items: Dict[str, Dict[str, Any]] = data.get("items", {})
+        self.last_compact: float = data.get("last_compact", 0)
+        self.seq: int = data.get("seq", 0)  # last log line folded into `items`
+        self.last_save = time.time()
+        self.dirty = self._replay()
+
+    def _replay(self) -> bool:
+        """Fold in log lines written after the last checkpoint."""
+        if not os.path.exists(self.log_path):
+            return False
+        replayed = False
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    obs = json.loads(line)
+                    seq = int(obs["seq"])
+                except (ValueError, KeyError, TypeError):
+                    continue  # torn last line, or a line from before sequence numbers
+                if seq > self.seq:
+                    self._fold(obs["item"], obs["price"], obs["source"], obs["ts"])
+                    self.seq = seq
+                    replayed = True
+        return replayed
+
+    def save(self):
+        save_json(self.path, {"version": 2, "last_compact": self.last_compact, "seq": self.seq, "items": self.items})
+        self.last_save = time.time()
+        self.dirty = False
+
+    def flush(self):
+        """Checkpoint now if anything was recorded since the last one (call on shutdown)."""
+        if self.dirty:
+            self.save()
+
+    # ---------- Writes ----------
+    def record(self, item: str, price: Optional[float], source: str = LISTED, ts: Optional[float] = None):
+        """Append one observation to the log and fold it into the item's open buckets."""
+        cf = _ci(item)
+        if not cf or (price is None and source != DELISTED):
+            return
+        ts = time.time() if ts is None else ts
+        self.seq += 1
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"seq": self.seq, "ts": round(ts, 3), "item": cf, "price": price, "source": source}) + "\n")
+        self._fold(cf, price, source, ts)
+        self.dirty = True
+
+        if ts - self.last_compact >= HOUR:
+            self.compact(ts)
+            self.save()
+        elif time.time() - self.last_save >= CHECKPOINT_EVERY:
+            self.save()
+
+    def _fold(self, cf: str, price: Optional[float], source: str, ts: float):
+        entry = self.items.setdefault(cf, {"hourly": {}, "daily": {}, "open": {}})
+        op = entry["open"]
+        hour, day = int(ts // HOUR * HOUR), int(ts // DAY * DAY)
+        if op.get("h") != hour:
+            if op.get("h") is not None:
+                entry["hourly"][str(op["h"])] = _summarize(op["hv"], op["hg"])
+            op.update(h=hour, hv=[], hg=0)
+        if op.get("d") != day:
+            if op.get("d") is not None:
+                entry["daily"][str(op["d"])] = _summarize(op["dv"], op["dg"])
+            op.update(d=day, dv=[], dg=0)
+        if source == DELISTED:
+            op["hg"] += 1
+            op["dg"] += 1
+        else:
+            op["hv"].append(float(price))
+            op["dv"].append(float(price))
+
+    def compact(self, now: Optional[float] = None):
+        """Drop hourly/daily buckets and raw log lines past their retention."""
+        now = time.time() if now is None else now
+        for cf in list(self.items):
+            entry = self.items[cf]
+            for level, keep in (("hourly", HOURLY_KEEP), ("daily", DAILY_KEEP)):
+                for k in [k for k in entry[level] if int(k) < now - keep]:
+                    del entry[level][k]
+            if not entry["hourly"] and not entry["daily"] and entry["open"].get("d", 0) < now - DAILY_KEEP:
+                del self.items[cf]
+        if os.path.exists(self.log_path):
+            tmp = f"{self.log_path}.tmp"
+            with open(self.log_path, "r", encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst:
+                for line in src:
+                    try:
+                        if json.loads(line)["ts"] >= now - RAW_KEEP:
+                            dst.write(line)
+                    except (ValueError, KeyError):
+                        continue
+            os.replace(tmp, self.log_path)
+        self.last_compact = now
+
+    # ---------- Reads ----------
+    def series(self, item: str, level: str = "hourly") -> List[Tuple[int, Bucket]]:
+        """[(bucket_ts, bucket)] oldest first, including the open bucket."""
+        entry = self.items.get(_ci(item))
+        if not entry:
+            return []
+        out = [(int(k), b) for k, b in entry[level].items()]
+        op = entry["open"]
+        key, vals, gone = ("h", "hv", "hg") if level == "hourly" else ("d", "dv", "dg")
+        if op.get(key) is not None:
+            out.append((op[key], _summarize(op[vals], op[gone])))
+        out.sort()
+        return out
+
+    def trend(self, item: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Last 24h against the 7 days before it:
+          {recent, previous, change (fraction or None), low, high, count}
+        """
+        now = time.time() if now is None else now
+        recent = [b for ts, b in self.series(item, "hourly") if ts >= now - DAY]
+        previous = [b for ts, b in self.series(item, "daily") if now - 8 * DAY <= ts < now - DAY]
+        window = [b for b in recent + previous if b[2]]
+        if not window:
+            return None
+        r, p = _weighted_median(recent), _weighted_median(previous)
+        return {
+            "recent": r,
+            "previous": p,
+            "change": (r - p) / p if r is not None and p else None,
+            "low": min(b[0] for b in window),
+            "high": max(b[1] for b in window),
+            "count": sum(b[2] for b in window),
+        }
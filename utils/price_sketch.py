@@ -0,0 +1,125 @@
+# utils/price_sketch.py
+"""
+Per-item reference prices ("fair price" bands) from streaming quantile sketches.
+
+Every priced listing and trade post is added to its item's sketch once and
+never stored. A sketch is a log-bucket histogram (DDSketch-style): a price x
+lands in bucket ceil(log(x) / log(gamma)), so any quantile read back is within
+ALPHA relative error of the true one. Memory per item is capped at
+MAX_BUCKETS; past that the cheapest buckets are merged, which only blurs the
+far low tail.
+"""
+import math
+from typing import Any, Dict, Optional
+
+from utils.data import load_json, save_json
+
+BANDS_FILE = "data/price_bands.json"
+
+ALPHA = 0.02                      # relative accuracy of quantiles
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+LOG_GAMMA = math.log(GAMMA)
+MAX_BUCKETS = 128
+MIN_COUNT = 5                     # observations before a band is shown
+FENCE = 1.5                       # Tukey fences: outside p25/p75 by 1.5 IQR
+
+LOW, HIGH = "low", "high"
+
+
+def _ci(s: str) -> str:
+    return (s or "").strip().casefold()
+
+
+class QuantileSketch:
+    def __init__(self, bins: Optional[Dict[int, int]] = None, zero: int = 0):
+        self.bins: Dict[int, int] = bins or {}
+        self.zero = zero
+        self.count = zero + sum(self.bins.values())
+
+    @classmethod
+    def from_json(cls, raw: Dict[str, Any]) -> "QuantileSketch":
+        return cls({int(k): int(v) for k, v in raw.get("bins", {}).items()}, int(raw.get("zero", 0)))
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"zero": self.zero, "bins": {str(k): v for k, v in self.bins.items()}}
+
+    def add(self, x: float):
+        self.count += 1
+        if x <= 0:
+            self.zero += 1
+            return
+        k = math.ceil(math.log(x) / LOG_GAMMA)
+        self.bins[k] = self.bins.get(k, 0) + 1
+        self._collapse()
+
+    def merge(self, other: "QuantileSketch"):
+        """Fold another sketch in; the result is as if both streams went into this one."""
+        for k, n in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + n
+        self.zero += other.zero
+        self.count += other.count
+        self._collapse()
+
+    def _collapse(self):
+        """Keep at most MAX_BUCKETS by merging the cheapest buckets upward."""
+        if len(self.bins) <= MAX_BUCKETS:
+            return
+        keys = sorted(self.bins)
+        into = keys[-MAX_BUCKETS]
+        for low in keys[:-MAX_BUCKETS]:
+            self.bins[into] += self.bins.pop(low)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if rank < seen:
+                return 2 * GAMMA ** k / (GAMMA + 1)  # bucket midpoint (relative)
+        return 2 * GAMMA ** max(self.bins) / (GAMMA + 1)
+
+
+class PriceBands:
+    """items: { item_cf: sketch json } in data/price_bands.json"""
+
+    def __init__(self, path: str = BANDS_FILE):
+        self.path = path
+        raw = load_json(path, None)
+        self.fresh = raw is None  # nothing recorded yet: owners seed from their live postings
+        self.sketches: Dict[str, QuantileSketch] = {
+            cf: QuantileSketch.from_json(s) for cf, s in (raw or {}).items()
+        }
+
+    def save(self):
+        save_json(self.path, {cf: s.to_json() for cf, s in self.sketches.items()})
+
+    def record(self, item: str, price: Optional[float], save: bool = True):
+        cf = _ci(item)
+        if not cf or price is None:
+            return
+        self.sketches.setdefault(cf, QuantileSketch()).add(float(price))
+        if save:
+            self.save()
+
+    def band(self, item: str) -> Optional[Dict[str, float]]:
+        """{p25, median, p75, count} once the item has MIN_COUNT observations."""
+        s = self.sketches.get(_ci(item))
+        if not s or s.count < MIN_COUNT:
+            return None
+        return {"p25": s.quantile(0.25), "median": s.quantile(0.5), "p75": s.quantile(0.75), "count": s.count}
+
+    def assess(self, item: str, price: Optional[float]) -> Optional[str]:
+        """LOW / HIGH when the price falls outside the item's Tukey fences, else None."""
+        b = self.band(item)
+        if not b or price is None:
+            return None
+        iqr = b["p75"] - b["p25"]
+        if price < b["p25"] - FENCE * iqr:
+            return LOW
+        if price > b["p75"] + FENCE * iqr:
+            return HIGH
+        return None
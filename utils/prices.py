@@ -0,0 +1,88 @@
+# utils/prices.py
+"""
+Turn free-text market prices ("1500g", "1.2k", "2g 50s", "Offer") into a
+number of gold, with a confidence flag:
+  "exact"  - the whole text was a price
+  "approx" - a price was picked out of surrounding words ("~1500 obo", "1-2k")
+  "none"   - nothing usable ("Offer", "DM me")
+
+A range ("100g-200g", "1-2k", "500 to 800") is stored as its low end, the
+least the seller asks; a bare start borrows the end's unit ("1-2k" = 1000).
+Quantities ("x2 for 300g", "2 for 1k", "5x") are skipped, so the price is
+the amount of gold, not the item count.
+"""
+import re
+from typing import Any, Optional, Tuple
+
+EXACT, APPROX, NONE = "exact", "approx", "none"
+PRICE_HELP = "Use gold amounts like 500g, 1.2k, 2m or 2g 50s."
+
+# Ashes of Creation coinage, in gold
+UNITS = {
+    "": 1.0, "g": 1.0, "gold": 1.0, "gp": 1.0,
+    "s": 0.01, "silver": 0.01,
+    "c": 0.0001, "copper": 0.0001,
+}
+SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+_PART = re.compile(
+    r"(?<![x×])(\d+(?:[.,]\d+)*)\s*([km])?\s*(gold|silver|copper|gp|g|s|c)?(?![a-z])",
+    re.IGNORECASE,
+)
+_QUANTITY_AFTER = re.compile(r"\s*(?:for|pcs?|each|ea)\b", re.IGNORECASE)  # "2 for 1k"
+RANGE_SEPARATORS = ("-", "–", "to", "~")
+
+
+def _number(text: str) -> float:
+    # "1,500" and "1.500" are thousands separators; "1.5" / "1,5" are decimals
+    if re.fullmatch(r"\d{1,3}([.,]\d{3})+", text):
+        return float(re.sub(r"[.,]", "", text))
+    return float(text.replace(",", "."))
+
+
+def parse_price(raw: Any) -> Tuple[Optional[float], str]:
+    """(gold, confidence); numbers pass through as exact."""
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        return float(raw), EXACT
+    text = str(raw or "").strip().lower()
+    if not text or text == "—":
+        return None, NONE
+
+    spans = []
+    for m in _PART.finditer(text):
+        try:
+            value = _number(m.group(1))
+        except ValueError:
+            continue
+        if not (m.group(2) or m.group(3)) and _QUANTITY_AFTER.match(text, m.end()):
+            continue
+        scale = SUFFIXES.get((m.group(2) or "").lower(), 1) * UNITS[(m.group(3) or "").lower()]
+        spans.append((m.start(), m.end(), value * scale, bool(m.group(3)), scale, value, bool(m.group(2) or m.group(3))))
+
+    if not spans:
+        return None, NONE
+    between = text[spans[0][1]:spans[1][0]].strip() if len(spans) > 1 else ""
+    if between in RANGE_SEPARATORS:
+        # "100g-200g", "1-2k": the low end; a bare start borrows the end's scale
+        total = spans[0][2] if spans[0][6] else spans[0][5] * spans[1][4]
+    elif len(spans) > 1 and all(s[3] for s in spans):
+        # "2g 50s" adds up
+        total = sum(s[2] for s in spans)
+    else:
+        # "1500 or 1200": take the first figure
+        total = spans[0][2]
+    rest = text
+    for a, b, *_ in reversed(spans):
+        rest = rest[:a] + rest[b:]
+    confidence = EXACT if not rest.strip(" \t+") else APPROX
+    if len(spans) > 1 and confidence == EXACT and not all(s[3] for s in spans):
+        confidence = APPROX
+    return round(total, 4), confidence
+
+
+def format_gold(value: Optional[float]) -> str:
+    if value is None:
+        return "—"
+    if value >= 1 or value == 0:
+        return f"{value:,.0f}g" if float(value).is_integer() else f"{value:,.2f}g"
+    return f"{value * 100:,.0f}s"
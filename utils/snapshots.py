@@ -0,0 +1,26 @@
+# utils/snapshots.py
+"""
+Read snapshots for paged views.
+
+A paged view (market browse, the inboxes) holds a cheap snapshot handle
+instead of a copy of what it shows: the collection's version when the view
+opened, plus a cursor, which is the last key of the page before.
+Collections keep their rows in sorted key/id arrays, so the next page is
+one bisect from the cursor. Rows added or removed between clicks can't
+shift a page, repeat a row or skip one. When the current version differs
+from the view's, the view offers a refresh back to page one.
+"""
+from typing import Dict, Hashable, Optional
+
+
+class Versions:
+    """Version counters, one per key (None = the whole collection)."""
+
+    def __init__(self):
+        self.versions: Dict[Optional[Hashable], int] = {}
+
+    def bump(self, key: Optional[Hashable] = None):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def version(self, key: Optional[Hashable] = None) -> int:
+        return self.versions.get(key, 0)
@@ -0,0 +1,157 @@
+# utils/textsearch.py
+"""
+Small in-memory full-text index with BM25 ranking.
+
+Used by the listing store to search item names and notes ("enchanted",
+"bulk discount", "x50") for market listings and trade posts. Postings are
+{term: {doc_id: weighted tf}} and are updated per document on add/remove, so
+a query only touches the postings of its own terms. The last query word
+also matches as a prefix ("obsid" finds "obsidian"), expanded through a
+sorted vocabulary with one bisect.
+"""
+import bisect
+import heapq
+import math
+import re
+from typing import AbstractSet, Dict, Iterable, List, Optional, Set, Tuple
+
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset({"a", "an", "and", "the", "of", "for", "to", "in", "on", "or", "with", "is", "at", "me", "my"})
+MAX_EXPANSIONS = 25
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall((text or "").casefold()) if t not in STOPWORDS]
+
+
+class TextIndex:
+    """
+    postings: { term: { doc_id: tf } }   tf already weighted per field
+    lengths:  { doc_id: weighted length }
+    terms:    { doc_id: (term, ...) }     what to unlink on remove
+    vocab:    [ term, ... ] sorted, for prefix expansion
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.lengths: Dict[int, float] = {}
+        self.terms: Dict[int, Tuple[str, ...]] = {}
+        self.vocab: List[str] = []
+        self.total = 0.0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, doc_id: int, fields: Iterable[Tuple[str, float]]):
+        """Index a document from (text, weight) fields, e.g. [(item, 2.0), (note, 1.0)]."""
+        if doc_id in self.lengths:
+            self.remove(doc_id)
+        tf: Dict[str, float] = {}
+        for text, weight in fields:
+            for t in tokenize(text):
+                tf[t] = tf.get(t, 0.0) + weight
+        for t, n in tf.items():
+            docs = self.postings.get(t)
+            if docs is None:
+                docs = self.postings[t] = {}
+                bisect.insort(self.vocab, t)
+            docs[doc_id] = n
+        length = sum(tf.values())
+        self.lengths[doc_id] = length
+        self.terms[doc_id] = tuple(tf)
+        self.total += length
+
+    def remove(self, doc_id: int):
+        if doc_id not in self.lengths:
+            return
+        self.total -= self.lengths.pop(doc_id)
+        for t in self.terms.pop(doc_id, ()):
+            docs = self.postings.get(t)
+            if docs is None:
+                continue
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[t]
+                i = bisect.bisect_left(self.vocab, t)
+                if i < len(self.vocab) and self.vocab[i] == t:
+                    self.vocab.pop(i)
+
+    # ---------- Queries ----------
+    def _query_terms(self, query: str) -> List[List[str]]:
+        """One group of index terms per query word; the last word also matches as a prefix."""
+        words = tokenize(query)
+        groups: List[List[str]] = []
+        for i, w in enumerate(words):
+            group = [w] if w in self.postings else []
+            if i == len(words) - 1:
+                j = bisect.bisect_left(self.vocab, w)
+                while j < len(self.vocab) and self.vocab[j].startswith(w) and len(group) < MAX_EXPANSIONS:
+                    if self.vocab[j] != w:
+                        group.append(self.vocab[j])
+                    j += 1
+            groups.append(group)
+        return groups
+
+    def matching(self, query: str) -> Optional[AbstractSet[int]]:
+        """Docs containing every query word (None for an empty query); treat as read-only."""
+        groups = self._query_terms(query)
+        if not groups:
+            return None
+        if len(groups) == 1 and len(groups[0]) == 1:
+            return self.postings[groups[0][0]].keys()  # one term: its postings, no copy
+        groups.sort(key=lambda g: sum(len(self.postings[t]) for t in g))
+        out: Set[int] = set()
+        for t in groups[0]:
+            out.update(self.postings[t])
+        # the rarest word drives; the others are membership checks on its hits
+        for group in groups[1:]:
+            if not out:
+                break
+            postings = [self.postings[t] for t in group]
+            out = {d for d in out if any(d in p for p in postings)}
+        return out
+
+    def search(self, query: str, limit: Optional[int] = None,
+               accept: Optional[AbstractSet[int]] = None,
+               after: Optional[Tuple[float, int]] = None) -> List[Tuple[float, int]]:
+        """
+        [(score, doc_id)] best first (ties by id). Docs containing every word
+        are ranked when there are any; otherwise any word may match.
+        `accept` restricts the docs. `after` is a (-score, doc_id) cursor: only
+        docs ranked below it are returned, so a page is a top-`limit` pick
+        (heap, no full sort) from the cursor on.
+        """
+        n = len(self.lengths)
+        if not n:
+            return []
+        groups = self._query_terms(query)
+        candidates = self.matching(query)
+        if candidates and accept is not None:
+            candidates &= accept
+        elif candidates and len(groups) == 1:
+            candidates = None  # one word: its own postings are exactly the matches
+        if not candidates:
+            candidates = accept  # fall back to any-word matches
+        avg = self.total / n or 1.0
+        lengths = self.lengths
+        k1_1, c0, c1 = self.k1 + 1, self.k1 * (1 - self.b), self.k1 * self.b / avg
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for group in groups:
+            for t in group:
+                docs = self.postings[t]
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) * k1_1
+                if candidates is None:
+                    pairs: Iterable[Tuple[int, float]] = docs.items()
+                elif len(candidates) < len(docs):
+                    pairs = [(d, docs[d]) for d in candidates if d in docs]
+                else:
+                    pairs = [(d, tf) for d, tf in docs.items() if d in candidates]
+                for d, tf in pairs:
+                    scores[d] = get(d, 0.0) + idf * tf / (tf + c0 + c1 * lengths[d])
+        ranked = ((-s, d) for d, s in scores.items())
+        if after is not None:
+            ranked = (r for r in ranked if r > after)
+        best = heapq.nsmallest(limit, ranked) if limit is not None else sorted(ranked)
+        return [(-s, d) for s, d in best]
@@ -0,0 +1,109 @@
+# utils/wishlists.py
+"""
+Reverse wishlist index and per-user match counters.
+
+The Profile cog owns one WishlistIndex (item_cf -> user ids) and keeps it
+current on add/remove; Market and Trades each keep a MatchCounter on top of
+it, so "who wants this?" and "how many postings match my wishlist?" are
+lookups instead of scans over every profile or every posting.
+"""
+from typing import Any, Dict, Iterable, Set
+
+
+def _ci(s: str) -> str:
+    return (s or "").strip().casefold()
+
+
+class WishlistIndex:
+    """
+    wishers:  { item_cf: {user_id, ...} }
+    by_user:  { user_id: {item_cf, ...} }
+    """
+
+    def __init__(self):
+        self.wishers: Dict[str, Set[int]] = {}
+        self.by_user: Dict[int, Set[str]] = {}
+
+    def rebuild(self, profiles: Dict[str, Dict[str, Any]]):
+        self.wishers.clear()
+        self.by_user.clear()
+        for uid, p in profiles.items():
+            for item in (p or {}).get("wishlist", []) or []:
+                if isinstance(item, str):
+                    self.add(int(uid), item)
+
+    def add(self, user_id: int, item: str) -> bool:
+        """True if the user didn't already want this item (in any casing)."""
+        cf = _ci(item)
+        mine = self.by_user.setdefault(int(user_id), set())
+        if not cf or cf in mine:
+            return False
+        mine.add(cf)
+        self.wishers.setdefault(cf, set()).add(int(user_id))
+        return True
+
+    def remove(self, user_id: int, item: str) -> bool:
+        cf = _ci(item)
+        mine = self.by_user.get(int(user_id))
+        if not mine or cf not in mine:
+            return False
+        mine.discard(cf)
+        users = self.wishers.get(cf)
+        if users is not None:
+            users.discard(int(user_id))
+            if not users:
+                del self.wishers[cf]
+        return True
+
+    def wishers_of(self, item: str) -> Set[int]:
+        return self.wishers.get(_ci(item), set())
+
+    def items_of(self, user_id: int) -> Set[str]:
+        return self.by_user.get(int(user_id), set())
+
+
+class MatchCounter:
+    """
+    Per-user number of live postings whose item is on the user's wishlist.
+      posted: { item_cf: live postings of that item }
+      counts: { user_id: matches }
+    """
+
+    def __init__(self, wishlists: WishlistIndex):
+        self.wishlists = wishlists
+        self.posted: Dict[str, int] = {}
+        self.counts: Dict[int, int] = {}
+
+    def rebuild(self, items: Iterable[str]):
+        self.posted.clear()
+        self.counts.clear()
+        for item in items:
+            cf = _ci(item)
+            if cf:
+                self.posted[cf] = self.posted.get(cf, 0) + 1
+        for cf, n in self.posted.items():
+            for uid in self.wishlists.wishers.get(cf, ()):
+                self.counts[uid] = self.counts.get(uid, 0) + n
+
+    def posted_item(self, item: str, delta: int = 1):
+        """A posting of `item` appeared (+1) or went away (-1). O(wishers of the item)."""
+        cf = _ci(item)
+        if not cf:
+            return
+        n = self.posted.get(cf, 0) + delta
+        if n > 0:
+            self.posted[cf] = n
+        else:
+            self.posted.pop(cf, None)
+        for uid in self.wishlists.wishers.get(cf, ()):
+            self.counts[uid] = max(0, self.counts.get(uid, 0) + delta)
+
+    def wish_changed(self, user_id: int, item: str, added: bool):
+        """Call after the WishlistIndex changed for this user. O(1)."""
+        n = self.posted.get(_ci(item), 0)
+        if n:
+            c = self.counts.get(int(user_id), 0) + (n if added else -n)
+            self.counts[int(user_id)] = max(0, c)
+
+    def count(self, user_id: int) -> int:
+        return self.counts.get(int(user_id), 0)